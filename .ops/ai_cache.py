@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Кэш ответов LLM для AI-анализа отчётов (SQLite).
+
+build_report.py --ai-analysis отправляет в модель промпт и контекст,
+собранный из хранилища. Если ни то, ни другое не изменилось, повторный
+вызов вернул бы (почти) тот же ответ, поэтому ответ берётся из кэша:
+
+- ключ — sha256 от маршрутов задачи (провайдер/модель), хеша промпта,
+  хеша контекста и max_tokens: смена модели в config.yaml, правка промпта
+  или документов дают новый ключ;
+- запись живёт ttl секунд (по умолчанию 7 дней), потом вызов повторяется;
+- вместе с ответом хранится usage (input/output токены) и маршрут, который
+  ответил, — видно, сколько токенов сэкономил кэш;
+- ответы с ошибкой не кэшируются.
+
+Файл — .ops/.cache/ai_responses.sqlite (как и лимиты частоты, не в git;
+в CI папка .ops/.cache сохраняется между запусками через actions/cache).
+
+Использование:
+    cache = ResponseCache()
+    key = cache_key(models, prompt, context, max_tokens)
+    entry = cache.get(key)
+    if entry is None:
+        ...
+        cache.put(key, text, usage, route)
+
+    python3 .ops/ai_cache.py            # записи и сэкономленные токены
+    python3 .ops/ai_cache.py --prune    # удалить устаревшие записи
+"""
+
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_DB_PATH = REPO_ROOT / ".ops" / ".cache" / "ai_responses.sqlite"
+DEFAULT_TTL = 7 * 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    usage TEXT NOT NULL,
+    route TEXT NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_key(models: Iterable[str], prompt: str, context: str, max_tokens: int) -> str:
+    """Ключ ответа: маршруты задачи, хеш промпта, хеш контекста, max_tokens."""
+    parts = [",".join(models), _sha256(prompt), _sha256(context), str(max_tokens)]
+    return _sha256("\n".join(parts))
+
+
+class ResponseCache:
+    """Ответы LLM по ключу cache_key с ограниченным сроком жизни."""
+
+    def __init__(self, db_path: Path = DEFAULT_DB_PATH, ttl: float = DEFAULT_TTL):
+        self.db_path = Path(db_path)
+        self.ttl = float(ttl)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Запись {text, usage, route, created_at} или None (нет или устарела)."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT text, usage, route, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        text, usage, route, created_at = row
+        if time.time() - created_at > self.ttl:
+            return None
+        return {"text": text, "usage": json.loads(usage), "route": route, "created_at": created_at}
+
+    def put(self, key: str, text: str, usage: dict, route: str):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, text, usage, route, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, text, json.dumps(usage or {}), route, time.time())
+            )
+
+    def prune(self) -> int:
+        """Удаление устаревших записей; возвращает их число."""
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        now = time.time()
+        totals = {"entries": 0, "expired": 0, "input_tokens": 0, "output_tokens": 0}
+        with self._connect() as conn:
+            for usage, created_at in conn.execute("SELECT usage, created_at FROM responses"):
+                if now - created_at > self.ttl:
+                    totals["expired"] += 1
+                    continue
+                totals["entries"] += 1
+                usage = json.loads(usage)
+                totals["input_tokens"] += usage.get("input_tokens", 0)
+                totals["output_tokens"] += usage.get("output_tokens", 0)
+        return totals
+
+
+def main():
+    cache = ResponseCache()
+    if "--prune" in sys.argv[1:]:
+        print(f"🧹 Удалено устаревших записей: {cache.prune()}")
+    stats = cache.stats()
+    print(f"📦 Кэш AI-ответов: {cache.db_path}")
+    print(f"   Актуальных записей: {stats['entries']}, устаревших: {stats['expired']}")
+    print(f"   Токены в актуальных ответах: {stats['input_tokens']} входных, {stats['output_tokens']} выходных")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,7 @@ from pathlib import Path
 import re
 import yaml
 import datetime
+from frontmatter import load as load_frontmatter
 
 CONTENT = Path('content')
 REPORT = Path('ops') / 'dedup_applied.md'
@@ -36,7 +37,7 @@ def parse_frontmatter(text):
             raw = parts[1]
             body = parts[2]
             try:
-                data = yaml.safe_load(raw)
+                data = load_frontmatter(raw)
                 if data is None:
                     data = {}
             except Exception:
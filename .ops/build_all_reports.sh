@@ -5,6 +5,7 @@
 # Использование:
 #   ./.ops/build_all_reports.sh           # Генерация всех отчётов
 #   ./.ops/build_all_reports.sh --dry-run # Только показать, не сохранять
+#   ./.ops/build_all_reports.sh --force   # Перегенерировать и неизменившиеся отчёты
 #
 
 set -e
@@ -39,6 +40,9 @@ ARGS="--report all"
 if [[ "$*" == *"--dry-run"* ]]; then
     ARGS="$ARGS --dry-run"
 fi
+if [[ "$*" == *"--force"* ]]; then
+    ARGS="$ARGS --force"
+fi
 
 # Запускаем генерацию
 echo "🚀 Запуск генерации отчётов..."
@@ -50,6 +50,15 @@ def load_env_file():
 load_env_file()
 CONTENT_DIR = BASE_DIR / "content"
 
+# AI-анализ противоречий: тип задачи для .ops/llm_router.py и цены моделей ($ за 1M токенов)
+AI_TASK = "contradictions"
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.150, 0.600),
+    "gpt-4o": (2.50, 10.00),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "claude-3-5-haiku-20241022": (0.80, 4.00),
+}
+
 # Маркеры для исключения текста из обработки AI
 EXCLUDE_MARKERS = [
     "<!-- Не для ИИ -->",
@@ -485,15 +494,16 @@ def analyze_contradictions_with_ai(sections_content: str) -> str:
         Текст раздела 9 с анализом противоречий
     """
     try:
-        import openai
-        from openai import OpenAI
+        from llm_router import HAS_HTTPX, get_router
     except ImportError:
+        HAS_HTTPX = False
+    if not HAS_HTTPX:
         return """
 ## 9. Заключение о противоречиях и несоответствиях
 
-⚠️ **AI-анализ недоступен**: не установлен пакет `openai`
+⚠️ **AI-анализ недоступен**: не установлены пакеты `httpx` и `pyyaml`
 
-Установите: `pip install openai`
+Установите: `pip install httpx pyyaml`
 
 ### Ручная проверка
 Проверьте следующие области на противоречия:
@@ -503,12 +513,12 @@ def analyze_contradictions_with_ai(sections_content: str) -> str:
 4. Согласованность экономической модели
 """
 
-    api_key = os.getenv('OPENAI_API_KEY')
-    if not api_key:
+    router = get_router()
+    if not router.available(AI_TASK):
         return """
 ## 9. Заключение о противоречиях и несоответствиях
 
-⚠️ **AI-анализ недоступен**: не установлен OPENAI_API_KEY
+⚠️ **AI-анализ недоступен**: не установлен OPENAI_API_KEY (или ключ другого провайдера из router.routes.contradictions)
 
 Установите переменную окружения:
 ```bash
@@ -526,13 +536,11 @@ export OPENAI_API_KEY=your_api_key
     print("🤖 Запускаю AI-анализ противоречий...")
 
     try:
-        client = OpenAI(api_key=api_key)
-
         # Собираем ВСЕ документы из репозитория
         all_documents = collect_all_documents()
 
         # Ограничиваем размер для OpenAI (128K токенов ≈ 512K символов, берём с запасом)
-        # GPT-4o-mini поддерживает 128K токенов входа
+        # Модели маршрута contradictions поддерживают от 128K токенов входа
         max_chars = 400000  # ~100K токенов
         if len(all_documents) > max_chars:
             print(f"⚠️  Документы обрезаны: {len(all_documents):,} → {max_chars:,} символов")
@@ -625,29 +633,30 @@ export OPENAI_API_KEY=your_api_key
 - **Топ-3 рекомендации**: приоритетные действия
 """
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Ты эксперт по анализу проектной документации и выявлению противоречий между документами. Ты внимательно читаешь все документы целиком и находишь несоответствия, конфликты терминологии, противоречия в целях и подходах."},
-                {"role": "user", "content": prompt}
-            ],
+        completion = router.complete(
+            AI_TASK,
+            prompt,
+            system="Ты эксперт по анализу проектной документации и выявлению противоречий между документами. Ты внимательно читаешь все документы целиком и находишь несоответствия, конфликты терминологии, противоречия в целях и подходах.",
             temperature=0.3,
-            max_tokens=4000  # Увеличили для более подробного анализа всех документов
+            max_tokens=4000,  # Увеличили для более подробного анализа всех документов
+            timeout=300.0
         )
 
-        analysis = response.choices[0].message.content
+        analysis = completion.text
+        model = completion.route.model
 
-        print("✅ AI-анализ завершен")
+        print(f"✅ AI-анализ завершен ({completion.route.key})")
 
         # Подсчитываем статистику
         doc_count = all_documents.count('## 📄')
         chars_analyzed = len(all_documents)
-        tokens_approx = chars_analyzed // 4  # Приблизительно 4 символа = 1 токен
+        tokens_approx = completion.usage.get("input_tokens") or chars_analyzed // 4  # ~4 символа = 1 токен
+        output_tokens = completion.usage.get("output_tokens") or 4000
 
-        # Оцениваем стоимость (для GPT-4o-mini)
-        # Input: $0.150 / 1M tokens, Output: $0.600 / 1M tokens
-        input_cost = (tokens_approx / 1_000_000) * 0.150
-        output_cost = (4000 / 1_000_000) * 0.600  # max_tokens = 4000
+        # Оцениваем стоимость по цене модели ($ за 1M токенов: вход, выход)
+        input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+        input_cost = (tokens_approx / 1_000_000) * input_price
+        output_cost = (output_tokens / 1_000_000) * output_price
         total_cost = input_cost + output_cost
 
         return f"""
@@ -659,7 +668,7 @@ export OPENAI_API_KEY=your_api_key
 >
 > 💰 **Стоимость анализа**: ~${total_cost:.4f}
 >
-> 📈 **Модель**: GPT-4o-mini (128K context)
+> 📈 **Модель**: {model}
 
 {analysis}
 
@@ -688,7 +697,7 @@ _Следующая проверка будет выполнена при сле
 
 ---
 
-💰 **Стоимость данного анализа**: ${total_cost:.4f} (~{total_cost * 100:.1f} цента) | Модель: GPT-4o-mini
+💰 **Стоимость данного анализа**: ${total_cost:.4f} (~{total_cost * 100:.1f} цента) | Модель: {model}
 """
 
     except Exception as e:
@@ -739,7 +748,7 @@ python3 .ops/build_check_document.py --ai-analysis
 
 **Требования**:
 - Файл `.env` с переменной `OPENAI_API_KEY=your_api_key`
-- Установленные зависимости: `pip install openai`
+- Установленные зависимости: `pip install httpx pyyaml`
 
 **Стоимость**: ~$0.015-0.02 (~1.5-2 цента) за полный анализ
 
@@ -23,18 +23,23 @@
 
 Флаги:
     --ai-analysis           - Использовать Claude для AI-анализа
+    --refresh-ai            - Не брать ответы AI-анализа из кэша (.ops/.cache/ai_responses.sqlite)
+    --ai-cache-ttl          - Срок жизни кэша ответов AI-анализа в днях (по умолчанию 7)
     --dry-run               - Не сохранять файлы, только вывести
     --output, -o            - Указать путь для сохранения
 """
 
-import os
 import re
 import sys
 import json
 import yaml
 import argparse
 import hashlib
+import os
 import subprocess
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
@@ -47,17 +52,24 @@ try:
 except ImportError:
     pass  # python-dotenv не установлен, используем переменные окружения
 
-# Опциональная поддержка AI-анализа
-try:
-    import anthropic
-    HAS_ANTHROPIC = True
-except ImportError:
-    HAS_ANTHROPIC = False
+# AI-анализ — через общий с ДЗ-чекером маршрутизатор LLM (провайдеры, failover, лимит частоты)
+from llm_router import HAS_HTTPX, get_router
+from ai_cache import DEFAULT_TTL as AI_CACHE_TTL, ResponseCache, cache_key
+from frontmatter import load as load_frontmatter
+from fuzzy_match import FuzzyIndex
+from link_graph import LinkGraph
+from terminology import MAP_MAX_TOKENS as TERMS_MAP_MAX_TOKENS, MAP_PROMPT as TERMS_MAP_PROMPT
+from terminology import Chunk as TermChunk, TermIndex, collect_terms
 
 # Константы
 CONTENT_DIR = Path("content")
 REPORTS_DIR = CONTENT_DIR / "0. Управление" / "0.4. Автоматические отчёты ИИ" / "0.4.2. Актуальные автоматические отчеты"
 
+# Исходники генератора (их хеш входит в отпечаток отчёта) и отпечаток в конце файла отчёта
+OPS_DIR = Path(__file__).parent
+GENERATOR_SOURCES = ["build_report.py", "link_graph.py", "fuzzy_match.py", "frontmatter.py", "terminology.py"]
+FINGERPRINT_RE = re.compile(r'^<!-- fingerprint: ([0-9a-f]{64}) -->$', re.MULTILINE)
+
 # Семейства документов F0-F9
 FAMILIES = {
     "F0": {"name": "Управление", "level": "Метасистема", "role": "-", "section": "0"},
@@ -72,70 +84,121 @@ FAMILIES = {
     "F9": {"name": "Команда и службы", "level": "Экосистема", "role": "Менеджер", "section": "3.3"},
 }
 
-# Модель для AI-анализа
-AI_MODEL = "claude-sonnet-4-20250514"
+# Тип задачи AI-анализа (маршруты — router.routes.report_analysis в config.yaml ДЗ-чекера)
+AI_TASK = "report_analysis"
 AI_MAX_TOKENS = 4096
+# Сводная таблица терминов в контексте итогового анализа терминологии
+TERMS_CONTEXT_CHARS = 24000
+# Отчёты, в которые входят ответы AI-анализа
+AI_REPORTS = ("terminology", "recommendations")
 
 
 class AIAnalyzer:
-    """Класс для AI-анализа документов с использованием Claude."""
+    """Класс для AI-анализа документов (Claude, при недоступности — резервные модели)."""
 
-    def __init__(self):
-        if not HAS_ANTHROPIC:
+    def __init__(self, cache: Optional[ResponseCache] = None, refresh: bool = False):
+        """
+        Args:
+            cache: кэш ответов (None — без кэша)
+            refresh: не читать кэш, но сохранить в него новые ответы
+        """
+        if not HAS_HTTPX:
             raise RuntimeError(
-                "Для AI-анализа требуется библиотека anthropic.\n"
-                "Установите: pip install anthropic"
+                "Для AI-анализа требуется библиотека httpx.\n"
+                "Установите: pip install httpx"
             )
 
-        api_key = os.environ.get("ANTHROPIC_API_KEY")
-        if not api_key:
+        self.router = get_router()
+        if not self.router.available(AI_TASK):
             raise RuntimeError(
-                "Не установлена переменная окружения ANTHROPIC_API_KEY.\n"
+                "Не установлена переменная окружения ANTHROPIC_API_KEY "
+                "(или ключ резервного провайдера: OPENAI_API_KEY).\n"
                 "Получите ключ на https://console.anthropic.com/"
             )
 
-        self.client = anthropic.Anthropic(api_key=api_key)
+        self.cache = cache
+        self.refresh = refresh
+        # Маршруты задачи из конфигурации — часть ключа кэша (смена модели даёт новый ключ)
+        task = self.router.tasks.get(AI_TASK, self.router.tasks.get("default", {}))
+        self.models = [f"{item['provider']}/{item['model']}" for item in task.get("models", [])]
+        # Отчёты строятся параллельно — счётчики под блокировкой
+        self._lock = threading.Lock()
+        self.usage = {"calls": 0, "cached": 0, "failed": 0, "input_tokens": 0, "output_tokens": 0,
+                      "saved_input_tokens": 0, "saved_output_tokens": 0}
+
+    @property
+    def failed(self) -> bool:
+        """Был ли хотя бы один вызов без ответа (в отчёт попал текст ошибки)."""
+        return self.usage["failed"] > 0
+
+    def _count(self, cached: bool, usage: dict):
+        prefix = "saved_" if cached else ""
+        with self._lock:
+            self.usage["cached" if cached else "calls"] += 1
+            self.usage[prefix + "input_tokens"] += usage.get("input_tokens", 0)
+            self.usage[prefix + "output_tokens"] += usage.get("output_tokens", 0)
 
     def analyze(self, prompt: str, context: str, max_tokens: int = AI_MAX_TOKENS) -> str:
-        """Выполнение AI-анализа."""
+        """
+        Выполнение AI-анализа (с ожиданием общего лимита частоты и failover).
+
+        Ответ на тот же промпт и контекст берётся из кэша, пока не истёк его срок.
+        """
+        key = cache_key(self.models, prompt, context, max_tokens) if self.cache else None
+        if key and not self.refresh:
+            entry = self.cache.get(key)
+            if entry is not None:
+                self._count(True, entry["usage"])
+                return entry["text"]
+
         try:
-            response = self.client.messages.create(
-                model=AI_MODEL,
+            completion = self.router.complete(
+                AI_TASK,
+                f"{prompt}\n\n---\n\nКонтекст:\n{context}",
                 max_tokens=max_tokens,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": f"{prompt}\n\n---\n\nКонтекст:\n{context}"
-                    }
-                ]
+                timeout=300.0
             )
-            return response.content[0].text
         except Exception as e:
+            # RouterError — все маршруты отказали; прочие ошибки тоже не должны
+            # обрывать отчёт: в него попадает текст ошибки, отпечаток не ставится
+            with self._lock:
+                self.usage["failed"] += 1
             return f"*Ошибка AI-анализа: {e}*"
 
-    def analyze_terminology(self, documents: List['Document']) -> str:
-        """Анализ терминологической согласованности."""
-        # Собираем определения терминов из документов
-        terms_context = self._extract_terms_context(documents)
-
+        self._count(False, completion.usage)
+        if key:
+            self.cache.put(key, completion.text, completion.usage, completion.route.key)
+        return completion.text
+
+    def summary(self) -> str:
+        usage = self.usage
+        return (f"AI-анализ: вызовов {usage['calls']} "
+                f"({usage['input_tokens']} + {usage['output_tokens']} токенов), "
+                f"из кэша {usage['cached']} "
+                f"(сэкономлено {usage['saved_input_tokens']} + {usage['saved_output_tokens']} токенов), "
+                f"ошибок {usage['failed']}")
+
+    def extract_terms(self, chunk: TermChunk) -> str:
+        """Map-шаг терминологии: термины фрагмента строками «термин :: определение»."""
+        context = f"### {chunk.doc}" + (f" — {chunk.heading}" if chunk.heading else "") + f"\n\n{chunk.text}"
+        return self.analyze(TERMS_MAP_PROMPT, context, max_tokens=TERMS_MAP_MAX_TOKENS)
+
+    def analyze_terminology(self, terms: TermIndex) -> str:
+        """Анализ терминологической согласованности по сводной таблице терминов (reduce-шаг)."""
         prompt = """Проанализируй терминологическую согласованность документов хранилища знаний.
 
+Контекст — сводная таблица терминов, извлечённых из всех документов хранилища:
+для каждого термина приведены различающиеся определения с названиями документов,
+отмечены термины с разными определениями и варианты написания.
+
 Задачи:
-1. Найди термины, которые используются с разными определениями в разных документах
-2. Найди термины, которые упоминаются без явного определения
+1. Проверь термины с разными определениями: это действительно конфликт или одно понятие, описанное с разных сторон
+2. Найди термины, которые используются в определениях других терминов, но сами не определены
 3. Найди синонимы/вариации терминов (одно понятие - разные названия)
 4. Оцени общую терминологическую согласованность
 
 Формат ответа в Markdown:
 
-## Тепловая карта терминологии
-
-| Категория | Количество | Статус |
-|-----------|------------|--------|
-| Согласованные термины | N | 🟢 |
-| Термины с вариациями | N | 🟡 |
-| Термины с конфликтами определений | N | 🔴 |
-
 ## 1. Термины с конфликтами определений
 
 ### 1.1. [TERM-001] «Название термина»
@@ -153,8 +216,8 @@ class AIAnalyzer:
 
 ## 3. Термины без определений
 
-- Термин 1 (упоминается в: док1, док2)
-- Термин 2 (упоминается в: док3)
+- Термин 1 (упоминается в определениях: термин A, термин B)
+- Термин 2 (упоминается в определениях: термин C)
 
 ## 4. Рекомендации по унификации
 
@@ -162,7 +225,7 @@ class AIAnalyzer:
 2. ...
 """
 
-        return self.analyze(prompt, terms_context)
+        return self.analyze(prompt, terms.reduce_context(TERMS_CONTEXT_CHARS))
 
     def analyze_recommendations(self, documents: List['Document'], by_family: Dict[str, List['Document']]) -> str:
         """Генерация рекомендаций по развитию хранилища."""
@@ -221,42 +284,6 @@ class AIAnalyzer:
 
         return self.analyze(prompt, stats_context)
 
-    def _extract_terms_context(self, documents: List['Document']) -> str:
-        """Извлечение контекста терминов из документов."""
-        context_parts = []
-
-        # Ищем документы с определениями (глоссарии, концепции)
-        priority_patterns = ["глоссарий", "термин", "определени", "концепц", "понятие"]
-
-        # Сначала приоритетные документы
-        priority_docs = []
-        other_docs = []
-
-        for doc in documents:
-            name_lower = doc.name.lower()
-            if any(p in name_lower for p in priority_patterns):
-                priority_docs.append(doc)
-            else:
-                other_docs.append(doc)
-
-        # Добавляем приоритетные полностью
-        for doc in priority_docs[:10]:
-            context_parts.append(f"### {doc.name}\n\n{doc.body[:3000]}")
-
-        # Добавляем выдержки из остальных
-        for doc in other_docs[:30]:
-            # Ищем определения (паттерны типа "X — это Y" или "X: Y")
-            definitions = re.findall(
-                r'(?:^|\n)([А-ЯЁA-Z][а-яёa-zA-Z\s]+?)(?:\s*[—–-]\s*|\s*:\s*)([^\n]{20,200})',
-                doc.body
-            )
-            if definitions:
-                context_parts.append(f"### {doc.name}\n")
-                for term, definition in definitions[:5]:
-                    context_parts.append(f"- **{term.strip()}**: {definition.strip()}")
-
-        return "\n\n".join(context_parts)[:15000]  # Ограничиваем контекст
-
     def _build_stats_context(self, documents: List['Document'], by_family: Dict[str, List['Document']]) -> str:
         """Построение контекста статистики для рекомендаций."""
         context = f"## Статистика хранилища\n\n"
@@ -302,55 +329,177 @@ FOLDER_TO_FAMILY = {
 }
 
 
+WIKILINK_RE = re.compile(r'\[\[([^\]|]+)(?:\|[^\]]+)?\]\]')
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.+)$', re.MULTILINE)
+COMMENT_RE = re.compile(r'<!--.*?-->', re.DOTALL)
+TODO_FIXME_RE = re.compile(r'TODO|FIXME', re.IGNORECASE)
+NUMBER_EXAMPLE_RE = re.compile(r'\d+[.,]?\d*\s*(%|руб|USD|слов|документов|человек)')
+TABLE_ROW_RE = re.compile(r'\|.*\|.*\|')  # Markdown таблицы
+DIAGRAM_RE = re.compile(r'```(mermaid|plantuml|graphviz)', re.IGNORECASE)
+STUB_MARKER_RE = re.compile(r'TODO|TBD|FIXME|\.\.\.', re.IGNORECASE)
+
+
+class DocumentFeatures:
+    """
+    Признаки документа, вычисляемые один раз при парсинге.
+
+    Отчёты обращаются к is_full/is_empty многократно (тепловые карты,
+    покрытие главного вопроса, рекомендации, карта связей — для каждой
+    ссылки), поэтому регулярные выражения по телу документа не должны
+    выполняться при каждом обращении.
+    """
+
+    __slots__ = ("words", "headings", "tables", "diagrams", "numbers",
+                 "stub_markers", "lines", "links", "clean_chars")
+
+    def __init__(self, body: str, headings: int, links: int):
+        self.words = len(body.split())
+        self.headings = headings
+        self.tables = len(TABLE_ROW_RE.findall(body))
+        self.diagrams = len(DIAGRAM_RE.findall(body))
+        self.numbers = len(NUMBER_EXAMPLE_RE.findall(body))
+        self.stub_markers = len(STUB_MARKER_RE.findall(body))
+        self.lines = body.count('\n') + 1
+        self.links = links
+        # Длина содержания без комментариев и TODO/FIXME (критерий пустого документа)
+        self.clean_chars = len(TODO_FIXME_RE.sub('', COMMENT_RE.sub('', body)).strip())
+
+    @property
+    def todo_ratio(self) -> float:
+        return self.stub_markers / self.lines if self.lines else 0.0
+
+    def values(self) -> tuple:
+        """Компактное представление для передачи из процесса парсинга."""
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    @classmethod
+    def from_values(cls, values: tuple) -> "DocumentFeatures":
+        features = cls.__new__(cls)
+        for name, value in zip(cls.__slots__, values):
+            setattr(features, name, value)
+        return features
+
+    def to_dict(self) -> Dict[str, Any]:
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values["todo_ratio"] = round(self.todo_ratio, 3)
+        return values
+
+
+def read_document(path: Path) -> Optional[str]:
+    """Текст документа (None — файл не прочитан)."""
+    try:
+        return path.read_text(encoding="utf-8")
+    except Exception as e:
+        print(f"⚠️  Ошибка чтения {path}: {e}")
+        return None
+
+
+def parse_content(content: str) -> tuple:
+    """
+    Парсинг текста документа: frontmatter, тело, ссылки, заголовки, признаки.
+
+    Результат компактный (тело — границы внутри content, признаки — кортеж),
+    чтобы при параллельном сканировании из процессов возвращалось меньше данных.
+
+    Returns:
+        (frontmatter, начало тела, конец тела, wikilinks, headings, признаки)
+    """
+    frontmatter: Dict[str, Any] = {}
+    start, end = 0, len(content)
+
+    # Парсинг frontmatter
+    if content.startswith("---"):
+        parts = content.split("---", 2)
+        if len(parts) >= 3:
+            try:
+                frontmatter = load_frontmatter(parts[1]) or {}
+            except yaml.YAMLError:
+                frontmatter = {}
+            raw_body = parts[2]
+            start = len(content) - len(raw_body.lstrip())
+            end = start + len(raw_body.strip())
+    body = content[start:end]
+
+    # Извлечение wikilinks
+    wikilinks = WIKILINK_RE.findall(body)
+
+    # Извлечение заголовков
+    headings = [(len(m.group(1)), m.group(2)) for m in HEADING_RE.finditer(body)]
+
+    features = DocumentFeatures(body, len(headings), len(wikilinks))
+    return frontmatter, start, end, wikilinks, headings, features.values()
+
+
+def list_document_files() -> List[Path]:
+    """Документы хранилища в порядке сканирования."""
+    return [
+        md_file for md_file in CONTENT_DIR.rglob("*.md")
+        # Пропускаем служебные файлы
+        if not any(skip in str(md_file) for skip in [".obsidian", "node_modules", ".git"])
+        # и сами отчёты: иначе каждый запуск менял бы входные данные следующего
+        and not md_file.is_relative_to(REPORTS_DIR)
+    ]
+
+
+def generator_version() -> str:
+    """Хеш исходников генератора: изменение кода отчётов делает отпечатки недействительными."""
+    digest = hashlib.sha256()
+    for name in GENERATOR_SOURCES:
+        digest.update((OPS_DIR / name).read_bytes())
+    return digest.hexdigest()
+
+
+def vault_digest(files: List[Path]) -> str:
+    """Хеш хранилища: пути и содержимое документов, структура папок."""
+    digest = hashlib.sha256()
+    for path in sorted(files, key=str):
+        digest.update(str(path.relative_to(CONTENT_DIR)).encode("utf-8") + b"\0")
+        try:
+            digest.update(hashlib.sha256(path.read_bytes()).digest())
+        except OSError:
+            digest.update(b"unreadable")
+    # Дубли папок ищутся и среди папок без документов; папка отчётов создаётся при сохранении
+    report_folders = {REPORTS_DIR, *REPORTS_DIR.parents}
+    folders = sorted(
+        str(folder.relative_to(CONTENT_DIR)) for folder in CONTENT_DIR.rglob("*")
+        if folder.is_dir() and folder not in report_folders
+        and not any(skip in str(folder) for skip in [".obsidian", "node_modules", ".git"])
+    )
+    digest.update("\n".join(folders).encode("utf-8"))
+    return digest.hexdigest()
+
+
 class Document:
     """Представление документа хранилища."""
 
-    def __init__(self, path: Path):
+    __slots__ = ("path", "relative_path", "name", "content", "frontmatter", "body",
+                 "wikilinks", "headings", "family", "size", "features", "is_empty", "is_full")
+
+    def __init__(self, path: Path, content: Optional[str] = None, parsed: Optional[tuple] = None):
+        """
+        Args:
+            path: путь к файлу
+            content: уже прочитанный текст (None — читается здесь)
+            parsed: результат parse_content(content), если парсинг выполнен заранее
+        """
         self.path = path
         self.relative_path = path.relative_to(CONTENT_DIR) if path.is_relative_to(CONTENT_DIR) else path
         self.name = path.stem
-        self.content = ""
-        self.frontmatter: Dict[str, Any] = {}
-        self.body = ""
-        self.wikilinks: List[str] = []
-        self.headings: List[Tuple[int, str]] = []
-        self.family: Optional[str] = None
-        self.size = 0
-        self._parse()
-
-    def _parse(self):
-        """Парсинг документа: frontmatter, контент, ссылки."""
-        try:
-            self.content = self.path.read_text(encoding="utf-8")
-            self.size = len(self.content)
-        except Exception as e:
-            print(f"⚠️  Ошибка чтения {self.path}: {e}")
-            return
-
-        # Парсинг frontmatter
-        if self.content.startswith("---"):
-            parts = self.content.split("---", 2)
-            if len(parts) >= 3:
-                try:
-                    self.frontmatter = yaml.safe_load(parts[1]) or {}
-                except yaml.YAMLError:
-                    self.frontmatter = {}
-                self.body = parts[2].strip()
-            else:
-                self.body = self.content
-        else:
-            self.body = self.content
-
-        # Извлечение wikilinks
-        self.wikilinks = re.findall(r'\[\[([^\]|]+)(?:\|[^\]]+)?\]\]', self.body)
-
-        # Извлечение заголовков
-        self.headings = [(len(m.group(1)), m.group(2))
-                         for m in re.finditer(r'^(#{1,6})\s+(.+)$', self.body, re.MULTILINE)]
-
-        # Определение семейства
+        if content is None:
+            content = read_document(path)
+        self.content = content or ""
+        self.size = len(self.content)
+
+        if parsed is None:
+            parsed = parse_content(self.content)
+        self.frontmatter, start, end, self.wikilinks, self.headings, features = parsed
+        self.body = self.content[start:end]
         self.family = self._detect_family()
 
+        self.features = DocumentFeatures.from_values(features)
+        self.is_empty = self._check_empty()
+        self.is_full = self._check_full()
+
     def _detect_family(self) -> Optional[str]:
         """Определение семейства документа по пути и frontmatter."""
         # Приоритет: frontmatter
@@ -379,15 +528,11 @@ class Document:
 
         return None
 
-    @property
-    def is_empty(self) -> bool:
+    def _check_empty(self) -> bool:
         """Документ считается пустым, если контент < 200 символов или содержит только TODO."""
-        body_clean = re.sub(r'<!--.*?-->', '', self.body, flags=re.DOTALL)
-        body_clean = re.sub(r'TODO|FIXME', '', body_clean, flags=re.IGNORECASE)
-        return len(body_clean.strip()) < 200
+        return self.features.clean_chars < 200
 
-    @property
-    def is_full(self) -> bool:
+    def _check_full(self) -> bool:
         """
         Документ считается полным согласно обновленным ТЗ:
         - >500 слов реального содержания
@@ -396,31 +541,26 @@ class Document:
         - Не является заглушкой (<10% TODO/TBD)
         - Есть связи с другими документами
         """
+        features = self.features
+
         # Критерий 1: Объем >500 слов
-        word_count = len(self.body.split())
-        if word_count < 500:
+        if features.words < 500:
             return False
 
         # Критерий 2: Структура (≥3 заголовков)
-        if len(self.headings) < 3:
+        if features.headings < 3:
             return False
 
         # Критерий 3: Есть примеры (числа) ИЛИ визуализация (таблицы/диаграммы)
-        has_numbers = bool(re.search(r'\d+[.,]?\d*\s*(%|руб|USD|слов|документов|человек)', self.body))
-        has_tables = bool(re.search(r'\|.*\|.*\|', self.body))  # Markdown таблицы
-        has_diagrams = bool(re.search(r'```(mermaid|plantuml|graphviz)', self.body, re.IGNORECASE))
-        has_examples = has_numbers or has_tables or has_diagrams
-        if not has_examples:
+        if not (features.numbers or features.tables or features.diagrams):
             return False
 
         # Критерий 4: Не заглушка (<10% TODO/TBD)
-        todo_count = len(re.findall(r'TODO|TBD|FIXME|\.\.\.', self.body, re.IGNORECASE))
-        total_lines = len(self.body.split('\n'))
-        if total_lines > 0 and (todo_count / total_lines) > 0.1:
+        if features.todo_ratio > 0.1:
             return False
 
         # Критерий 5: Есть связи (wikilinks)
-        if len(self.wikilinks) == 0:
+        if features.links == 0:
             return False
 
         return True
@@ -434,6 +574,364 @@ class Document:
         return self.frontmatter.get("type", "unknown")
 
 
+NAME_TOKEN_RE = re.compile(r'\w+')
+
+# Метасимволы, при которых паттерн не разбирается на литералы (проверяется перебором)
+COMPLEX_PATTERN_RE = re.compile(r'[()\[\]{}\\^$]')
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _pattern_literals(alternative: str) -> List[str]:
+    """Обязательные фрагменты ветки паттерна: текст между «.», «*», «+», «?»."""
+    fragments = []
+    current = ""
+    for char in alternative:
+        if char in ".*+?":
+            if char in "*?" and current:
+                current = current[:-1]  # предыдущий символ необязателен
+            if current:
+                fragments.append(current)
+            current = ""
+        else:
+            current += char
+    if current:
+        fragments.append(current)
+    return fragments
+
+
+class DocumentIndex:
+    """
+    Индекс названий документов для поиска без перебора всего хранилища.
+
+    - точное название (нижний регистр) → документ;
+    - токен названия → названия, где он встречается (инвертированный индекс);
+    - триграмма названия → названия (поиск подстрок по паттернам);
+    - нечёткий индекс (fuzzy_match.py) по названиям, заголовкам H1 и aliases —
+      подсказки к битым ссылкам.
+
+    Индексируются уникальные названия в нижнем регистре; у каждого — список
+    документов в порядке сканирования, поэтому результаты совпадают
+    с линейным поиском по self.documents.
+    """
+
+    def __init__(self, documents: List[Document]):
+        self.documents = documents
+        self.by_name: Dict[str, Document] = {}
+        self.name_ids: Dict[str, int] = {}
+        self.names: List[str] = []        # уникальные названия в нижнем регистре
+        self.name_docs: List[List[int]] = []
+        self.tokens: Dict[str, set] = defaultdict(set)
+        self.trigrams: Dict[str, set] = defaultdict(set)
+        self.fuzzy = FuzzyIndex()
+        self._pattern_cache: Dict[str, Optional[Document]] = {}
+
+        for position, doc in enumerate(documents):
+            name = doc.name.lower()
+            self.by_name[name] = doc
+            name_id = self.name_ids.get(name)
+            if name_id is None:
+                name_id = self.name_ids[name] = len(self.names)
+                self.names.append(name)
+                self.name_docs.append([])
+                for token in NAME_TOKEN_RE.findall(name):
+                    self.tokens[token].add(name_id)
+                for gram in _trigrams(name):
+                    self.trigrams[gram].add(name_id)
+            self.name_docs[name_id].append(position)
+
+        # Сначала имена файлов: при совпадении ключей имя важнее заголовка или alias
+        for doc in documents:
+            self.fuzzy.add(doc.name, doc.name)
+        for doc in documents:
+            aliases = doc.frontmatter.get("aliases") or doc.frontmatter.get("alias") or []
+            if isinstance(aliases, str):
+                aliases = [aliases]
+            titles = [text for level, text in doc.headings if level == 1]
+            self.fuzzy.add_all((str(title) for title in titles + list(aliases) if title), doc.name)
+
+    def get(self, name: str) -> Optional[Document]:
+        """Документ с точно таким названием (без учёта регистра)."""
+        return self.by_name.get(name.lower())
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower() in self.by_name
+
+    def _containing(self, fragment: str) -> Optional[set]:
+        """Названия, содержащие фрагмент (None — фрагмент не сужает поиск)."""
+        if len(fragment) >= 3:
+            postings = [self.trigrams.get(gram, set()) for gram in _trigrams(fragment)]
+            return set.intersection(*sorted(postings, key=len))
+        if NAME_TOKEN_RE.fullmatch(fragment):
+            # Фрагмент из букв/цифр целиком лежит внутри одного токена названия
+            found = set()
+            for token, name_ids in self.tokens.items():
+                if fragment in token:
+                    found |= name_ids
+            return found
+        return None
+
+    def _pattern_candidates(self, pattern: str) -> Optional[set]:
+        """Названия, которые могут совпасть с паттерном (None — нужен полный перебор)."""
+        if COMPLEX_PATTERN_RE.search(pattern):
+            return None
+        candidates = set()
+        for alternative in pattern.lower().split("|"):
+            matched = None
+            for fragment in _pattern_literals(alternative):
+                found = self._containing(fragment)
+                if found is not None:
+                    matched = found if matched is None else matched & found
+            if matched is None:
+                return None
+            candidates |= matched
+        return candidates
+
+    def find_pattern(self, pattern: str) -> Optional[Document]:
+        """Первый документ (в порядке сканирования), название которого совпадает с паттерном."""
+        if pattern in self._pattern_cache:
+            return self._pattern_cache[pattern]
+
+        regex = re.compile(pattern, re.IGNORECASE)
+        name_ids = self._pattern_candidates(pattern)
+        if name_ids is None:
+            positions = range(len(self.documents))
+        else:
+            positions = sorted(position for name_id in name_ids for position in self.name_docs[name_id])
+
+        found = None
+        for position in positions:
+            if regex.search(self.documents[position].name):
+                found = self.documents[position]
+                break
+        self._pattern_cache[pattern] = found
+        return found
+
+    def suggest(self, name: str, limit: int = 3) -> List[str]:
+        """Названия документов, похожих на name (по убыванию сходства)."""
+        return [match.target for match in self.fuzzy.suggest(name, limit=limit)]
+
+
+FAMILY_IDS = ["F0", "F1", "F2", "F3", "F4", "F5", "F6", "F7", "F8", "F9"]
+
+
+class VaultAnalysis:
+    """
+    Общий анализ хранилища для всех отчётов.
+
+    Граф ссылок, агрегаты по семействам, связность документов и списки
+    технических проблем вычисляются один раз после сканирования; генераторы
+    отчётов только форматируют эти данные и не меняют их, поэтому при
+    --report all могут работать параллельно.
+    """
+
+    def __init__(self, documents: List[Document], by_family: Dict[str, List[Document]], index: DocumentIndex):
+        self.documents = documents
+        self.total = len(documents)
+        self.index = index
+
+        # Граф ссылок
+        self.incoming: Dict[str, int] = defaultdict(int)
+        for doc in documents:
+            for link in doc.wikilinks:
+                self.incoming[link.lower()] += 1
+        self.total_wikilinks = sum(len(doc.wikilinks) for doc in documents)
+        self.isolated = [doc for doc in documents if not doc.wikilinks]
+        self.docs_with_links = self.total - len(self.isolated)
+
+        # Полнота
+        self.full_count = sum(1 for doc in documents if doc.is_full)
+        self.families: Dict[str, Dict[str, Any]] = {}
+        for family_id in FAMILY_IDS:
+            docs = by_family.get(family_id, [])
+            full = sum(1 for doc in docs if doc.is_full)
+            with_links = sum(1 for doc in docs if doc.wikilinks)
+            self.families[family_id] = {
+                "docs": docs,
+                "count": len(docs),
+                "full": full,
+                "full_ratio": full / len(docs) if docs else 0,
+                "with_links": with_links,
+                "links_ratio": with_links / len(docs) if docs else 0,
+            }
+
+        # Технические проблемы
+        self.duplicate_folders = self._find_duplicate_folders()
+        self.duplicate_documents = self._find_duplicate_documents()
+        self.broken_links = self._find_broken_links()
+        self.missing_metadata = self._find_missing_metadata()
+
+        # Связность каждого документа (по убыванию числа связей)
+        self.link_stats = self._compute_link_stats()
+
+        # Граф ссылок (CSR): центральность, кластеры, ссылки между семействами
+        self.graph = LinkGraph.from_links([doc.name for doc in documents], [doc.wikilinks for doc in documents])
+        self.pagerank = self.graph.pagerank()
+        self.hubs, self.authorities = self.graph.hits()
+        self.strong_components = LinkGraph.groups(self.graph.strongly_connected_components())
+        self.weak_components = LinkGraph.groups(self.graph.weakly_connected_components())
+        self.stub_only_linked = self.graph.only_linked_from([doc.is_empty for doc in documents])
+        self.family_links = self.graph.cross_matrix([doc.family for doc in documents], FAMILY_IDS)
+
+    def _find_duplicate_folders(self) -> List[Tuple[str, List[str], str]]:
+        """Поиск папок с одинаковыми названиями или номерами.
+
+        Возвращает список кортежей: (ключ_дубля, [пути], тип_дубля)
+        Типы: 'number' (одинаковый номер раздела), 'name' (одинаковое название)
+        """
+        # Сканируем ВСЕ папки рекурсивно, а не только родителей документов
+        all_folders = set()
+        for folder in CONTENT_DIR.rglob("*"):
+            if folder.is_dir():
+                # Пропускаем служебные папки
+                if any(skip in str(folder) for skip in [".obsidian", "node_modules", ".git"]):
+                    continue
+                if folder != CONTENT_DIR:
+                    all_folders.add(folder)
+
+        # Словари для поиска дублей
+        folder_numbers = defaultdict(list)  # номер раздела -> пути
+        folder_names = defaultdict(list)    # название (без номера) -> пути
+
+        for folder in all_folders:
+            rel_path = str(folder.relative_to(CONTENT_DIR))
+            folder_name = folder.name
+
+            # Извлекаем номер раздела (например, "0.4.1." из "0.4.1. Название")
+            number_match = re.match(r'^(\d+(?:\.\d+)*\.?)\s*', folder_name)
+            if number_match:
+                section_number = number_match.group(1).rstrip('.')  # "0.4.1"
+                folder_numbers[section_number].append(rel_path)
+
+            # Извлекаем название без номера
+            name = re.sub(r'^\d+(?:\.\d+)*\.?\s*', '', folder_name).lower().strip()
+            if name:
+                folder_names[name].append(rel_path)
+
+        duplicates = []
+
+        # Дублирование номеров разделов (критично!)
+        for number, paths in folder_numbers.items():
+            unique_paths = list(set(paths))
+            if len(unique_paths) > 1:
+                duplicates.append((f"Номер {number}", unique_paths, "number"))
+
+        # Дублирование названий
+        for name, paths in folder_names.items():
+            unique_paths = list(set(paths))
+            if len(unique_paths) > 1:
+                duplicates.append((name, unique_paths, "name"))
+
+        return duplicates
+
+    def _find_duplicate_documents(self) -> List[Tuple[str, List[str], str]]:
+        """Поиск документов с одинаковыми названиями."""
+        doc_names = defaultdict(list)
+
+        for doc in self.documents:
+            # Убираем номер раздела из названия
+            name = re.sub(r'\s*\d+\.\d+\.?$', '', doc.name).lower().strip()
+            doc_names[name].append(str(doc.relative_path))
+
+        duplicates = []
+        for name, paths in doc_names.items():
+            if len(paths) > 1:
+                # Определяем тип дубля
+                dup_type = "exact" if len(set(paths)) == len(paths) else "similar"
+                duplicates.append((name, paths, dup_type))
+
+        return duplicates
+
+    def _find_broken_links(self, limit: int = 50) -> List[Tuple[str, str, List[str]]]:
+        """Поиск битых wikilinks (подсказки ищутся только для выводимых)."""
+        broken = []
+        for doc in self.documents:
+            for link in doc.wikilinks:
+                # Проверяем существование
+                if link not in self.index:
+                    # Ищем похожие
+                    broken.append((str(doc.relative_path), link, self.index.suggest(link)))
+                    if len(broken) == limit:
+                        return broken  # Ограничиваем вывод
+
+        return broken
+
+    def _find_missing_metadata(self) -> List[Tuple[str, List[str]]]:
+        """Поиск документов без обязательных метаданных."""
+        required_fields = ["type", "status"]
+
+        missing = []
+        for doc in self.documents:
+            absent = [f for f in required_fields if f not in doc.frontmatter]
+            if absent:
+                missing.append((str(doc.relative_path), absent))
+
+        return missing[:30]  # Ограничиваем вывод
+
+    def _compute_link_stats(self) -> List[Dict[str, Any]]:
+        """
+        Связность документов согласно обновленному ТЗ 0.4.1:
+        входящие/исходящие связи и доля полных связанных документов.
+        """
+        doc_stats = []
+        for doc in self.documents:
+            # Исходящие связи
+            outgoing = len(doc.wikilinks)
+
+            # Входящие связи
+            incoming_count = self.incoming.get(doc.name.lower(), 0)
+
+            # Всего связей
+            total_links = incoming_count + outgoing
+
+            # Текстовые связи (wikilinks в теле документа, не в frontmatter)
+            text_links = len(doc.wikilinks)  # Все wikilinks уже из текста
+
+            # Процент полных связанных документов
+            linked_full_count = 0
+            linked_total = 0
+            for link in doc.wikilinks:
+                linked_doc = self.index.get(link)
+                if linked_doc:
+                    linked_total += 1
+                    if linked_doc.is_full:
+                        linked_full_count += 1
+
+            full_linked_ratio = (linked_full_count / linked_total * 100) if linked_total > 0 else 0
+
+            # Определение статуса согласно ЖЕСТКИМ критериям ТЗ
+            # 🟢 Хорошо связан: ≥5 связей + ≥70% текстовых + ≥70% связанных полные
+            # 🟡 Слабо связан: 3-4 связи + ≥40% текстовых + ≥50% связанных полные
+            # 🔴 Изолирован (ПО УМОЛЧАНИЮ): ≤2 связей ИЛИ связи нерелевантны/неполные
+
+            if (total_links >= 5 and
+                text_links >= total_links * 0.7 and
+                full_linked_ratio >= 70):
+                status = "🟢"
+            elif (total_links >= 3 and
+                  text_links >= total_links * 0.4 and
+                  full_linked_ratio >= 50):
+                status = "🟡"
+            else:
+                status = "🔴"
+
+            doc_stats.append({
+                'name': doc.name,
+                'total': total_links,
+                'text': text_links,
+                'incoming': incoming_count,
+                'outgoing': outgoing,
+                'full_linked_pct': int(full_linked_ratio),
+                'status': status
+            })
+
+        # Сортировка по количеству связей (убывание)
+        doc_stats.sort(key=lambda x: x['total'], reverse=True)
+        return doc_stats
+
+
 class ReportGenerator:
     """Базовый класс для генерации отчётов."""
 
@@ -443,6 +941,8 @@ class ReportGenerator:
         self.timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.git_hash = self._get_git_hash()
         self.ai_analyzer = ai_analyzer
+        self.index: Optional[DocumentIndex] = None
+        self.analysis: Optional[VaultAnalysis] = None
 
     def _get_git_hash(self) -> str:
         """Получение текущего git commit hash."""
@@ -455,21 +955,15 @@ class ReportGenerator:
         except:
             return "unknown"
 
-    def _get_weekly_growth_metrics(self) -> List[Dict[str, Any]]:
-        """Получение метрик роста репозитория за последние 4 недели.
-
-        Возвращает список словарей с метриками для каждой недели:
-        - week: номер недели (W-4, W-3, W-2, W-1) или "Сейчас"
-        - date: дата последнего коммита недели
-        - files: количество .md файлов
-        - lines: количество строк
-        - chars: количество символов
+    def _weekly_commits(self) -> List[Tuple[str, str, str]]:
+        """Коммиты для динамики роста: (неделя, дата, коммит) на конец каждой
+        из последних 4 недель и текущий HEAD («Сейчас»).
 
         Если история git короче 4 недель, использует первый коммит как начальную точку.
         """
         from datetime import timedelta
 
-        metrics = []
+        commits = []
         today = datetime.now()
 
         # Получаем дату первого коммита для определения доступной истории
@@ -511,45 +1005,10 @@ class ReportGenerator:
                     capture_output=True, text=True, check=True
                 )
                 commit_hash = result.stdout.strip()
-
-                if not commit_hash:
-                    continue
-
-                # Получаем список .md файлов в content/ на этот коммит
-                # Используем -c core.quotepath=false для корректной работы с кириллицей
-                result = subprocess.run(
-                    f"git -c core.quotepath=false ls-tree -r --name-only {commit_hash} -- content/ | grep '\\.md$'",
-                    shell=True, capture_output=True, text=True
-                )
-                md_files = [f for f in result.stdout.strip().split('\n') if f]
-
-                total_files = len(md_files)
-                total_lines = 0
-                total_chars = 0
-
-                # Подсчитываем строки и символы
-                for file_path in md_files:
-                    try:
-                        result = subprocess.run(
-                            ["git", "show", f"{commit_hash}:{file_path}"],
-                            capture_output=True, text=True
-                        )
-                        if result.returncode == 0:
-                            content = result.stdout
-                            total_lines += len(content.split('\n'))
-                            total_chars += len(content)
-                    except:
-                        pass
-
-                metrics.append({
-                    'week': f"W-{week_offset}",
-                    'date': date_str,
-                    'files': total_files,
-                    'lines': total_lines,
-                    'chars': total_chars
-                })
-            except Exception as e:
+            except Exception:
                 continue
+            if commit_hash:
+                commits.append((f"W-{week_offset}", date_str, commit_hash))
 
         # Добавляем текущее состояние (Сейчас)
         try:
@@ -557,63 +1016,154 @@ class ReportGenerator:
                 ["git", "rev-parse", "HEAD"],
                 capture_output=True, text=True, check=True
             )
-            commit_hash = result.stdout.strip()
+            commits.append(("Сейчас", today.strftime("%Y-%m-%d"), result.stdout.strip()))
+        except:
+            pass
 
-            # Используем -c core.quotepath=false для корректной работы с кириллицей
-            result = subprocess.run(
-                f"git -c core.quotepath=false ls-tree -r --name-only {commit_hash} -- content/ | grep '\\.md$'",
-                shell=True, capture_output=True, text=True
-            )
-            md_files = [f for f in result.stdout.strip().split('\n') if f]
-
-            total_files = len(md_files)
-            total_lines = 0
-            total_chars = 0
-
-            for file_path in md_files:
-                try:
-                    result = subprocess.run(
-                        ["git", "show", f"{commit_hash}:{file_path}"],
-                        capture_output=True, text=True
-                    )
-                    if result.returncode == 0:
-                        content = result.stdout
-                        total_lines += len(content.split('\n'))
-                        total_chars += len(content)
-                except:
-                    pass
+        return commits
+
+    @staticmethod
+    def _content_totals(commit_hash: str) -> Tuple[int, int, int]:
+        """Число .md файлов в content/, строк и символов на коммит."""
+        # Используем -c core.quotepath=false для корректной работы с кириллицей
+        result = subprocess.run(
+            f"git -c core.quotepath=false ls-tree -r --name-only {commit_hash} -- content/ | grep '\\.md$'",
+            shell=True, capture_output=True, text=True
+        )
+        md_files = [f for f in result.stdout.strip().split('\n') if f]
+
+        total_lines = 0
+        total_chars = 0
+
+        # Подсчитываем строки и символы
+        for file_path in md_files:
+            try:
+                result = subprocess.run(
+                    ["git", "show", f"{commit_hash}:{file_path}"],
+                    capture_output=True, text=True
+                )
+                if result.returncode == 0:
+                    content = result.stdout
+                    total_lines += len(content.split('\n'))
+                    total_chars += len(content)
+            except:
+                pass
+
+        return len(md_files), total_lines, total_chars
+
+    def _get_weekly_growth_metrics(self) -> List[Dict[str, Any]]:
+        """Получение метрик роста репозитория за последние 4 недели.
 
+        Возвращает список словарей с метриками для каждой недели:
+        - week: номер недели (W-4, W-3, W-2, W-1) или "Сейчас"
+        - date: дата последнего коммита недели
+        - files: количество .md файлов
+        - lines: количество строк
+        - chars: количество символов
+        """
+        metrics = []
+        for week, date_str, commit_hash in self._weekly_commits():
+            try:
+                total_files, total_lines, total_chars = self._content_totals(commit_hash)
+            except Exception:
+                continue
             metrics.append({
-                'week': "Сейчас",
-                'date': today.strftime("%Y-%m-%d"),
+                'week': week,
+                'date': date_str,
                 'files': total_files,
                 'lines': total_lines,
                 'chars': total_chars
             })
-        except:
-            pass
-
         return metrics
 
-    def scan_documents(self):
-        """Сканирование всех документов в хранилище."""
+    def _weekly_content_trees(self) -> List[Tuple[str, str]]:
+        """Хеши дерева content/ на коммитах динамики роста (меняются только вместе с содержимым)."""
+        trees = []
+        for week, _, commit_hash in self._weekly_commits():
+            result = subprocess.run(
+                ["git", "rev-parse", "--verify", "-q", f"{commit_hash}:content"],
+                capture_output=True, text=True
+            )
+            trees.append((week, result.stdout.strip()))
+        return trees
+
+    def report_fingerprints(self, report_types: List[str]) -> Dict[str, str]:
+        """
+        Отпечатки входных данных отчётов: версия генератора, хеши документов
+        и структуры папок, режим AI-анализа; для архитектурного слепка —
+        ещё история content/, по которой считается динамика роста.
+        """
+        inputs = {
+            "generator": generator_version(),
+            "vault": vault_digest(list_document_files()),
+            "ai_analysis": self.ai_analyzer is not None,
+        }
+        fingerprints = {}
+        for report_type in report_types:
+            report_inputs = dict(inputs, report=report_type)
+            if report_type == "architecture-snapshot":
+                report_inputs["history"] = self._weekly_content_trees()
+            canonical = json.dumps(report_inputs, ensure_ascii=False, sort_keys=True)
+            fingerprints[report_type] = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+        return fingerprints
+
+    def scan_documents(self, jobs: int = 1):
+        """
+        Сканирование всех документов в хранилище.
+
+        Args:
+            jobs: процессов для парсинга (1 — последовательно). При jobs > 1
+                файлы читаются пулом потоков, YAML и регулярные выражения
+                выполняются пулом процессов; порядок документов тот же,
+                что и при последовательном сканировании.
+        """
         print("📂 Сканирование документов...")
 
-        for md_file in CONTENT_DIR.rglob("*.md"):
-            # Пропускаем служебные файлы
-            if any(skip in str(md_file) for skip in [".obsidian", "node_modules", ".git"]):
-                continue
+        files = list_document_files()
 
-            doc = Document(md_file)
-            self.documents.append(doc)
+        started = time.perf_counter()
+        if jobs > 1 and len(files) > 1:
+            self.documents = self._scan_parallel(files, jobs)
+            mode = f"параллельно, процессов: {jobs}"
+        else:
+            self.documents = [Document(md_file) for md_file in files]
+            mode = "последовательно"
+        elapsed = time.perf_counter() - started
 
+        for doc in self.documents:
             if doc.family:
                 self.by_family[doc.family].append(doc)
 
+        megabytes = sum(len(doc.content.encode("utf-8")) for doc in self.documents) / 1024 / 1024
         print(f"   Найдено документов: {len(self.documents)}")
+        print(f"   Парсинг ({mode}): {elapsed:.2f} с, "
+              f"{len(self.documents) / max(elapsed, 1e-9):.0f} док/с, {megabytes / max(elapsed, 1e-9):.1f} МБ/с")
         for family, docs in sorted(self.by_family.items()):
             print(f"   {family}: {len(docs)}")
 
+        started = time.perf_counter()
+        self.index = DocumentIndex(self.documents)
+        self.analysis = VaultAnalysis(self.documents, self.by_family, self.index)
+        print(f"   Анализ хранилища: {time.perf_counter() - started:.2f} с")
+
+    @staticmethod
+    def _scan_parallel(files: List[Path], jobs: int) -> List[Document]:
+        """Чтение файлов потоками и парсинг процессами; документы — в порядке files."""
+        contents: List[Optional[str]] = []
+
+        def read_all(io_pool):
+            # Тексты отдаются на парсинг по мере чтения, порядок сохраняется
+            for content in io_pool.map(read_document, files):
+                contents.append(content)
+                yield content or ""
+
+        chunksize = max(1, len(files) // (jobs * 8))
+        with ThreadPoolExecutor(max_workers=min(32, jobs * 4)) as io_pool, \
+                ProcessPoolExecutor(max_workers=jobs) as parse_pool:
+            parsed = list(parse_pool.map(parse_content, read_all(io_pool), chunksize=chunksize))
+
+        return [Document(path, content or "", result) for path, content, result in zip(files, contents, parsed)]
+
     def generate(self, report_type: str) -> str:
         """Генерация отчёта указанного типа."""
         generators = {
@@ -741,23 +1291,21 @@ class ReportGenerator:
 
         status_counts = {"🟢": 0, "🟡": 0, "🔴": 0}
 
-        for family_id in ["F0", "F1", "F2", "F3", "F4", "F5", "F6", "F7", "F8", "F9"]:
+        for family_id in FAMILY_IDS:
             family = FAMILIES[family_id]
-            docs = self.by_family.get(family_id, [])
-            count = len(docs)
+            stats = self.analysis.families[family_id]
+            docs = stats["docs"]
+            count = stats["count"]
 
             # Анализ СОДЕРЖАНИЯ документов согласно обновленному ТЗ 0.4.1
             # Критерии полноты: >500 слов + структура + примеры + диаграммы + связи
             typical_patterns = typical_docs.get(family_id, [])
-            full_docs_count = 0  # Документы, удовлетворяющие is_full
+            full_docs_count = stats["full"]  # Документы, удовлетворяющие is_full
             typical_full_docs = 0  # Типичные документы, которые полные
 
             for doc in docs:
-                # Проверяем полноту документа (используем is_full property)
+                # Проверяем, является ли полный документ типичным для семейства
                 if doc.is_full:
-                    full_docs_count += 1
-
-                    # Проверяем, является ли документ типичным для семейства
                     doc_name_lower = doc.name.lower()
                     for pattern in typical_patterns:
                         if pattern in doc_name_lower:
@@ -771,15 +1319,14 @@ class ReportGenerator:
             # 🔴 Минимальный (ПО УМОЛЧАНИЮ): <50% типичных документов полные
 
             typical_count = len(typical_patterns)
-            full_ratio = full_docs_count / count if count > 0 else 0
+            full_ratio = stats["full_ratio"]
             typical_full_ratio = typical_full_docs / typical_count if typical_count > 0 else 0
 
             # Проверяем главный вопрос семейства (анализ содержания)
             main_question_covered = self._check_main_question_coverage(family_id, docs, main_questions.get(family_id, ""))
 
             # Проверяем процент документов со связями
-            docs_with_links = sum(1 for doc in docs if len(doc.wikilinks) > 0)
-            links_ratio = docs_with_links / count if count > 0 else 0
+            links_ratio = stats["links_ratio"]
 
             # Критерии статуса:
             # 🟢 Полный: ≥80% документов полные
@@ -1233,13 +1780,12 @@ class ReportGenerator:
 
         def cell_status(family_id):
             """Оценка статуса ячейки на основе процента полных документов."""
-            docs = self.by_family.get(family_id, [])
-            if not docs:
+            stats = self.analysis.families[family_id]
+            if not stats["count"]:
                 return "🔴", 0
 
-            # Подсчет ПОЛНЫХ документов
-            full_docs = [d for d in docs if d.is_full]
-            full_ratio = len(full_docs) / len(docs)
+            # Доля ПОЛНЫХ документов
+            full_ratio = stats["full_ratio"]
 
             # Критерии статуса:
             # 🟢 Полный: ≥80% документов полные
@@ -1277,19 +1823,12 @@ class ReportGenerator:
     def _completeness_summary(self) -> str:
         """Executive Summary для содержательной полноты."""
         # Общий % полных документов
-        full_docs = sum(1 for d in self.documents if d.is_full)
-        total_docs = len(self.documents)
+        full_docs = self.analysis.full_count
+        total_docs = self.analysis.total
         completeness = int(full_docs / total_docs * 100) if total_docs > 0 else 0
 
         # % полных документов по каждому семейству (F1-F9)
-        family_ratios = {}
-        for f in ["F1", "F2", "F3", "F4", "F5", "F6", "F7", "F8", "F9"]:
-            docs = self.by_family.get(f, [])
-            if docs:
-                full_count = sum(1 for d in docs if d.is_full)
-                family_ratios[f] = full_count / len(docs)
-            else:
-                family_ratios[f] = 0
+        family_ratios = {f: self.analysis.families[f]["full_ratio"] for f in FAMILY_IDS[1:]}
 
         best = max(family_ratios, key=family_ratios.get)
         worst = min(family_ratios, key=family_ratios.get)
@@ -1432,11 +1971,11 @@ class ReportGenerator:
         """Генерация отчёта 'Противоречия и несогласованности хранилища'."""
         report = self._header("Противоречия и несогласованности хранилища")
 
-        # Собираем проблемы
-        dup_folders = self._find_duplicate_folders()
-        dup_docs = self._find_duplicate_documents()
-        broken_links = self._find_broken_links()
-        missing_metadata = self._find_missing_metadata()
+        # Проблемы собраны общим анализом
+        dup_folders = self.analysis.duplicate_folders
+        dup_docs = self.analysis.duplicate_documents
+        broken_links = self.analysis.broken_links
+        missing_metadata = self.analysis.missing_metadata
 
         # Тепловая карта
         report += self._technical_heatmap(dup_folders, dup_docs, broken_links, missing_metadata)
@@ -1495,104 +2034,6 @@ class ReportGenerator:
 
         return heatmap + "\n---\n\n"
 
-    def _find_duplicate_folders(self) -> List[Tuple[str, List[str], str]]:
-        """Поиск папок с одинаковыми названиями или номерами.
-
-        Возвращает список кортежей: (ключ_дубля, [пути], тип_дубля)
-        Типы: 'number' (одинаковый номер раздела), 'name' (одинаковое название)
-        """
-        # Сканируем ВСЕ папки рекурсивно, а не только родителей документов
-        all_folders = set()
-        for folder in CONTENT_DIR.rglob("*"):
-            if folder.is_dir():
-                # Пропускаем служебные папки
-                if any(skip in str(folder) for skip in [".obsidian", "node_modules", ".git"]):
-                    continue
-                if folder != CONTENT_DIR:
-                    all_folders.add(folder)
-
-        # Словари для поиска дублей
-        folder_numbers = defaultdict(list)  # номер раздела -> пути
-        folder_names = defaultdict(list)    # название (без номера) -> пути
-
-        for folder in all_folders:
-            rel_path = str(folder.relative_to(CONTENT_DIR))
-            folder_name = folder.name
-
-            # Извлекаем номер раздела (например, "0.4.1." из "0.4.1. Название")
-            number_match = re.match(r'^(\d+(?:\.\d+)*\.?)\s*', folder_name)
-            if number_match:
-                section_number = number_match.group(1).rstrip('.')  # "0.4.1"
-                folder_numbers[section_number].append(rel_path)
-
-            # Извлекаем название без номера
-            name = re.sub(r'^\d+(?:\.\d+)*\.?\s*', '', folder_name).lower().strip()
-            if name:
-                folder_names[name].append(rel_path)
-
-        duplicates = []
-
-        # Дублирование номеров разделов (критично!)
-        for number, paths in folder_numbers.items():
-            unique_paths = list(set(paths))
-            if len(unique_paths) > 1:
-                duplicates.append((f"Номер {number}", unique_paths, "number"))
-
-        # Дублирование названий
-        for name, paths in folder_names.items():
-            unique_paths = list(set(paths))
-            if len(unique_paths) > 1:
-                duplicates.append((name, unique_paths, "name"))
-
-        return duplicates
-
-    def _find_duplicate_documents(self) -> List[Tuple[str, List[str], str]]:
-        """Поиск документов с одинаковыми названиями."""
-        doc_names = defaultdict(list)
-
-        for doc in self.documents:
-            # Убираем номер раздела из названия
-            name = re.sub(r'\s*\d+\.\d+\.?$', '', doc.name).lower().strip()
-            doc_names[name].append(str(doc.relative_path))
-
-        duplicates = []
-        for name, paths in doc_names.items():
-            if len(paths) > 1:
-                # Определяем тип дубля
-                dup_type = "exact" if len(set(paths)) == len(paths) else "similar"
-                duplicates.append((name, paths, dup_type))
-
-        return duplicates
-
-    def _find_broken_links(self) -> List[Tuple[str, str, str]]:
-        """Поиск битых wikilinks."""
-        # Собираем все имена документов
-        doc_names = {doc.name.lower(): doc.name for doc in self.documents}
-
-        broken = []
-        for doc in self.documents:
-            for link in doc.wikilinks:
-                link_lower = link.lower()
-                # Проверяем существование
-                if link_lower not in doc_names:
-                    # Ищем похожие
-                    similar = self._find_similar_name(link, doc_names.values())
-                    broken.append((str(doc.relative_path), link, similar or "не найден"))
-
-        return broken[:50]  # Ограничиваем вывод
-
-    def _find_missing_metadata(self) -> List[Tuple[str, List[str]]]:
-        """Поиск документов без обязательных метаданных."""
-        required_fields = ["type", "status"]
-
-        missing = []
-        for doc in self.documents:
-            absent = [f for f in required_fields if f not in doc.frontmatter]
-            if absent:
-                missing.append((str(doc.relative_path), absent))
-
-        return missing[:30]  # Ограничиваем вывод
-
     def _technical_dup_folders(self, duplicates) -> str:
         section = "## 2. Дублирование папок\n\n"
 
@@ -1654,9 +2095,10 @@ class ReportGenerator:
         section += "| № | Документ | Ссылка | Рекомендация |\n"
         section += "|---|----------|--------|-------------|\n"
 
-        for i, (doc_path, link, suggestion) in enumerate(broken[:20], 1):
+        for i, (doc_path, link, suggestions) in enumerate(broken[:20], 1):
             doc_short = doc_path.split("/")[-1][:30]
-            section += f"| {i} | {doc_short} | `[[{link[:30]}]]` | {suggestion[:30]} |\n"
+            suggestion = "<br>".join(name[:30] for name in suggestions) or "не найден"
+            section += f"| {i} | {doc_short} | `[[{link[:30]}]]` | {suggestion} |\n"
 
         if len(broken) > 20:
             section += f"\n*... и ещё {len(broken) - 20} битых ссылок*\n"
@@ -1687,20 +2129,29 @@ class ReportGenerator:
         """Генерация отчёта по терминологической согласованности."""
         report = self._header("Терминологическая согласованность")
 
+        # Map-reduce по всем документам: локальное извлечение определений,
+        # LLM — только для фрагментов, где регулярные выражения ничего не нашли
+        if self.ai_analyzer:
+            print("   🤖 Выполняется AI-анализ терминологии...")
+        terms = collect_terms(
+            ((doc.name, doc.body) for doc in self.documents),
+            llm_extract=self.ai_analyzer.extract_terms if self.ai_analyzer else None
+        )
+        report += terms.render_table()
+
         if not self.ai_analyzer:
-            report += "*Этот отчёт требует AI-анализа для сравнения определений терминов.*\n\n"
+            report += "*Таблица собрана без AI: сравнение определений и поиск синонимов требуют AI-анализа.*\n\n"
             report += "Запустите с флагом `--ai-analysis` для полного анализа:\n"
             report += "```bash\n"
             report += "python3 .ops/build_report.py --report terminology --ai-analysis\n"
             report += "```\n\n"
             report += "**Требования:**\n"
-            report += "- Установите: `pip install anthropic`\n"
+            report += "- Установите: `pip install httpx`\n"
             report += "- Задайте переменную окружения `ANTHROPIC_API_KEY`\n"
             return report
 
-        print("   🤖 Выполняется AI-анализ терминологии...")
-        ai_analysis = self.ai_analyzer.analyze_terminology(self.documents)
-        report += ai_analysis
+        report += "## AI-анализ терминологии\n\n"
+        report += self.ai_analyzer.analyze_terminology(terms)
 
         return report
 
@@ -1729,24 +2180,17 @@ class ReportGenerator:
     def _recommendations_heatmap(self) -> str:
         """Тепловая карта здоровья хранилища согласно ТЗ."""
         # Расчет показателей
-        full_docs = [d for d in self.documents if d.is_full]
-        full_docs_count = len(full_docs)
+        full_docs_count = self.analysis.full_count
         full_ratio = full_docs_count / len(self.documents) if self.documents else 0
 
-        docs_with_links = sum(1 for d in self.documents if len(d.wikilinks) > 0)
+        docs_with_links = self.analysis.docs_with_links
         links_ratio = docs_with_links / len(self.documents) if self.documents else 0
 
-        # Подсчет критических проблем (семейства с 🔴 статусом)
-        critical_families = 0
-        for family_id in ["F0", "F1", "F2", "F3", "F4", "F5", "F6", "F7", "F8", "F9"]:
-            docs = self.by_family.get(family_id, [])
-            if not docs:
-                critical_families += 1
-                continue
-            full_count = sum(1 for d in docs if d.is_full)
-            full_fam_ratio = full_count / len(docs)
-            if full_fam_ratio < 0.5:
-                critical_families += 1
+        # Подсчет критических проблем (семейства с 🔴 статусом, в т.ч. пустые)
+        critical_families = sum(
+            1 for stats in self.analysis.families.values()
+            if not stats["count"] or stats["full_ratio"] < 0.5
+        )
 
         # Взвешенная оценка здоровья (согласно ТЗ)
         # Вес показателей: полнота документов 40%, связность 30%, отсутствие проблем 30%
@@ -1797,20 +2241,19 @@ class ReportGenerator:
         metrics += "|-----------|------------|--------|---|--------|\n"
 
         for family_id in ["F0", "F1", "F2", "F3", "F4", "F5", "F6", "F7", "F8", "F9"]:
-            family = FAMILIES[family_id]
-            docs = self.by_family.get(family_id, [])
-            count = len(docs)
-            full_count = sum(1 for d in docs if d.is_full)
+            stats = self.analysis.families[family_id]
+            count = stats["count"]
+            full_count = stats["full"]
             full_pct = int(full_count / count * 100) if count > 0 else 0
             status = "🟢" if full_pct >= 80 else "🟡" if full_pct >= 50 else "🔴"
             metrics += f"| {family_id} | {count} | {full_count} | {full_pct}% | {status} |\n"
 
         metrics += "\n### 1.2. Связность документов\n\n"
-        docs_with_links = sum(1 for d in self.documents if len(d.wikilinks) > 0)
+        docs_with_links = self.analysis.docs_with_links
         isolated = len(self.documents) - docs_with_links
         metrics += f"- **Документов со связями:** {docs_with_links} ({int(docs_with_links/len(self.documents)*100)}%)\n"
         metrics += f"- **Изолированных документов:** {isolated} ({int(isolated/len(self.documents)*100)}%)\n"
-        metrics += f"- **Среднее связей на документ:** {sum(len(d.wikilinks) for d in self.documents) / len(self.documents):.1f}\n\n"
+        metrics += f"- **Среднее связей на документ:** {self.analysis.total_wikilinks / len(self.documents):.1f}\n\n"
 
         return metrics + "---\n\n"
 
@@ -1823,12 +2266,11 @@ class ReportGenerator:
         # Семейства с критическим статусом
         critical_families = []
         for family_id in ["F0", "F1", "F2", "F3", "F4", "F5", "F6", "F7", "F8", "F9"]:
-            docs = self.by_family.get(family_id, [])
-            if not docs:
+            stats = self.analysis.families[family_id]
+            if not stats["count"]:
                 critical_families.append((family_id, FAMILIES[family_id]['name'], 0, "Документы отсутствуют"))
                 continue
-            full_count = sum(1 for d in docs if d.is_full)
-            full_ratio = full_count / len(docs)
+            full_ratio = stats["full_ratio"]
             if full_ratio < 0.5:
                 critical_families.append((family_id, FAMILIES[family_id]['name'], int(full_ratio*100), f"Только {int(full_ratio*100)}% документов полные"))
 
@@ -1842,7 +2284,7 @@ class ReportGenerator:
             issues += "\n"
 
         # Изолированные документы
-        isolated = [d for d in self.documents if len(d.wikilinks) == 0]
+        isolated = self.analysis.isolated
         if len(isolated) > 50:
             critical_found = True
             issues += f"### 2.2. Массовая изоляция документов\n\n"
@@ -1864,12 +2306,11 @@ class ReportGenerator:
 
         # Проверка семейств с 0% полноты
         for family_id in ["F1", "F2", "F3", "F4", "F5", "F6", "F7", "F8", "F9"]:
-            docs = self.by_family.get(family_id, [])
-            if not docs:
+            stats = self.analysis.families[family_id]
+            if not stats["count"]:
                 continue
-            full_count = sum(1 for d in docs if d.is_full)
-            if full_count == 0:
-                urgent.append(f"**{family_id} ({FAMILIES[family_id]['name']}):** Наполнить семейство полными документами (сейчас 0/{len(docs)} полных)")
+            if stats["full"] == 0:
+                urgent.append(f"**{family_id} ({FAMILIES[family_id]['name']}):** Наполнить семейство полными документами (сейчас 0/{stats['count']} полных)")
 
         if urgent:
             for item in urgent[:3]:
@@ -1883,16 +2324,15 @@ class ReportGenerator:
 
         # Семейства с 1-49% полноты
         for family_id in ["F1", "F2", "F3", "F4", "F5", "F6", "F7", "F8", "F9"]:
-            docs = self.by_family.get(family_id, [])
-            if not docs:
+            stats = self.analysis.families[family_id]
+            if not stats["count"]:
                 continue
-            full_count = sum(1 for d in docs if d.is_full)
-            full_ratio = full_count / len(docs)
+            full_ratio = stats["full_ratio"]
             if 0 < full_ratio < 0.5:
                 important.append(f"**{family_id}:** Довести полноту до 50%+ (сейчас {int(full_ratio*100)}%)")
 
         # Связность
-        isolated_pct = sum(1 for d in self.documents if len(d.wikilinks) == 0) / len(self.documents)
+        isolated_pct = len(self.analysis.isolated) / len(self.documents)
         if isolated_pct > 0.5:
             important.append(f"**Связность:** Добавить wikilinks в изолированные документы (сейчас {int(isolated_pct*100)}% без связей)")
 
@@ -1919,70 +2359,8 @@ class ReportGenerator:
         """
         report = self._header("Карта связей между документами")
 
-        # Подсчет входящих ссылок
-        incoming = defaultdict(int)
-        for doc in self.documents:
-            for link in doc.wikilinks:
-                incoming[link.lower()] += 1
-
-        # Индекс документов по имени для быстрого поиска
-        doc_by_name = {d.name.lower(): d for d in self.documents}
-
-        # Анализ каждого документа
-        doc_stats = []
-        for doc in self.documents:
-            # Исходящие связи
-            outgoing = len(doc.wikilinks)
-
-            # Входящие связи
-            incoming_count = incoming.get(doc.name.lower(), 0)
-
-            # Всего связей
-            total_links = incoming_count + outgoing
-
-            # Текстовые связи (wikilinks в теле документа, не в frontmatter)
-            text_links = len(doc.wikilinks)  # Все wikilinks уже из текста
-
-            # Процент полных связанных документов
-            linked_full_count = 0
-            linked_total = 0
-            for link in doc.wikilinks:
-                linked_doc = doc_by_name.get(link.lower())
-                if linked_doc:
-                    linked_total += 1
-                    if linked_doc.is_full:
-                        linked_full_count += 1
-
-            full_linked_ratio = (linked_full_count / linked_total * 100) if linked_total > 0 else 0
-
-            # Определение статуса согласно ЖЕСТКИМ критериям ТЗ
-            # 🟢 Хорошо связан: ≥5 связей + ≥70% текстовых + ≥70% связанных полные
-            # 🟡 Слабо связан: 3-4 связи + ≥40% текстовых + ≥50% связанных полные
-            # 🔴 Изолирован (ПО УМОЛЧАНИЮ): ≤2 связей ИЛИ связи нерелевантны/неполные
-
-            if (total_links >= 5 and
-                text_links >= total_links * 0.7 and
-                full_linked_ratio >= 70):
-                status = "🟢"
-            elif (total_links >= 3 and
-                  text_links >= total_links * 0.4 and
-                  full_linked_ratio >= 50):
-                status = "🟡"
-            else:
-                status = "🔴"
-
-            doc_stats.append({
-                'name': doc.name,
-                'total': total_links,
-                'text': text_links,
-                'incoming': incoming_count,
-                'outgoing': outgoing,
-                'full_linked_pct': int(full_linked_ratio),
-                'status': status
-            })
-
-        # Сортировка по количеству связей (убывание)
-        doc_stats.sort(key=lambda x: x['total'], reverse=True)
+        # Связность документов посчитана общим анализом (по убыванию числа связей)
+        doc_stats = self.analysis.link_stats
 
         # Подсчет статусов
         status_counts = {"🟢": 0, "🟡": 0, "🔴": 0}
@@ -2063,17 +2441,107 @@ class ReportGenerator:
 
         report += "\n---\n\n"
 
+        # Секция 5: Структура графа (PageRank, HITS, компоненты)
+        report += self._links_map_graph_structure()
+
         return report
 
+    def _links_map_graph_structure(self) -> str:
+        """Секция карты связей по графу ссылок: центральность, кластеры, семейства."""
+        analysis = self.analysis
+        graph = analysis.graph
+        documents = analysis.documents
+        section = "## 5. Структура графа связей\n\n"
+
+        if not documents:
+            return section + "*Документов нет*\n\n---\n\n"
+
+        weak = analysis.weak_components
+        largest = weak[0]
+        clusters = [component for component in weak[1:] if len(component) > 1]
+        singletons = sum(1 for component in weak if len(component) == 1)
+        cycles = [component for component in analysis.strong_components if len(component) > 1]
+
+        section += f"- **Уникальных ссылок между документами:** {graph.edge_count}\n"
+        section += (f"- **Крупнейший связный кластер:** {len(largest)} документов "
+                    f"({int(len(largest) / len(documents) * 100)}%)\n")
+        section += f"- **Отдельных кластеров (2+ документа):** {len(clusters)}\n"
+        section += f"- **Документов без единой связи:** {singletons}\n"
+        section += (f"- **Групп взаимно достижимых документов:** {len(cycles)}"
+                    + (f" (крупнейшая — {len(cycles[0])} документов)" if cycles else "") + "\n\n")
+
+        # Оценки — относительно среднего документа (1.0 — средний)
+        scale = len(documents)
+
+        def label(node: int) -> str:
+            # Одноимённые документы различаются папкой
+            doc = documents[node]
+            if len(analysis.index.name_docs[analysis.index.name_ids[doc.name.lower()]]) > 1:
+                return f"[[{doc.name}]] ({doc.relative_path.parent.name[:30]})"
+            return f"[[{doc.name}]]"
+
+        def top(scores: List[float]) -> List[int]:
+            return sorted(range(len(documents)), key=lambda node: (-scores[node], node))[:10]
+
+        section += "### 5.1. Центральность (PageRank)\n\n"
+        section += "*Оценки относительно среднего документа: 1.0 — средний.*\n\n"
+        section += "| № | Документ | PageRank | Авторитет | Ссылающихся документов |\n"
+        section += "|---|----------|----------|-----------|------------------------|\n"
+        for i, node in enumerate(top(analysis.pagerank), 1):
+            section += (f"| {i} | {label(node)} | {analysis.pagerank[node] * scale:.2f} | "
+                        f"{analysis.authorities[node] * scale:.2f} | {graph.in_degree(node)} |\n")
+
+        section += "\n### 5.2. Навигационные хабы (HITS)\n\n"
+        section += "*Документы, которые ссылаются на самые важные документы.*\n\n"
+        section += "| № | Документ | Хаб | Исходящих ссылок |\n"
+        section += "|---|----------|-----|------------------|\n"
+        for i, node in enumerate(top(analysis.hubs), 1):
+            if not analysis.hubs[node]:
+                break
+            section += f"| {i} | {label(node)} | {analysis.hubs[node] * scale:.2f} | {graph.out_degree(node)} |\n"
+
+        section += f"\n### 5.3. Отдельные кластеры ({len(clusters)})\n\n"
+        if clusters:
+            section += "*Группы документов, не связанные с основным кластером ни в одну сторону.*\n\n"
+            section += "| № | Документов | Документы |\n"
+            section += "|---|------------|-----------|\n"
+            for i, component in enumerate(clusters[:10], 1):
+                names = ", ".join(documents[node].name[:40] for node in component[:3])
+                more = f" и ещё {len(component) - 3}" if len(component) > 3 else ""
+                section += f"| {i} | {len(component)} | {names}{more} |\n"
+            if len(clusters) > 10:
+                section += f"\n*... и ещё {len(clusters) - 10} кластеров*\n"
+        else:
+            section += "*Все связанные документы входят в один кластер* 🟢\n"
+
+        stub_only = analysis.stub_only_linked
+        section += f"\n### 5.4. Документы, на которые ссылаются только заглушки ({len(stub_only)})\n\n"
+        if stub_only:
+            section += "| № | Документ | Ссылающиеся заглушки |\n"
+            section += "|---|----------|----------------------|\n"
+            for i, node in enumerate(stub_only[:20], 1):
+                sources = [documents[source].name[:30] for source in graph.predecessors(node)]
+                section += f"| {i} | {documents[node].name[:50]} | {', '.join(sources[:3])} |\n"
+            if len(stub_only) > 20:
+                section += f"\n*... и ещё {len(stub_only) - 20} документов*\n"
+        else:
+            section += "*Таких документов нет* 🟢\n"
+
+        section += "\n### 5.5. Ссылки между семействами\n\n"
+        section += "*Строка — откуда ссылка, столбец — куда.*\n\n"
+        section += "| Из \\ В | " + " | ".join(FAMILY_IDS) + " |\n"
+        section += "|---|" + "---|" * len(FAMILY_IDS) + "\n"
+        for row in FAMILY_IDS:
+            cells = " | ".join(str(analysis.family_links[row][column] or "·") for column in FAMILY_IDS)
+            section += f"| **{row}** | {cells} |\n"
+
+        return section + "\n---\n\n"
+
     # ==================== УТИЛИТЫ ====================
 
     def _find_doc_by_pattern(self, pattern: str) -> Optional[Document]:
-        """Поиск документа по паттерну в названии."""
-        regex = re.compile(pattern, re.IGNORECASE)
-        for doc in self.documents:
-            if regex.search(doc.name):
-                return doc
-        return None
+        """Поиск документа по паттерну в названии (через индекс названий)."""
+        return self.index.find_pattern(pattern)
 
     def _extract_summary(self, doc: Document, max_sentences: int = 3) -> str:
         """Извлечение краткого резюме из документа."""
@@ -2095,25 +2563,26 @@ class ReportGenerator:
         summary = self._extract_summary(doc, max_sentences=1)
         return summary[:100] if summary else ""
 
-    def _find_similar_name(self, name: str, candidates: List[str], threshold: float = 0.8) -> Optional[str]:
-        """Поиск похожего названия (простой алгоритм)."""
-        name_lower = name.lower()
-        for candidate in candidates:
-            candidate_lower = candidate.lower()
-            # Простая проверка на вхождение
-            if name_lower in candidate_lower or candidate_lower in name_lower:
-                return candidate
-        return None
-
 
-def save_report(content: str, filename: str):
-    """Сохранение отчёта в файл."""
+def save_report(content: str, filename: str, fingerprint: Optional[str] = None):
+    """Сохранение отчёта в файл (с отпечатком входных данных в конце)."""
     output_path = REPORTS_DIR / filename
     output_path.parent.mkdir(parents=True, exist_ok=True)
+    if fingerprint:
+        content = (content if content.endswith("\n") else content + "\n") + f"<!-- fingerprint: {fingerprint} -->\n"
     output_path.write_text(content, encoding="utf-8")
     print(f"✅ Отчёт сохранён: {output_path}")
 
 
+def read_fingerprint(filename: str) -> Optional[str]:
+    """Отпечаток, с которым отчёт был сформирован в прошлый раз."""
+    try:
+        match = FINGERPRINT_RE.search((REPORTS_DIR / filename).read_text(encoding="utf-8"))
+    except OSError:
+        return None
+    return match.group(1) if match else None
+
+
 def main():
     parser = argparse.ArgumentParser(description="Генератор автоматических отчётов")
     parser.add_argument(
@@ -2137,6 +2606,28 @@ def main():
         action="store_true",
         help="Использовать AI (Claude) для анализа терминологии и рекомендаций"
     )
+    parser.add_argument(
+        "--refresh-ai",
+        action="store_true",
+        help="Не брать ответы AI-анализа из кэша (новые ответы всё равно сохраняются)"
+    )
+    parser.add_argument(
+        "--ai-cache-ttl",
+        type=float,
+        default=AI_CACHE_TTL / 86400,
+        help="Срок жизни кэша ответов AI-анализа в днях (0 — без кэша, по умолчанию 7)"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Перегенерировать отчёты, даже если входные данные не изменились"
+    )
+    parser.add_argument(
+        "--jobs", "-j",
+        type=int,
+        default=1,
+        help="Процессов для парсинга документов (0 — по числу ядер, по умолчанию 1 — последовательно)"
+    )
 
     args = parser.parse_args()
 
@@ -2149,14 +2640,14 @@ def main():
     ai_analyzer = None
     if args.ai_analysis:
         try:
-            ai_analyzer = AIAnalyzer()
+            cache = ResponseCache(ttl=args.ai_cache_ttl * 86400) if args.ai_cache_ttl > 0 else None
+            ai_analyzer = AIAnalyzer(cache=cache, refresh=args.refresh_ai)
             print("✅ AI-анализ активирован")
         except RuntimeError as e:
             print(f"⚠️  {e}")
             print("   Продолжаем без AI-анализа...")
 
     generator = ReportGenerator(ai_analyzer=ai_analyzer)
-    generator.scan_documents()
 
     report_files = {
         "architecture-snapshot": "Архитектурный слепок хранилища 0.4.md",
@@ -2172,11 +2663,44 @@ def main():
     else:
         reports_to_generate = [args.report]
 
+    def output_name(report_type: str) -> str:
+        return args.output if args.output and args.report != "all" else report_files[report_type]
+
+    # Отчёт, входные данные которого не изменились, не перегенерируется и не перезаписывается
+    # (метка времени в нём меняется только вместе с содержимым)
+    fingerprints: Dict[str, str] = {}
+    if not args.dry_run:
+        fingerprints = generator.report_fingerprints(reports_to_generate)
+        if not args.force:
+            unchanged = [report_type for report_type in reports_to_generate
+                         if read_fingerprint(output_name(report_type)) == fingerprints[report_type]]
+            for report_type in unchanged:
+                print(f"⏭️  {report_type}: входные данные не изменились, отчёт не перегенерируется")
+            reports_to_generate = [report_type for report_type in reports_to_generate if report_type not in unchanged]
+            if not reports_to_generate:
+                print("\n✅ Все отчёты актуальны")
+                return
+
+    generator.scan_documents(jobs=args.jobs or os.cpu_count() or 1)
+
+    # Отчёты форматируют общий анализ и не меняют его — строятся параллельно
+    # (AI-анализ и git-история в одних отчётах не задерживают остальные)
+    with ThreadPoolExecutor(max_workers=len(reports_to_generate)) as pool:
+        futures = {report_type: pool.submit(generator.generate, report_type)
+                   for report_type in reports_to_generate}
+
+    # Отчёт с текстом ошибки AI-анализа сохраняется без отпечатка —
+    # иначе следующие запуски считали бы его актуальным и не повторяли вызов
+    if ai_analyzer is not None and ai_analyzer.failed:
+        for report_type in AI_REPORTS:
+            if fingerprints.pop(report_type, None):
+                print(f"⚠️  {report_type}: AI-анализ завершился ошибкой, отчёт будет перегенерирован при следующем запуске")
+
     for report_type in reports_to_generate:
         print(f"\n📝 Генерация отчёта: {report_type}")
 
         try:
-            content = generator.generate(report_type)
+            content = futures[report_type].result()
 
             if args.dry_run:
                 print("\n" + "=" * 60)
@@ -2184,14 +2708,21 @@ def main():
                 print("..." if len(content) > 2000 else "")
                 print("=" * 60)
             else:
-                filename = args.output if args.output and args.report != "all" else report_files[report_type]
-                save_report(content, filename)
+                save_report(content, output_name(report_type), fingerprints.get(report_type))
 
         except Exception as e:
             print(f"❌ Ошибка при генерации {report_type}: {e}")
             import traceback
             traceback.print_exc()
 
+    if ai_analyzer is not None:
+        print(f"\n🤖 {ai_analyzer.summary()}")
+        # Устаревшие ответы удаляются, чтобы кэш (и его копия в actions/cache) не рос
+        if ai_analyzer.cache is not None:
+            pruned = ai_analyzer.cache.prune()
+            if pruned:
+                print(f"🧹 Кэш AI-ответов: удалено устаревших записей: {pruned}")
+
     print("\n✅ Готово!")
 
 
@@ -16,6 +16,16 @@ from datetime import datetime
 from typing import Dict, List, Optional
 import json
 
+# Общий с ДЗ-чекером маршрутизатор LLM: провайдеры, failover, лимит частоты (нужен pyyaml)
+try:
+    from llm_router import HAS_HTTPX, get_router
+    HAS_ROUTER = HAS_HTTPX
+except ImportError:
+    HAS_ROUTER = False
+
+# Тип задачи для маршрутизатора (маршруты — router.routes.classification)
+AI_TASK = "classification"
+
 # Базовая директория проекта
 BASE_DIR = Path(__file__).parent.parent
 CONTENT_DIR = BASE_DIR / "content"
@@ -99,15 +109,15 @@ def classify_document_with_ai(doc_path: str, doc_content: str) -> Dict[str, str]
         Dict с ключами: type, audience, edit_mode, layer, scope, security
     """
     try:
-        from openai import OpenAI
+        if not HAS_ROUTER:
+            print("⚠️  Не установлены httpx/pyyaml, используются значения по умолчанию")
+            return get_default_classification(doc_path)
 
-        api_key = os.getenv('OPENAI_API_KEY')
-        if not api_key:
+        router = get_router()
+        if not router.available(AI_TASK):
             print("⚠️  OPENAI_API_KEY не установлен, используются значения по умолчанию")
             return get_default_classification(doc_path)
 
-        client = OpenAI(api_key=api_key)
-
         # Ограничиваем размер контента
         max_chars = 3000
         if len(doc_content) > max_chars:
@@ -141,14 +151,9 @@ def classify_document_with_ai(doc_path: str, doc_content: str) -> Dict[str, str]
 
 БЕЗ дополнительных пояснений, ТОЛЬКО JSON."""
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=200
-        )
+        completion = router.complete(AI_TASK, prompt, temperature=0.3, max_tokens=200)
 
-        result_text = response.choices[0].message.content.strip()
+        result_text = completion.text.strip()
 
         # Извлекаем JSON из ответа
         json_match = re.search(r'\{[^}]+\}', result_text, re.DOTALL)
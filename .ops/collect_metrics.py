@@ -4,13 +4,15 @@ Writes .ops/metrics_report.md and prints a short summary.
 """
 from pathlib import Path
 import re
-import yaml
+from frontmatter import get_keys
 
 ROOT = Path(__file__).resolve().parents[1]
 CONTENT = ROOT / 'content'
 REPORT = ROOT / 'ops' / 'metrics_report.md'
 
 REQ_KEYS = ['type', 'status', 'created', 'layer', 'scope']
+# only these flat keys are read: no full YAML parse for typical frontmatter
+KEYS = REQ_KEYS + ['aliases', 'suggested_canonical']
 
 
 def split_frontmatter(text):
@@ -21,11 +23,7 @@ def split_frontmatter(text):
     body = m.group(2)
     if not fm:
         return {}, body
-    try:
-        data = yaml.safe_load(fm) or {}
-    except Exception:
-        data = {}
-    return data, body
+    return get_keys(fm, KEYS), body
 
 
 def main():
@@ -2,6 +2,10 @@
 """Detect near-duplicate Markdown documents in content/ using difflib similarity.
 Outputs a report `.ops/dedup_report.md` with clusters and a recommended canonical file per cluster.
 
+When numpy is available, candidate pairs come from the shared embedding index
+(.ops/embedding_index.py) and only those are verified with difflib; otherwise
+every pair is compared.
+
 Usage: python .ops/deduplicate_content.py
 """
 from pathlib import Path
@@ -12,6 +16,8 @@ CONTENT = Path('content')
 REPORT = Path('ops') / 'dedup_report.md'
 MIN_LEN = 200  # skip very short files
 THRESHOLD = 0.65
+CANDIDATE_SCORE = 0.5  # embedding similarity needed to verify a pair with difflib
+CANDIDATE_K = 20
 
 # read all md files
 md_files = list(CONTENT.rglob('*.md'))
@@ -34,6 +40,21 @@ for p in md_files:
 # compute pairwise similarities (upper-triangular)
 paths = list(bodies.keys())
 N = len(paths)
+
+# candidate neighbours from the embedding index: path -> set of paths
+candidates = None
+try:
+    from embedding_index import load_content_index
+    index = load_content_index(CONTENT)
+    lookups = index.lookups()  # path -> rows, hash -> chunks: built once for all documents
+    candidates = {}
+    for p in paths:
+        rel = Path(p).relative_to(CONTENT).as_posix()
+        similar = index.similar_documents(rel, k=CANDIDATE_K, min_score=CANDIDATE_SCORE, lookups=lookups)
+        candidates[p] = {str(CONTENT / other) for other, _ in similar}
+    print(f'Embedding prefilter: {sum(len(c) for c in candidates.values())} candidate pairs')
+except RuntimeError as e:
+    print(f'Embedding prefilter unavailable ({e.args[0].splitlines()[0]}), comparing all pairs')
 clusters = []
 visited = set()
 
@@ -46,6 +67,8 @@ for i in range(N):
     group = [paths[i]]
     visited.add(paths[i])
     for j in range(i+1, N):
+        if candidates is not None and paths[j] not in candidates[paths[i]] and paths[i] not in candidates[paths[j]]:
+            continue
         if paths[j] in visited:
             continue
         b = bodies[paths[j]]
@@ -0,0 +1,568 @@
+#!/usr/bin/env python3
+"""
+Общий эмбеддинг-индекс фрагментов хранилища знаний.
+
+Единая реализация «найти похожие фрагменты». Сейчас индекс используют
+дедупликация (deduplicate_content.py) и векторный поиск ДЗ-чекера
+(search.vector); анализ терминологии и подсказки связанных документов
+могут подключиться через search() и similar_documents().
+
+Устройство:
+- документы режутся на фрагменты по заголовкам и абзацам;
+- ключ фрагмента — хеш (модель + текст), поэтому при обновлении
+  пересчитываются только новые или изменённые фрагменты;
+- векторы лежат в memory-mapped матрице .npy (float16 или int8
+  с масштабом на строку) и не загружаются в память целиком;
+- поиск — косинусная близость полным перебором блоками, для больших
+  индексов — IVF (k-means по центроидам, просмотр nprobe списков);
+- модель эмбеддингов подключаемая; по умолчанию — локальный хеширующий
+  эмбеддер без внешних моделей (работает офлайн на CPU).
+
+Использование:
+    python3 .ops/embedding_index.py --update
+    python3 .ops/embedding_index.py --query "экономика вклада" -k 5
+    python3 .ops/embedding_index.py --update --dtype int8 --ivf
+    python3 .ops/embedding_index.py --update --model sentence-transformers:/models/multilingual-e5-small
+
+Зависимости: numpy (pip install numpy); для модели sentence-transformers —
+пакет sentence-transformers и локально скачанная модель.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# Константы
+CONTENT_DIR = Path("content")
+INDEX_DIR = Path(".ops") / ".cache" / "embeddings"
+INDEX_VERSION = 1
+
+# Фрагменты
+CHUNK_MAX_CHARS = 1200
+CHUNK_MIN_CHARS = 80
+
+# Поиск
+SEARCH_BLOCK_ROWS = 65536
+IVF_MIN_ROWS = 20000
+IVF_ITERATIONS = 8
+DEFAULT_NPROBE = 8
+
+DTYPES = ("float16", "int8")
+
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.+?)\s*#*\s*$')
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+# ==================== ЭМБЕДДЕРЫ ====================
+
+class HashingEmbedder:
+    """
+    Локальный эмбеддер на хешировании признаков.
+
+    Признаки: основы слов, биграммы основ и символьные триграммы слов.
+    Каждый признак детерминированно (crc32) отображается в координату
+    и знак. Не требует моделей и сети, устойчив к словоформам за счёт
+    триграмм. Качество ниже нейросетевых моделей, но достаточно для
+    поиска дублей и близких по лексике фрагментов.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.name = f"hashing-v1:{dim}"
+
+    def _features(self, text: str) -> Iterator[Tuple[str, float]]:
+        words = [w[:6] for w in WORD_RE.findall(text.lower().replace("ё", "е")) if not w.isdigit()]
+        for word in words:
+            yield "w:" + word, 1.0
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                yield "c:" + padded[i:i + 3], 0.5
+        for a, b in zip(words, words[1:]):
+            yield f"b:{a}_{b}", 0.7
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                vectors[row, h % self.dim] += sign * weight
+        return _normalize(vectors)
+
+
+class SentenceTransformerEmbedder:
+    """Эмбеддер на локальной модели sentence-transformers (без обращения к сети)."""
+
+    def __init__(self, model: str):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise RuntimeError(
+                "Для модели sentence-transformers требуется пакет sentence-transformers.\n"
+                "Установите: pip install sentence-transformers"
+            )
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        self.model = SentenceTransformer(model, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st:{Path(model).name}:{self.dim}"
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        vectors = self.model.encode(texts, batch_size=32, convert_to_numpy=True, show_progress_bar=False)
+        return _normalize(vectors.astype(np.float32))
+
+
+EMBEDDERS = {
+    "hashing": lambda arg: HashingEmbedder(int(arg) if arg else 512),
+    "sentence-transformers": lambda arg: SentenceTransformerEmbedder(arg),
+}
+
+
+def get_embedder(spec: str = "hashing"):
+    """
+    Создание эмбеддера по спецификации «имя[:аргумент]».
+
+    Примеры: "hashing", "hashing:1024", "sentence-transformers:/models/e5-small".
+    """
+    name, _, arg = spec.partition(":")
+    if name not in EMBEDDERS:
+        raise ValueError(f"Неизвестная модель эмбеддингов: {name} (доступны: {', '.join(EMBEDDERS)})")
+    return EMBEDDERS[name](arg)
+
+
+def _normalize(vectors: "np.ndarray") -> "np.ndarray":
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+# ==================== ФРАГМЕНТЫ ====================
+
+def strip_frontmatter(text: str) -> str:
+    if text.startswith("---"):
+        parts = text.split("---", 2)
+        if len(parts) >= 3:
+            return parts[2]
+    return text
+
+
+def chunk_document(path: str, body: str) -> List[dict]:
+    """
+    Разбиение документа на фрагменты: границы — заголовки, внутри раздела
+    абзацы склеиваются до CHUNK_MAX_CHARS.
+    """
+    chunks = []
+    heading = Path(path).stem
+    buffer: List[str] = []
+    size = 0
+
+    def flush():
+        nonlocal buffer, size
+        text = "\n\n".join(buffer).strip()
+        if len(text) >= CHUNK_MIN_CHARS:
+            chunks.append({"path": path, "heading": heading, "text": text})
+        buffer, size = [], 0
+
+    for paragraph in re.split(r'\n\s*\n', body):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        first_line = paragraph.split("\n", 1)[0]
+        match = HEADING_RE.match(first_line)
+        if match:
+            flush()
+            heading = match.group(2)
+            paragraph = paragraph[len(first_line):].strip()
+            if not paragraph:
+                continue
+        if buffer and size + len(paragraph) > CHUNK_MAX_CHARS:
+            flush()
+        buffer.append(paragraph[:CHUNK_MAX_CHARS * 2])
+        size += len(paragraph)
+
+    flush()
+    return chunks
+
+
+def chunk_hash(model_name: str, text: str) -> str:
+    return hashlib.sha1(f"{model_name}\0{text}".encode("utf-8")).hexdigest()[:20]
+
+
+def iter_content_documents(content_dir: Path = CONTENT_DIR) -> Iterator[Tuple[str, str]]:
+    """Документы хранилища: (путь относительно content_dir, тело без frontmatter)."""
+    for md_file in sorted(content_dir.rglob("*.md")):
+        if any(skip in str(md_file) for skip in [".obsidian", "node_modules", ".git"]):
+            continue
+        try:
+            text = md_file.read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"⚠️  Ошибка чтения {md_file}: {e}")
+            continue
+        yield md_file.relative_to(content_dir).as_posix(), strip_frontmatter(text)
+
+
+# ==================== ИНДЕКС ====================
+
+class EmbeddingIndex:
+    """
+    Эмбеддинг-индекс фрагментов с хранением векторов на диске.
+
+    Файлы в index_dir:
+    - meta.json      — модель, тип, список фрагментов и порядок строк матрицы
+    - vectors.npy    — матрица (строк × dim), float16 или int8
+    - scales.npy     — масштаб строк для int8
+    - centroids.npy, lists.npy — IVF-разбиение (если построено)
+    """
+
+    def __init__(self, index_dir: Path = INDEX_DIR, embedder=None, dtype: str = "float16"):
+        if not HAS_NUMPY:
+            raise RuntimeError(
+                "Для эмбеддинг-индекса требуется библиотека numpy.\n"
+                "Установите: pip install numpy"
+            )
+        if dtype not in DTYPES:
+            raise ValueError(f"Неподдерживаемый тип векторов: {dtype} (доступны: {', '.join(DTYPES)})")
+
+        self.index_dir = Path(index_dir)
+        self.embedder = embedder or get_embedder()
+        self.dtype = dtype
+        self.chunks: List[dict] = []
+        self.hashes: List[str] = []
+        self.vectors = None
+        self.scales = None
+        self.centroids = None
+        self.lists = None
+        self._load()
+
+    # ---------- хранение ----------
+
+    def _path(self, name: str) -> Path:
+        return self.index_dir / name
+
+    def _load(self):
+        meta_path = self._path("meta.json")
+        if not meta_path.exists():
+            return
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return
+        if (meta.get("version") != INDEX_VERSION or meta.get("model") != self.embedder.name
+                or meta.get("dtype") != self.dtype):
+            # Другая модель или формат — индекс будет построен заново
+            return
+
+        self.chunks = meta["chunks"]
+        self.hashes = meta["hashes"]
+        if self.hashes:
+            self.vectors = np.load(self._path("vectors.npy"), mmap_mode="r")
+            if self.dtype == "int8":
+                self.scales = np.load(self._path("scales.npy"), mmap_mode="r")
+        if self._path("centroids.npy").exists() and meta.get("ivf"):
+            self.centroids = np.load(self._path("centroids.npy"))
+            self.lists = np.load(self._path("lists.npy"), mmap_mode="r")
+
+    def _row_vectors(self, start: int, end: int) -> "np.ndarray":
+        """Строки матрицы в float32 (с деквантованием для int8)."""
+        block = np.asarray(self.vectors[start:end], dtype=np.float32)
+        if self.dtype == "int8":
+            block *= np.asarray(self.scales[start:end], dtype=np.float32)[:, None]
+        return block
+
+    def _rows(self, rows: "np.ndarray") -> "np.ndarray":
+        block = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.dtype == "int8":
+            block *= np.asarray(self.scales[rows], dtype=np.float32)[:, None]
+        return block
+
+    # ---------- обновление ----------
+
+    def update(self, documents: Iterable[Tuple[str, str]], batch_size: int = 256, ivf: Optional[bool] = None) -> dict:
+        """
+        Инкрементальное обновление по текущему набору документов.
+
+        Векторы фрагментов с известным хешем переиспользуются, новые —
+        считаются пачками. Матрица перезаписывается компактно (без
+        удалённых фрагментов) через временный файл.
+        """
+        chunks = []
+        for path, body in documents:
+            for chunk in chunk_document(path, body):
+                chunk["hash"] = chunk_hash(self.embedder.name, chunk["text"])
+                chunks.append(chunk)
+
+        old_rows = {h: i for i, h in enumerate(self.hashes)}
+        hashes = list(dict.fromkeys(c["hash"] for c in chunks))
+        text_by_hash = {c["hash"]: c["text"] for c in chunks}
+        missing = [h for h in hashes if h not in old_rows]
+        reused = len(hashes) - len(missing)
+
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        storage_dtype = np.int8 if self.dtype == "int8" else np.float16
+        tmp_vectors = self._path("vectors.tmp.npy")
+        tmp_scales = self._path("scales.tmp.npy")
+
+        if hashes:
+            out = np.lib.format.open_memmap(tmp_vectors, mode="w+", dtype=storage_dtype,
+                                            shape=(len(hashes), self.embedder.dim))
+            out_scales = None
+            if self.dtype == "int8":
+                out_scales = np.lib.format.open_memmap(tmp_scales, mode="w+", dtype=np.float32,
+                                                       shape=(len(hashes),))
+
+            # Переиспользуемые строки копируем без пересчёта
+            for new_row, h in enumerate(hashes):
+                old_row = old_rows.get(h)
+                if old_row is not None:
+                    out[new_row] = self.vectors[old_row]
+                    if out_scales is not None:
+                        out_scales[new_row] = self.scales[old_row]
+
+            new_rows = {h: i for i, h in enumerate(hashes)}
+            for start in range(0, len(missing), batch_size):
+                batch = missing[start:start + batch_size]
+                vectors = self.embedder.embed([text_by_hash[h] for h in batch])
+                rows = [new_rows[h] for h in batch]
+                if self.dtype == "int8":
+                    scale = np.abs(vectors).max(axis=1) / 127.0
+                    scale[scale == 0] = 1.0
+                    out[rows] = np.round(vectors / scale[:, None]).astype(np.int8)
+                    out_scales[rows] = scale
+                else:
+                    out[rows] = vectors.astype(np.float16)
+                if len(missing) > batch_size:
+                    print(f"   Эмбеддинги: {min(start + batch_size, len(missing))}/{len(missing)}")
+
+            out.flush()
+            del out
+            if out_scales is not None:
+                out_scales.flush()
+                del out_scales
+
+        # Старые memmap закрываем до замены файлов
+        self.vectors = self.scales = self.centroids = self.lists = None
+        if hashes:
+            os.replace(tmp_vectors, self._path("vectors.npy"))
+            if self.dtype == "int8":
+                os.replace(tmp_scales, self._path("scales.npy"))
+
+        self.chunks = [{k: c[k] for k in ("hash", "path", "heading", "text")} for c in chunks]
+        self.hashes = hashes
+
+        use_ivf = len(hashes) >= IVF_MIN_ROWS if ivf is None else ivf
+        for name in ("centroids.npy", "lists.npy"):
+            if self._path(name).exists():
+                self._path(name).unlink()
+        if hashes:
+            self.vectors = np.load(self._path("vectors.npy"), mmap_mode="r")
+            if self.dtype == "int8":
+                self.scales = np.load(self._path("scales.npy"), mmap_mode="r")
+            if use_ivf:
+                self._build_ivf()
+
+        meta = {
+            "version": INDEX_VERSION,
+            "model": self.embedder.name,
+            "dim": self.embedder.dim,
+            "dtype": self.dtype,
+            "ivf": self.centroids is not None,
+            "hashes": self.hashes,
+            "chunks": self.chunks,
+        }
+        tmp_meta = self._path("meta.tmp.json")
+        tmp_meta.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_meta, self._path("meta.json"))
+
+        return {"chunks": len(chunks), "vectors": len(hashes), "embedded": len(missing), "reused": reused}
+
+    def _build_ivf(self):
+        """IVF-разбиение: k-means (сферический) по √N центроидам."""
+        n = len(self.hashes)
+        nlist = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(0)
+
+        sample_rows = np.sort(rng.choice(n, size=min(n, nlist * 64), replace=False))
+        sample = self._rows(sample_rows)
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+
+        for _ in range(IVF_ITERATIONS):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        assign = np.empty(n, dtype=np.int32)
+        for start in range(0, n, SEARCH_BLOCK_ROWS):
+            end = min(start + SEARCH_BLOCK_ROWS, n)
+            assign[start:end] = np.argmax(self._row_vectors(start, end) @ centroids.T, axis=1)
+
+        np.save(self._path("centroids.npy"), centroids.astype(np.float32))
+        np.save(self._path("lists.npy"), assign)
+        self.centroids = centroids.astype(np.float32)
+        self.lists = assign
+
+    # ---------- поиск ----------
+
+    def _rows_by_hash(self) -> Dict[str, List[dict]]:
+        by_hash: Dict[str, List[dict]] = {}
+        for chunk in self.chunks:
+            by_hash.setdefault(chunk["hash"], []).append(chunk)
+        return by_hash
+
+    def lookups(self) -> Tuple[Dict[str, List[int]], Dict[str, List[dict]]]:
+        """
+        Строки матрицы по документу и фрагменты по хешу.
+
+        Строятся за один проход по фрагментам; при серии вызовов
+        similar_documents (по всем документам) их нужно построить один раз
+        и передавать в каждый вызов.
+        """
+        row_of = {h: i for i, h in enumerate(self.hashes)}
+        rows_by_path: Dict[str, Dict[int, None]] = {}
+        for chunk in self.chunks:
+            rows_by_path.setdefault(chunk["path"], {})[row_of[chunk["hash"]]] = None
+        return {path: list(rows) for path, rows in rows_by_path.items()}, self._rows_by_hash()
+
+    def search_vector(self, query: "np.ndarray", k: int = 10, nprobe: int = DEFAULT_NPROBE) -> List[Tuple[int, float]]:
+        """Ближайшие строки матрицы к нормированному вектору: [(строка, косинус)]."""
+        if not self.hashes:
+            return []
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+
+        if self.centroids is not None:
+            probes = np.argsort(-(self.centroids @ query))[:nprobe]
+            rows = np.flatnonzero(np.isin(self.lists, probes))
+            if len(rows) == 0:
+                return []
+            scores = self._rows(rows) @ query
+            top = np.argsort(-scores)[:k]
+            return [(int(rows[i]), float(scores[i])) for i in top]
+
+        best_rows: List[int] = []
+        best_scores: List[float] = []
+        n = len(self.hashes)
+        for start in range(0, n, SEARCH_BLOCK_ROWS):
+            end = min(start + SEARCH_BLOCK_ROWS, n)
+            scores = self._row_vectors(start, end) @ query
+            take = min(k, len(scores))
+            top = np.argpartition(-scores, take - 1)[:take]
+            best_rows.extend(int(start + i) for i in top)
+            best_scores.extend(float(scores[i]) for i in top)
+
+        order = np.argsort(-np.asarray(best_scores))[:k]
+        return [(best_rows[i], best_scores[i]) for i in order]
+
+    def search(self, query: str, k: int = 10, min_score: float = 0.0,
+               exclude_paths: Optional[Iterable[str]] = None) -> List[dict]:
+        """
+        Поиск фрагментов, похожих на текст запроса.
+
+        Возвращает [{path, heading, text, score}] по убыванию score (косинус).
+        """
+        excluded = set(exclude_paths or ())
+        by_hash = self._rows_by_hash()
+        # Запас на исключаемые документы и фрагменты-дубли
+        hits = self.search_vector(self.embedder.embed([query])[0], k=k * 3 + len(excluded))
+
+        results = []
+        for row, score in hits:
+            if score < min_score:
+                break
+            for chunk in by_hash.get(self.hashes[row], ()):
+                if chunk["path"] in excluded:
+                    continue
+                results.append({
+                    "path": chunk["path"],
+                    "heading": chunk["heading"],
+                    "text": chunk["text"],
+                    "score": round(score, 4),
+                })
+            if len(results) >= k:
+                break
+        return results[:k]
+
+    def similar_documents(self, path: str, k: int = 5, min_score: float = 0.5,
+                          lookups: Optional[Tuple[Dict[str, List[int]], Dict[str, List[dict]]]] = None
+                          ) -> List[Tuple[str, float]]:
+        """
+        Документы, похожие на данный: для каждого его фрагмента ищутся соседи,
+        по документу берётся максимальная близость.
+
+        lookups — результат lookups(); без него карты строятся на каждый вызов.
+        """
+        rows_by_path, by_hash = lookups or self.lookups()
+        rows = rows_by_path.get(path)
+        if not rows:
+            return []
+        best: Dict[str, float] = {}
+
+        for query in self._rows(np.array(rows)):
+            for row, score in self.search_vector(query, k=k + 5):
+                if score < min_score:
+                    break
+                for other in by_hash.get(self.hashes[row], ()):
+                    if other["path"] != path and score > best.get(other["path"], 0.0):
+                        best[other["path"]] = score
+
+        return sorted(best.items(), key=lambda item: -item[1])[:k]
+
+
+def load_content_index(content_dir: Path = CONTENT_DIR, index_dir: Path = INDEX_DIR,
+                       model: str = "hashing", dtype: str = "float16", update: bool = True) -> EmbeddingIndex:
+    """Индекс по content/ с инкрементальным обновлением (для других скриптов .ops)."""
+    index = EmbeddingIndex(index_dir, get_embedder(model), dtype)
+    if update:
+        index.update(iter_content_documents(content_dir))
+    return index
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Эмбеддинг-индекс фрагментов хранилища")
+    parser.add_argument("--content", type=str, default=str(CONTENT_DIR), help="Папка документов")
+    parser.add_argument("--index-dir", type=str, default=str(INDEX_DIR), help="Папка индекса")
+    parser.add_argument("--model", type=str, default="hashing", help="Модель: hashing[:dim] | sentence-transformers:<путь>")
+    parser.add_argument("--dtype", choices=DTYPES, default="float16", help="Тип хранения векторов")
+    parser.add_argument("--update", action="store_true", help="Обновить индекс по текущему содержимому")
+    parser.add_argument("--ivf", action="store_true", help="Построить IVF-разбиение независимо от размера")
+    parser.add_argument("--query", "-q", type=str, help="Поисковый запрос")
+    parser.add_argument("-k", type=int, default=5, help="Количество результатов")
+
+    args = parser.parse_args()
+
+    try:
+        index = EmbeddingIndex(Path(args.index_dir), get_embedder(args.model), args.dtype)
+    except (RuntimeError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if args.update:
+        content_dir = Path(args.content)
+        if not content_dir.exists():
+            print(f"❌ Папка {content_dir} не найдена. Запустите скрипт из корня проекта.")
+            sys.exit(1)
+        stats = index.update(iter_content_documents(content_dir), ivf=True if args.ivf else None)
+        print(f"✅ Индекс обновлён: {stats['chunks']} фрагментов, {stats['vectors']} векторов "
+              f"(посчитано {stats['embedded']}, переиспользовано {stats['reused']})")
+
+    if args.query:
+        for i, hit in enumerate(index.search(args.query, k=args.k), 1):
+            preview = re.sub(r'\s+', ' ', hit["text"])[:160]
+            print(f"{i}. [{hit['score']:.3f}] {hit['path']} — {hit['heading']}\n   {preview}")
+
+
+if __name__ == "__main__":
+    main()
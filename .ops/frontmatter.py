@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Разбор frontmatter документов хранилища.
+
+- load — полный разбор YAML: libyaml (yaml.CSafeLoader), если PyYAML собран
+  с ним, иначе чистый Python (yaml.SafeLoader);
+- scan_keys — быстрый путь без YAML-парсера для плоских ключей верхнего
+  уровня: скаляры и простые списки скаляров. Тип значения определяет тот же
+  резолвер, что и в PyYAML (даты, числа, bool, null — как при полном разборе).
+  Если нужный ключ записан сложнее (вложенный словарь, блочный или
+  многострочный скаляр, якоря, flow-коллекции), возвращается None;
+- get_keys — быстрый путь с откатом на полный разбор.
+
+Ключи, которые не запрошены, быстрый путь пропускает не разбирая, поэтому
+ошибки YAML в них не обнаруживаются (полный разбор вернул бы {}).
+
+    raw, body = split(text)
+    fields = get_keys(raw, ["type", "status"])
+
+    python3 .ops/frontmatter.py [content]      # сравнение режимов на хранилище
+"""
+
+import re
+import sys
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import yaml
+from yaml.constructor import SafeConstructor
+from yaml.nodes import ScalarNode
+from yaml.resolver import Resolver
+
+try:
+    SafeLoader = yaml.CSafeLoader
+    HAS_LIBYAML = True
+except AttributeError:
+    SafeLoader = yaml.SafeLoader
+    HAS_LIBYAML = False
+
+
+KEY_LINE_RE = re.compile(r"([A-Za-z_][\w-]*)[ \t]*:(?:[ \t]+(.*))?$")
+ITEM_LINE_RE = re.compile(r"( *)-(?:[ \t]+(.*))?$")
+TRAILING_COMMENT_RE = re.compile(r"[ \t]+#.*$")
+
+# Символы, с которых не может начинаться простой (plain) скаляр в нашем подмножестве
+INDICATORS = set("-?:,[]{}#&*!|>%@`")
+
+_resolver = Resolver()
+_constructor = SafeConstructor()
+
+
+class _NeedsYAML(Exception):
+    """Значение не разбирается быстрым путём."""
+
+
+def split(text: str) -> Tuple[Optional[str], str]:
+    """(frontmatter без разделителей или None, тело документа)."""
+    if text.startswith("---"):
+        parts = text.split("---", 2)
+        if len(parts) >= 3:
+            return parts[1], parts[2]
+    return None, text
+
+
+def load(raw: str) -> Any:
+    """Полный разбор frontmatter (как yaml.safe_load, ошибки — yaml.YAMLError)."""
+    return yaml.load(raw, Loader=SafeLoader)
+
+
+def _rest_is_comment(rest: str) -> bool:
+    rest = rest.strip()
+    return not rest or rest.startswith("#")
+
+
+def _scalar(text: str) -> Any:
+    """Значение однострочного скаляра с типом, который дал бы PyYAML."""
+    text = text.strip()
+    if not text or text.startswith("#"):
+        return None
+
+    if text[0] == "'":
+        end = 1
+        while True:
+            end = text.find("'", end)
+            if end == -1:
+                raise _NeedsYAML
+            if text[end + 1:end + 2] != "'":
+                break
+            end += 2
+        if not _rest_is_comment(text[end + 1:]):
+            raise _NeedsYAML
+        return text[1:end].replace("''", "'")
+
+    if text[0] == '"':
+        end = text.find('"', 1)
+        if end == -1 or "\\" in text[1:end] or not _rest_is_comment(text[end + 1:]):
+            raise _NeedsYAML
+        return text[1:end]
+
+    if text[0] in INDICATORS:
+        raise _NeedsYAML
+    value = TRAILING_COMMENT_RE.sub("", text)
+    if ": " in value or value.endswith(":"):
+        raise _NeedsYAML
+    tag = _resolver.resolve(ScalarNode, value, (True, False))
+    construct = SafeConstructor.yaml_constructors.get(tag)
+    if construct is None or tag.endswith((":merge", ":value")):
+        raise _NeedsYAML
+    try:
+        return construct(_constructor, ScalarNode(tag, value))
+    except (ValueError, yaml.YAMLError):
+        raise _NeedsYAML from None
+
+
+def scan_keys(raw: str, keys: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Плоские ключи верхнего уровня без YAML-парсера.
+
+    Args:
+        raw: frontmatter без разделителей ---
+        keys: нужные ключи (None — все)
+
+    Returns:
+        словарь найденных ключей или None — нужен полный разбор
+    """
+    wanted = None if keys is None else set(keys)
+    values: Dict[str, Any] = {}
+    current = None          # запрошенный ключ, значение которого может продолжаться списком
+    items = None
+    item_indent = None
+    skipping = False        # продолжение незапрошенного ключа
+
+    try:
+        for line in raw.splitlines():
+            stripped = line.strip()
+            if not stripped or stripped.startswith("#"):
+                continue
+            if line[0] == "\t":
+                return None
+
+            if line[0] == " " or stripped.startswith("-"):
+                if skipping:
+                    continue
+                if current is None:
+                    return None
+                match = ITEM_LINE_RE.match(line)
+                if not match or (item_indent is not None and len(match.group(1)) != item_indent):
+                    return None
+                item_indent = len(match.group(1))
+                items.append(_scalar(match.group(2) or ""))
+                continue
+
+            if current is not None:
+                values[current] = items if items else None
+                current = None
+            match = KEY_LINE_RE.match(line)
+            if not match:
+                return None
+
+            key, text = match.group(1), match.group(2) or ""
+            skipping = wanted is not None and key not in wanted
+            if skipping:
+                continue
+            if _rest_is_comment(text):
+                current, items, item_indent = key, [], None
+            else:
+                values[key] = _scalar(text)
+                # Продолжение на следующих строках — многострочный скаляр
+                skipping = False
+                current = None
+                items = None
+    except _NeedsYAML:
+        return None
+
+    if current is not None:
+        values[current] = items if items else None
+    return values
+
+
+def get_keys(raw: Optional[str], keys: Iterable[str]) -> Dict[str, Any]:
+    """
+    Значения ключей keys (отсутствующие не включаются).
+
+    Сначала быстрый путь scan_keys, при сложной разметке — полный разбор;
+    некорректный YAML даёт пустой словарь.
+    """
+    if not raw:
+        return {}
+    keys = list(keys)
+    values = scan_keys(raw, keys)
+    if values is not None:
+        return values
+    try:
+        data = load(raw)
+    except yaml.YAMLError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {key: data[key] for key in keys if key in data}
+
+
+def main():
+    import time
+    from pathlib import Path
+
+    root = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("content")
+    raws = []
+    for path in root.rglob("*.md"):
+        if ".obsidian" in path.parts:
+            continue
+        raw, _ = split(path.read_text(encoding="utf-8"))
+        if raw:
+            raws.append(raw)
+    if not raws:
+        print(f"❌ В {root} нет документов с frontmatter")
+        sys.exit(1)
+
+    keys = ["type", "status", "created", "layer", "scope"]
+
+    def timed(parse) -> float:
+        started = time.perf_counter()
+        for raw in raws:
+            try:
+                parse(raw)
+            except yaml.YAMLError:
+                pass
+        return (time.perf_counter() - started) * 1e6 / len(raws)
+
+    modes = [("yaml.SafeLoader (чистый Python)", lambda raw: yaml.load(raw, Loader=yaml.SafeLoader))]
+    if HAS_LIBYAML:
+        modes.append(("yaml.CSafeLoader (libyaml)", load))
+    modes.append((f"get_keys({len(keys)} ключей)", lambda raw: get_keys(raw, keys)))
+
+    print(f"📄 Frontmatter: {len(raws)} документов")
+    for name, parse in modes:
+        print(f"   {name}: {timed(parse):.1f} мкс на документ")
+
+    # Быстрый путь обязан давать те же значения, что и полный разбор
+    fast = mismatches = 0
+    for raw in raws:
+        scanned = scan_keys(raw, keys)
+        if scanned is None:
+            continue
+        fast += 1
+        try:
+            data = load(raw)
+        except yaml.YAMLError:
+            continue
+        if isinstance(data, dict) and scanned != {key: data[key] for key in keys if key in data}:
+            mismatches += 1
+    print(f"   Быстрый путь: {fast}/{len(raws)} документов, расхождений с полным разбором: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
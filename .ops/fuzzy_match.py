@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Нечёткий поиск названий документов для подсказок к битым wikilinks.
+
+Один индекс по всем способам назвать документ — имени файла, заголовку H1
+и aliases из frontmatter:
+
+- триграммный инвертированный индекс отбирает кандидатов, не перебирая
+  все названия (правка меняет не больше трёх триграмм, поэтому порог по
+  общим триграммам не теряет близких названий);
+- кандидаты проверяются ограниченным расстоянием Левенштейна: вычисляется
+  только полоса ширины 2·bound вокруг диагонали, расчёт прерывается, как
+  только расстояние заведомо превысило границу;
+- название, целиком входящее в ссылку (или наоборот), тоже считается
+  подсказкой, но с баллом ниже опечатки той же длины.
+
+Используется в build_report.py (рекомендации к битым ссылкам) и
+normalize_content.py (автоисправление ссылок).
+
+    index = FuzzyIndex()
+    index.add("Модель семейств документов 0.1", target=path)   # и H1, aliases
+    index.suggest("Модель семейст документов", limit=3)        # [Match, ...]
+
+    python3 .ops/fuzzy_match.py [content]      # время подсказок по хранилищу
+"""
+
+import re
+import sys
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+# Допустимая доля правок от длины запроса
+DEFAULT_MAX_RATIO = 0.34
+# Минимальная длина названия, которое может «входить» в ссылку
+MIN_CONTAINED_LENGTH = 4
+# Балл вхождения ниже балла опечатки: len(короткое)/len(длинное) · CONTAINMENT_WEIGHT
+CONTAINMENT_WEIGHT = 0.9
+# Сколько кандидатов с наибольшим числом общих триграмм проверять на вхождение
+CONTAINMENT_CANDIDATES = 20
+
+SEPARATORS_RE = re.compile(r"[\s_]+")
+
+
+def normalize_key(text: str) -> str:
+    """Ключ сравнения: нижний регистр, ё → е, без .md, пробелы схлопнуты."""
+    key = text.strip().lower().replace("ё", "е")
+    if key.endswith(".md"):
+        key = key[:-3]
+    return SEPARATORS_RE.sub(" ", key).strip()
+
+
+def trigrams(key: str) -> set:
+    """Триграммы ключа с границами слова (короткие ключи тоже дают триграммы)."""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_levenshtein(a: str, b: str, bound: int) -> Optional[int]:
+    """Расстояние Левенштейна, если оно не больше bound, иначе None."""
+    if abs(len(a) - len(b)) > bound:
+        return None
+    # Общие начало и конец на расстояние не влияют — опечатка обычно одна посередине
+    start = 0
+    end_a, end_b = len(a), len(b)
+    while start < end_a and start < end_b and a[start] == b[start]:
+        start += 1
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+    if len(a) > len(b):
+        a, b = b, a
+    if not a:
+        return len(b)
+
+    big = bound + 1
+    previous = [j if j <= bound else big for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        low = i - bound if i > bound else 1
+        high = i + bound if i + bound < len(b) else len(b)
+        current = [big] * (len(b) + 1)
+        current[0] = row_min = i if i <= bound else big
+        char = a[i - 1]
+        for j in range(low, high + 1):
+            value = previous[j - 1] if char == b[j - 1] else previous[j - 1] + 1
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if value > bound:
+                value = big
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > bound:
+            return None
+        previous = current
+    return previous[len(b)] if previous[len(b)] <= bound else None
+
+
+class Match:
+    """Подсказка: название, цель (документ/путь), расстояние правки и балл 0..1."""
+
+    __slots__ = ("name", "target", "distance", "score")
+
+    def __init__(self, name: str, target: Any, distance: Optional[int], score: float):
+        self.name = name
+        self.target = target
+        self.distance = distance
+        self.score = score
+
+    def __repr__(self) -> str:
+        return f"Match({self.name!r}, distance={self.distance}, score={self.score:.2f})"
+
+
+class FuzzyIndex:
+    """Триграммный индекс названий с проверкой ограниченным расстоянием правки."""
+
+    def __init__(self, max_ratio: float = DEFAULT_MAX_RATIO):
+        self.max_ratio = max_ratio
+        self.keys: List[str] = []
+        self.names: List[str] = []
+        self.targets: List[Any] = []
+        self.key_ids: Dict[str, int] = {}
+        self.gram_counts: List[int] = []
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, name: str, target: Any = None):
+        """Название (имя файла, H1 или alias) документа target; повтор ключа игнорируется."""
+        key = normalize_key(name)
+        if not key or key in self.key_ids:
+            return
+        key_id = self.key_ids[key] = len(self.keys)
+        self.keys.append(key)
+        self.names.append(name)
+        self.targets.append(name if target is None else target)
+        grams = trigrams(key)
+        self.gram_counts.append(len(grams))
+        for gram in grams:
+            self.postings[gram].append(key_id)
+
+    def add_all(self, names: Iterable[str], target: Any = None):
+        for name in names:
+            self.add(name, target)
+
+    def exact(self, name: str) -> Optional[Any]:
+        """Цель названия, совпадающего с точностью до регистра и пробелов."""
+        key_id = self.key_ids.get(normalize_key(name))
+        return None if key_id is None else self.targets[key_id]
+
+    def suggest(self, query: str, limit: int = 3, min_score: float = 0.0) -> List[Match]:
+        """
+        Подсказки по убыванию балла (не больше одной на цель).
+
+        Балл опечатки — 1 − расстояние/длина длинного названия; допускается
+        не больше max_ratio·len(query) правок. Балл вхождения —
+        CONTAINMENT_WEIGHT · len(короткого)/len(длинного).
+        """
+        key = normalize_key(query)
+        if not key:
+            return []
+        bound = max(1, int(len(key) * self.max_ratio))
+        grams = trigrams(key)
+
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for key_id in self.postings.get(gram, ()):
+                shared[key_id] += 1
+
+        # Правка затрагивает не больше трёх триграмм с каждой стороны
+        required = len(grams) - 3 * bound
+        edit_candidates = [key_id for key_id, count in shared.items()
+                           if count >= required and count >= self.gram_counts[key_id] - 3 * bound]
+        by_overlap = sorted(shared, key=lambda key_id: -shared[key_id] / (len(grams) + self.gram_counts[key_id]))
+
+        best: Dict[Any, Match] = {}
+
+        def offer(key_id: int, distance: Optional[int], score: float):
+            if score < min_score:
+                return
+            target = self.targets[key_id]
+            current = best.get(target)
+            if current is None or score > current.score:
+                best[target] = Match(self.names[key_id], target, distance, score)
+
+        for key_id in edit_candidates:
+            candidate = self.keys[key_id]
+            distance = bounded_levenshtein(key, candidate, bound)
+            if distance is not None:
+                offer(key_id, distance, 1 - distance / max(len(key), len(candidate)))
+
+        for key_id in by_overlap[:CONTAINMENT_CANDIDATES]:
+            candidate = self.keys[key_id]
+            shorter, longer = (key, candidate) if len(key) <= len(candidate) else (candidate, key)
+            if len(shorter) >= MIN_CONTAINED_LENGTH and shorter in longer:
+                offer(key_id, None, CONTAINMENT_WEIGHT * len(shorter) / len(longer))
+
+        matches = sorted(best.values(), key=lambda match: (-match.score, match.name))
+        return matches[:limit]
+
+    def best(self, query: str, min_score: float = 0.0) -> Optional[Match]:
+        matches = self.suggest(query, limit=1, min_score=min_score)
+        return matches[0] if matches else None
+
+
+def main():
+    import time
+    from pathlib import Path
+
+    root = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("content")
+    files = [path for path in root.rglob("*.md") if ".obsidian" not in path.parts]
+    if not files:
+        print(f"❌ В {root} нет .md файлов")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    index = FuzzyIndex()
+    for path in files:
+        index.add(path.stem, path)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    # Запросы — названия с опечаткой, усечением и лишним суффиксом
+    queries = []
+    for path in files[:500]:
+        name = path.stem
+        middle = len(name) // 2
+        queries += [name[:middle] + name[middle + 1:], name[:max(MIN_CONTAINED_LENGTH, middle)], name + " 2"]
+
+    started = time.perf_counter()
+    found = sum(1 for query in queries if index.suggest(query))
+    per_query_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+    print(f"Названий: {len(index)}, индекс: {build_ms:.0f} мс")
+    print(f"Подсказки: {found}/{len(queries)} запросов, {per_query_ms:.2f} мс на запрос")
+
+
+if __name__ == "__main__":
+    main()
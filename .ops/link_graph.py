@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Граф wikilinks хранилища в компактном виде (CSR) и его метрики.
+
+Граф строится один раз: вершины — документы в порядке сканирования,
+рёбра — уникальные ссылки между разными документами. Смежность хранится
+массивами смещений и соседей (CSR) в обе стороны — numpy, если установлен,
+иначе array из стандартной библиотеки.
+
+Метрики:
+- PageRank (степенной метод; масса висячих вершин распределяется равномерно);
+- HITS — хабы (ссылаются на важные документы) и авторитеты;
+- сильно связные компоненты (итеративный Тарьян — без рекурсии на 10k+ вершин);
+- слабо связные компоненты — изолированные кластеры документов;
+- матрица ссылок между группами (семействами F0–F9).
+
+С numpy итерации PageRank и HITS векторизованы (bincount по рёбрам).
+
+    graph = LinkGraph.from_links(names, links)   # links[i] — ссылки i-го документа
+    ranks = graph.pagerank()
+
+    python3 .ops/link_graph.py [число документов]   # замер на случайном графе
+"""
+
+import random
+import sys
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+DAMPING = 0.85
+TOLERANCE = 1e-10
+MAX_ITERATIONS = 100
+
+
+def _csr(count: int, sources: Sequence[int], targets: Sequence[int]) -> Tuple[array, array]:
+    """Смещения и соседи: соседи вершины — в порядке появления рёбер (сортировка подсчётом)."""
+    offsets = array("q", [0] * (count + 1))
+    for source in sources:
+        offsets[source + 1] += 1
+    for node in range(count):
+        offsets[node + 1] += offsets[node]
+    neighbours = array("q", [0] * len(targets))
+    position = offsets[:-1]
+    for source, target in zip(sources, targets):
+        neighbours[position[source]] = target
+        position[source] += 1
+    return offsets, neighbours
+
+
+def _to_array(values) -> array:
+    result = array("q")
+    result.frombytes(values.astype(np.int64).tobytes())
+    return result
+
+
+class LinkGraph:
+    """Ориентированный граф ссылок: исходящие и входящие списки смежности в CSR."""
+
+    def __init__(self, count: int, edges: Iterable[Tuple[int, int]]):
+        """
+        Args:
+            count: число вершин
+            edges: пары (откуда, куда); повторы и ссылки на себя отбрасываются
+        """
+        self.count = count
+        # Ребро кодируется числом source·count + target: уникальность и порядок без кортежей
+        codes = (source * count + target for source, target in edges if source != target)
+
+        if HAS_NUMPY:
+            codes = np.unique(np.fromiter(codes, dtype=np.int64))
+            self._np_sources, self._np_targets = codes // count, codes % count
+            self._np_out_degree = np.bincount(self._np_sources, minlength=count)
+            order = np.argsort(self._np_targets, kind="stable")
+            in_degree = np.bincount(self._np_targets, minlength=count)
+            self.edge_count = len(codes)
+            # Обходы (Тарьян, компоненты) идут в Python — им быстрее array, чем индексация numpy
+            self.out_offsets = _to_array(np.concatenate(([0], np.cumsum(self._np_out_degree))))
+            self.out_targets = _to_array(self._np_targets)
+            self.in_offsets = _to_array(np.concatenate(([0], np.cumsum(in_degree))))
+            self.in_sources = _to_array(self._np_sources[order])
+            return
+
+        codes = sorted(set(codes))
+        self.edge_count = len(codes)
+        sources = [code // count for code in codes]
+        targets = [code % count for code in codes]
+        self.out_offsets, self.out_targets = _csr(count, sources, targets)
+        self.in_offsets, self.in_sources = _csr(count, targets, sources)
+
+    @classmethod
+    def from_links(cls, names: Sequence[str], links: Sequence[Iterable[str]]) -> "LinkGraph":
+        """
+        Граф по названиям документов и их wikilinks.
+
+        Ссылка разрешается без учёта регистра; при одинаковых названиях —
+        на последний документ (как DocumentIndex.get). Битые ссылки пропускаются.
+        """
+        node_ids = {name.lower(): node for node, name in enumerate(names)}
+        edges = []
+        for source, targets in enumerate(links):
+            for link in targets:
+                target = node_ids.get(link.lower())
+                if target is not None:
+                    edges.append((source, target))
+        return cls(len(names), edges)
+
+    def out_degree(self, node: int) -> int:
+        return self.out_offsets[node + 1] - self.out_offsets[node]
+
+    def in_degree(self, node: int) -> int:
+        return self.in_offsets[node + 1] - self.in_offsets[node]
+
+    def successors(self, node: int) -> array:
+        return self.out_targets[self.out_offsets[node]:self.out_offsets[node + 1]]
+
+    def predecessors(self, node: int) -> array:
+        return self.in_sources[self.in_offsets[node]:self.in_offsets[node + 1]]
+
+    # ==================== PageRank и HITS ====================
+
+    def pagerank(self, damping: float = DAMPING, tolerance: float = TOLERANCE,
+                 max_iterations: int = MAX_ITERATIONS) -> List[float]:
+        """PageRank вершин (сумма — 1)."""
+        n = self.count
+        if n == 0:
+            return []
+        if HAS_NUMPY:
+            dangling = self._np_out_degree == 0
+            weights = 1.0 / np.maximum(self._np_out_degree, 1)
+            ranks = np.full(n, 1.0 / n)
+            for _ in range(max_iterations):
+                flow = np.bincount(self._np_targets, weights=(ranks * weights)[self._np_sources], minlength=n)
+                updated = (1 - damping) / n + damping * (flow + ranks[dangling].sum() / n)
+                delta = np.abs(updated - ranks).sum()
+                ranks = updated
+                if delta < tolerance:
+                    break
+            return ranks.tolist()
+
+        out_degree = [self.out_degree(node) for node in range(n)]
+        ranks = [1.0 / n] * n
+        for _ in range(max_iterations):
+            dangling = sum(rank for rank, degree in zip(ranks, out_degree) if degree == 0)
+            base = (1 - damping) / n + damping * dangling / n
+            share = [rank / degree if degree else 0.0 for rank, degree in zip(ranks, out_degree)]
+            in_offsets, in_sources = self.in_offsets, self.in_sources
+            updated = [
+                base + damping * sum(share[source] for source in in_sources[in_offsets[node]:in_offsets[node + 1]])
+                for node in range(n)
+            ]
+            delta = sum(abs(new - old) for new, old in zip(updated, ranks))
+            ranks = updated
+            if delta < tolerance:
+                break
+        return ranks
+
+    def hits(self, tolerance: float = TOLERANCE, max_iterations: int = MAX_ITERATIONS) -> Tuple[List[float], List[float]]:
+        """(хабы, авторитеты) по алгоритму HITS; каждая оценка нормирована на сумму 1."""
+        n = self.count
+        if n == 0 or self.edge_count == 0:
+            return [0.0] * n, [0.0] * n
+        if HAS_NUMPY:
+            hubs = np.full(n, 1.0 / n)
+            for _ in range(max_iterations):
+                authorities = np.bincount(self._np_targets, weights=hubs[self._np_sources], minlength=n)
+                authorities /= authorities.sum()
+                updated = np.bincount(self._np_sources, weights=authorities[self._np_targets], minlength=n)
+                updated /= updated.sum()
+                delta = np.abs(updated - hubs).sum()
+                hubs = updated
+                if delta < tolerance:
+                    break
+            return hubs.tolist(), authorities.tolist()
+
+        hubs = [1.0 / n] * n
+        authorities = [0.0] * n
+        for _ in range(max_iterations):
+            authorities = [sum(hubs[source] for source in self.predecessors(node)) for node in range(n)]
+            total = sum(authorities)
+            authorities = [value / total for value in authorities]
+            updated = [sum(authorities[target] for target in self.successors(node)) for node in range(n)]
+            total = sum(updated)
+            updated = [value / total for value in updated]
+            delta = sum(abs(new - old) for new, old in zip(updated, hubs))
+            hubs = updated
+            if delta < tolerance:
+                break
+        return hubs, authorities
+
+    # ==================== Компоненты ====================
+
+    def strongly_connected_components(self) -> List[int]:
+        """Номер сильно связной компоненты каждой вершины (итеративный Тарьян)."""
+        n = self.count
+        index = [-1] * n
+        lowlink = [0] * n
+        on_stack = [False] * n
+        component = [-1] * n
+        stack: List[int] = []
+        counter = 0
+        components = 0
+        offsets, targets = self.out_offsets, self.out_targets
+
+        for root in range(n):
+            if index[root] != -1:
+                continue
+            # Стек обхода: (вершина, позиция следующего ребра)
+            work = [(root, offsets[root])]
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            while work:
+                node, edge = work[-1]
+                if edge < offsets[node + 1]:
+                    work[-1] = (node, edge + 1)
+                    target = targets[edge]
+                    if index[target] == -1:
+                        index[target] = lowlink[target] = counter
+                        counter += 1
+                        stack.append(target)
+                        on_stack[target] = True
+                        work.append((target, offsets[target]))
+                    elif on_stack[target] and index[target] < lowlink[node]:
+                        lowlink[node] = index[target]
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    if lowlink[node] < lowlink[parent]:
+                        lowlink[parent] = lowlink[node]
+                if lowlink[node] == index[node]:
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        component[member] = components
+                        if member == node:
+                            break
+                    components += 1
+        return component
+
+    def weakly_connected_components(self) -> List[int]:
+        """Номер слабо связной компоненты (направление ссылок не учитывается)."""
+        parent = list(range(self.count))
+
+        def find(node: int) -> int:
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        offsets, targets = self.out_offsets, self.out_targets
+        for source in range(self.count):
+            for edge in range(offsets[source], offsets[source + 1]):
+                a, b = find(source), find(targets[edge])
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+
+        # Номера компонент — в порядке первой вершины
+        numbers: Dict[int, int] = {}
+        return [numbers.setdefault(find(node), len(numbers)) for node in range(self.count)]
+
+    @staticmethod
+    def groups(labels: Sequence[int]) -> List[List[int]]:
+        """Вершины каждой компоненты; компоненты — по убыванию размера, затем по первой вершине."""
+        members: Dict[int, List[int]] = defaultdict(list)
+        for node, label in enumerate(labels):
+            members[label].append(node)
+        return sorted(members.values(), key=lambda group: (-len(group), group[0]))
+
+    # ==================== Агрегаты ====================
+
+    def only_linked_from(self, flags: Sequence[bool]) -> List[int]:
+        """Вершины, на которые есть ссылки, но только от вершин с flags[i] (например, заглушек)."""
+        return [
+            node for node in range(self.count)
+            if self.in_degree(node) and all(flags[source] for source in self.predecessors(node))
+        ]
+
+    def cross_matrix(self, groups: Sequence[Optional[str]], keys: Sequence[str]) -> Dict[str, Dict[str, int]]:
+        """Число ссылок из группы в группу (вершины без группы из keys не учитываются)."""
+        matrix = {row: {column: 0 for column in keys} for row in keys}
+        if HAS_NUMPY and self.edge_count:
+            positions = {key: i for i, key in enumerate(keys)}
+            codes = np.array([positions.get(group, -1) for group in groups], dtype=np.int64)
+            rows, columns = codes[self._np_sources], codes[self._np_targets]
+            known = (rows >= 0) & (columns >= 0)
+            counts = np.bincount(rows[known] * len(keys) + columns[known], minlength=len(keys) ** 2)
+            for i, row in enumerate(keys):
+                for j, column in enumerate(keys):
+                    matrix[row][column] = int(counts[i * len(keys) + j])
+            return matrix
+
+        for source in range(self.count):
+            row = matrix.get(groups[source])
+            if row is None:
+                continue
+            for target in self.successors(source):
+                if groups[target] in row:
+                    row[groups[target]] += 1
+        return matrix
+
+
+def main():
+    import time
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rng = random.Random(42)
+    # Случайный граф с «популярными» документами: степень ~ 8, цели смещены к началу
+    edges = [(source, int(count * rng.random() ** 2)) for source in range(count) for _ in range(rng.randint(0, 16))]
+
+    started = time.perf_counter()
+    graph = LinkGraph(count, edges)
+    timings = [("построение CSR", time.perf_counter() - started)]
+    for name, compute in [
+        ("PageRank", graph.pagerank),
+        ("HITS", graph.hits),
+        ("сильно связные компоненты", graph.strongly_connected_components),
+        ("слабо связные компоненты", graph.weakly_connected_components),
+    ]:
+        started = time.perf_counter()
+        compute()
+        timings.append((name, time.perf_counter() - started))
+
+    print(f"🕸️  Граф: {graph.count} документов, {graph.edge_count} ссылок, numpy: {'да' if HAS_NUMPY else 'нет'}")
+    for name, seconds in timings:
+        print(f"   {name}: {seconds * 1000:.0f} мс")
+
+
+if __name__ == "__main__":
+    main()
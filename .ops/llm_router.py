@@ -0,0 +1,614 @@
+#!/usr/bin/env python3
+"""
+Единый слой вызова LLM для хранилища: провайдеры, маршрутизация, failover.
+
+Провайдеры (HTTP API без SDK, через httpx):
+- anthropic — Messages API (/v1/messages)
+- openai    — Chat Completions (/v1/chat/completions)
+- google    — Gemini generateContent (/v1beta/models/{model}:generateContent)
+
+base_url каждого провайдера настраивается (например, на локальный
+stub-сервер), ключ берётся из переменной окружения api_key_env.
+
+Маршрутизация по типу задачи (homework_check, classification,
+contradictions, report_analysis): для задачи задан упорядоченный список
+моделей. Для каждой пары провайдер/модель ведётся скользящее окно вызовов:
+p50/p95 задержки и доля ошибок. Маршруты с долей ошибок выше
+max_error_rate или p95 выше latency_budget задачи уходят в конец списка,
+при ошибке вызова запрос автоматически переходит к следующему маршруту.
+
+Каждый вызов проходит через общий ограничитель частоты (rate_limiter.py).
+
+Настройки — блок router в agents-core/homework-checker/config.yaml.
+
+Использование:
+    router = get_router()
+    completion = router.complete("classification", prompt, max_tokens=200)
+    print(completion.text, completion.route.key)
+
+    python3 .ops/llm_router.py --task classification --prompt "Привет"
+    python3 .ops/llm_router.py --task homework_check --routes
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import httpx
+    HAS_HTTPX = True
+except ImportError:
+    HAS_HTTPX = False
+
+from rate_limiter import estimate_tokens, get_limiter, load_checker_config
+
+
+DEFAULT_PROVIDERS = {
+    "anthropic": {"base_url": "https://api.anthropic.com", "api_key_env": "ANTHROPIC_API_KEY"},
+    "openai": {"base_url": "https://api.openai.com", "api_key_env": "OPENAI_API_KEY"},
+    "google": {"base_url": "https://generativelanguage.googleapis.com", "api_key_env": "GOOGLE_API_KEY"},
+}
+
+# Маршруты по умолчанию повторяют модели, которые раньше были зашиты в скриптах
+DEFAULT_ROUTES = {
+    "homework_check": {"models": [
+        {"provider": "anthropic", "model": "claude-3-5-sonnet-20241022"},
+    ]},
+    "classification": {"models": [
+        {"provider": "openai", "model": "gpt-4o-mini"},
+    ]},
+    "contradictions": {"models": [
+        {"provider": "openai", "model": "gpt-4o-mini"},
+    ]},
+    "report_analysis": {"models": [
+        {"provider": "anthropic", "model": "claude-sonnet-4-20250514"},
+    ]},
+}
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+DEFAULT_TIMEOUT = 60.0
+STATS_WINDOW = 100
+MIN_SAMPLES = 5
+MAX_ERROR_RATE = 0.5
+
+TextCallback = Callable[[str], Optional[bool]]
+
+
+class ProviderError(Exception):
+    """
+    Ошибка вызова провайдера.
+
+    kind: http (status_code задан), timeout, transport, stream, config.
+    """
+
+    def __init__(self, kind: str, message: str, status_code: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.kind = kind
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        if self.kind == "http":
+            return self.status_code in RETRYABLE_STATUS
+        return self.kind in ("timeout", "transport", "stream")
+
+
+class _CallbackError(Exception):
+    """Исключение из on_text: пробрасывается вызывающему как есть, а не как ошибка провайдера."""
+
+    def __init__(self, error: BaseException):
+        super().__init__(str(error))
+        self.error = error
+
+
+class RouterError(Exception):
+    """Все маршруты задачи исчерпаны."""
+
+    def __init__(self, task: str, errors: List[Tuple[str, Exception]]):
+        details = "; ".join(f"{key}: {error}" for key, error in errors) or "нет доступных маршрутов"
+        super().__init__(f"LLM недоступна для задачи {task}: {details}")
+        self.task = task
+        self.errors = errors
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Заголовок retry-after: секунды или HTTP-дата."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def iter_sse_events(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """Разбор text/event-stream: (event, data) для каждого события."""
+    event = None
+    data = []
+    for line in lines:
+        line = line.rstrip("\r")
+        if not line:
+            if data:
+                yield event or "message", "\n".join(data)
+            event, data = None, []
+        elif line.startswith(":"):
+            continue
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].lstrip())
+    if data:
+        yield event or "message", "\n".join(data)
+
+
+# ==================== ПРОВАЙДЕРЫ ====================
+
+class Provider:
+    """Базовый HTTP-провайдер: ключ, base_url, обычный и потоковый вызов."""
+
+    name = ""
+
+    def __init__(self, base_url: str, api_key_env: str):
+        self.base_url = base_url.rstrip("/")
+        self.api_key_env = api_key_env
+
+    @property
+    def api_key(self) -> Optional[str]:
+        return os.environ.get(self.api_key_env)
+
+    def complete(self, model: str, system: str, prompt: str, max_tokens: int, temperature: float,
+                 timeout: float, usage: dict, on_text: Optional[TextCallback] = None) -> str:
+        """
+        Вызов модели; usage заполняется input_tokens/output_tokens.
+
+        При on_text ответ читается потоком: on_text(фрагмент) вызывается
+        для каждого фрагмента, truthy-результат прекращает чтение.
+        Исключение из on_text пробрасывается без изменений.
+        """
+        if not HAS_HTTPX:
+            raise ProviderError("config", "httpx не установлен. Установите: pip install httpx")
+        if not self.api_key:
+            raise ProviderError("config", f"Не установлена переменная окружения {self.api_key_env}")
+
+        url, headers, payload = self.build(model, system, prompt, max_tokens, temperature, on_text is not None)
+        try:
+            if on_text is None:
+                response = httpx.post(url, headers=headers, json=payload, timeout=timeout)
+                self._check(response)
+                return self.parse(response.json(), usage)
+
+            parts = []
+            with httpx.stream("POST", url, headers=headers, json=payload, timeout=timeout) as response:
+                if response.status_code != 200:
+                    response.read()
+                self._check(response)
+                for text in self.parse_stream(response.iter_lines(), usage):
+                    parts.append(text)
+                    try:
+                        stop = on_text(text)
+                    except Exception as e:
+                        raise _CallbackError(e)
+                    if stop:
+                        break
+            return "".join(parts)
+        except _CallbackError as e:
+            # Ошибка разбора ответа в on_text (например, JSONDecodeError) — та же, что
+            # без потока при разборе текста; здоровье маршрута она не характеризует
+            raise e.error from None
+        except httpx.TimeoutException as e:
+            raise ProviderError("timeout", f"Таймаут {self.name}: {e}")
+        except httpx.TransportError as e:
+            raise ProviderError("transport", f"Ошибка соединения с {self.name}: {e}")
+        except (ValueError, KeyError, IndexError) as e:
+            raise ProviderError("stream", f"Некорректный ответ {self.name}: {e}")
+
+    def _check(self, response):
+        if response.status_code != 200:
+            raise ProviderError(
+                "http", f"{self.name} вернул HTTP {response.status_code}: {response.text[:500]}",
+                status_code=response.status_code,
+                retry_after=parse_retry_after(response.headers.get("retry-after")),
+            )
+
+    def build(self, model, system, prompt, max_tokens, temperature, stream) -> Tuple[str, dict, dict]:
+        raise NotImplementedError
+
+    def parse(self, data: dict, usage: dict) -> str:
+        raise NotImplementedError
+
+    def parse_stream(self, lines: Iterable[str], usage: dict) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class AnthropicProvider(Provider):
+    name = "anthropic"
+
+    def build(self, model, system, prompt, max_tokens, temperature, stream):
+        payload = {
+            "model": model,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+        if system:
+            payload["system"] = system
+        if stream:
+            payload["stream"] = True
+        headers = {
+            "x-api-key": self.api_key,
+            "anthropic-version": "2023-06-01",
+            "content-type": "application/json",
+        }
+        return f"{self.base_url}/v1/messages", headers, payload
+
+    def parse(self, data, usage):
+        usage.update(data.get("usage", {}))
+        return "".join(block.get("text", "") for block in data.get("content", []) if block.get("type", "text") == "text")
+
+    def parse_stream(self, lines, usage):
+        for event, data in iter_sse_events(lines):
+            payload = json.loads(data)
+            kind = payload.get("type", event)
+            if kind == "content_block_delta":
+                delta = payload.get("delta", {})
+                if delta.get("type") == "text_delta":
+                    yield delta.get("text", "")
+            elif kind == "message_start":
+                usage.update(payload.get("message", {}).get("usage", {}))
+            elif kind == "message_delta":
+                usage.update(payload.get("usage", {}))
+            elif kind == "error":
+                error = payload.get("error", {})
+                raise ProviderError("stream", f"{error.get('type', 'error')}: {error.get('message', '')}")
+            elif kind == "message_stop":
+                return
+
+
+class OpenAIProvider(Provider):
+    name = "openai"
+
+    def build(self, model, system, prompt, max_tokens, temperature, stream):
+        messages = []
+        if system:
+            messages.append({"role": "system", "content": system})
+        messages.append({"role": "user", "content": prompt})
+        payload = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        }
+        if stream:
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}
+        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        return f"{self.base_url}/v1/chat/completions", headers, payload
+
+    @staticmethod
+    def _usage(raw: Optional[dict], usage: dict):
+        if raw:
+            usage["input_tokens"] = raw.get("prompt_tokens", 0)
+            usage["output_tokens"] = raw.get("completion_tokens", 0)
+
+    def parse(self, data, usage):
+        self._usage(data.get("usage"), usage)
+        return data["choices"][0]["message"].get("content") or ""
+
+    def parse_stream(self, lines, usage):
+        for _, data in iter_sse_events(lines):
+            if data.strip() == "[DONE]":
+                return
+            payload = json.loads(data)
+            if "error" in payload:
+                raise ProviderError("stream", str(payload["error"]))
+            self._usage(payload.get("usage"), usage)
+            for choice in payload.get("choices", []):
+                text = choice.get("delta", {}).get("content")
+                if text:
+                    yield text
+
+
+class GoogleProvider(Provider):
+    name = "google"
+
+    def build(self, model, system, prompt, max_tokens, temperature, stream):
+        payload = {
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "generationConfig": {"maxOutputTokens": max_tokens, "temperature": temperature},
+        }
+        if system:
+            payload["systemInstruction"] = {"parts": [{"text": system}]}
+        method = "streamGenerateContent?alt=sse" if stream else "generateContent"
+        headers = {"x-goog-api-key": self.api_key, "Content-Type": "application/json"}
+        return f"{self.base_url}/v1beta/models/{model}:{method}", headers, payload
+
+    @staticmethod
+    def _text(data: dict) -> str:
+        parts = []
+        for candidate in data.get("candidates", [])[:1]:
+            for part in candidate.get("content", {}).get("parts", []):
+                parts.append(part.get("text", ""))
+        return "".join(parts)
+
+    @staticmethod
+    def _usage(raw: Optional[dict], usage: dict):
+        if raw:
+            usage["input_tokens"] = raw.get("promptTokenCount", 0)
+            usage["output_tokens"] = raw.get("candidatesTokenCount", 0)
+
+    def parse(self, data, usage):
+        self._usage(data.get("usageMetadata"), usage)
+        return self._text(data)
+
+    def parse_stream(self, lines, usage):
+        for _, data in iter_sse_events(lines):
+            payload = json.loads(data)
+            if "error" in payload:
+                raise ProviderError("stream", str(payload["error"]))
+            self._usage(payload.get("usageMetadata"), usage)
+            text = self._text(payload)
+            if text:
+                yield text
+
+
+PROVIDER_CLASSES = {
+    "anthropic": AnthropicProvider,
+    "openai": OpenAIProvider,
+    "google": GoogleProvider,
+}
+
+
+# ==================== МАРШРУТИЗАЦИЯ ====================
+
+class Route:
+    """Пара провайдер/модель."""
+
+    __slots__ = ("provider", "model")
+
+    def __init__(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+
+    @property
+    def key(self) -> str:
+        return f"{self.provider}/{self.model}"
+
+    def __repr__(self):
+        return f"Route({self.key})"
+
+
+class Completion:
+    """Результат вызова: текст, usage, маршрут и задержка."""
+
+    __slots__ = ("text", "usage", "route", "latency")
+
+    def __init__(self, text: str, usage: dict, route: Route, latency: float):
+        self.text = text
+        self.usage = usage
+        self.route = route
+        self.latency = latency
+
+
+class RouteStats:
+    """Скользящее окно вызовов маршрута: задержки и ошибки."""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self.calls = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            self.calls.append((latency, ok))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            calls = list(self.calls)
+        latencies = sorted(latency for latency, ok in calls if ok)
+        errors = sum(1 for _, ok in calls if not ok)
+        return {
+            "count": len(calls),
+            "error_rate": errors / len(calls) if calls else 0.0,
+            "p50": _percentile(latencies, 0.50),
+            "p95": _percentile(latencies, 0.95),
+        }
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(q * (len(values) - 1)))))
+    return round(values[index], 3)
+
+
+class LLMRouter:
+    """Маршрутизатор вызовов LLM по типу задачи с учётом задержки и ошибок."""
+
+    def __init__(self, settings: Optional[dict] = None, rate_limit_config: Optional[dict] = None):
+        settings = settings or {}
+        self.rate_limit_config = rate_limit_config
+        self.window = settings.get("stats_window", STATS_WINDOW)
+        self.min_samples = settings.get("min_samples", MIN_SAMPLES)
+        self.max_error_rate = settings.get("max_error_rate", MAX_ERROR_RATE)
+
+        self.providers: Dict[str, Provider] = {}
+        for name, cls in PROVIDER_CLASSES.items():
+            options = dict(DEFAULT_PROVIDERS[name])
+            options.update((settings.get("providers") or {}).get(name) or {})
+            self.providers[name] = cls(options["base_url"], options["api_key_env"])
+
+        self.tasks: Dict[str, dict] = {name: dict(task) for name, task in DEFAULT_ROUTES.items()}
+        for name, task in (settings.get("routes") or {}).items():
+            self.tasks[name] = task
+
+        self.stats: Dict[str, RouteStats] = {}
+        self._stats_lock = threading.Lock()
+
+    def _stats(self, route: Route) -> RouteStats:
+        with self._stats_lock:
+            stats = self.stats.get(route.key)
+            if stats is None:
+                stats = self.stats[route.key] = RouteStats(self.window)
+            return stats
+
+    def is_healthy(self, route: Route, task: str) -> bool:
+        snapshot = self._stats(route).snapshot()
+        if snapshot["count"] < self.min_samples:
+            return True
+        if snapshot["error_rate"] > self.max_error_rate:
+            return False
+        budget = self.tasks.get(task, {}).get("latency_budget")
+        return not (budget and snapshot["p95"] is not None and snapshot["p95"] > budget)
+
+    def routes(self, task: str, exclude: Iterable[str] = ()) -> List[Route]:
+        """
+        Маршруты задачи в порядке попыток.
+
+        Порядок из конфигурации сохраняется, но нездоровые маршруты (доля
+        ошибок или p95 выше порога) уходят в конец; маршруты провайдеров
+        без ключа пропускаются.
+        """
+        excluded = set(exclude)
+        models = self.tasks.get(task, self.tasks.get("default", {})).get("models", [])
+        candidates = []
+        for item in models:
+            route = Route(item["provider"], item["model"])
+            provider = self.providers.get(route.provider)
+            if route.key in excluded or provider is None or not provider.api_key:
+                continue
+            candidates.append(route)
+
+        healthy = [r for r in candidates if self.is_healthy(r, task)]
+        unhealthy = sorted(
+            (r for r in candidates if r not in healthy),
+            key=lambda r: self._stats(r).snapshot()["error_rate"]
+        )
+        return healthy + unhealthy
+
+    def available(self, task: str) -> bool:
+        return bool(self.routes(task))
+
+    def limiter(self, provider: str):
+        if self.rate_limit_config is not None:
+            return get_limiter(provider, self.rate_limit_config)
+        return get_limiter(provider)
+
+    def call(
+        self,
+        route: Route,
+        prompt: str,
+        system: str = "",
+        max_tokens: int = 1024,
+        temperature: float = 0.3,
+        timeout: float = DEFAULT_TIMEOUT,
+        on_text: Optional[TextCallback] = None,
+        limiter_timeout: Optional[float] = None,
+    ) -> Completion:
+        """
+        Один вызов по маршруту: лимит частоты, запрос, учёт задержки и ошибки.
+
+        Если разрешение лимитера не получено за limiter_timeout,
+        поднимается ProviderError(kind="rate_limited").
+        """
+        limiter = self.limiter(route.provider)
+        reserved = estimate_tokens(system) + estimate_tokens(prompt) + max_tokens
+        if limiter is not None and not limiter.acquire(reserved, timeout=limiter_timeout):
+            raise ProviderError("rate_limited", "Исчерпан общий лимит частоты вызовов LLM",
+                                retry_after=limiter.wait_time(reserved))
+
+        provider = self.providers[route.provider]
+        usage = {}
+        started = time.perf_counter()
+        try:
+            text = provider.complete(route.model, system, prompt, max_tokens, temperature, timeout, usage, on_text)
+        except ProviderError as e:
+            # Ошибки конфигурации и 4xx запроса не говорят о здоровье маршрута
+            if e.retryable:
+                self._stats(route).record(time.perf_counter() - started, ok=False)
+            raise
+        finally:
+            if limiter is not None and usage:
+                limiter.settle(reserved, usage.get("input_tokens", 0) + usage.get("output_tokens", 0))
+
+        latency = time.perf_counter() - started
+        self._stats(route).record(latency, ok=True)
+        return Completion(text, usage, route, latency)
+
+    def complete(self, task: str, prompt: str, system: str = "", max_tokens: int = 1024,
+                 temperature: float = 0.3, timeout: float = DEFAULT_TIMEOUT) -> Completion:
+        """Вызов с автоматическим переходом к следующему маршруту при ошибке."""
+        errors = []
+        for route in self.routes(task):
+            try:
+                return self.call(route, prompt, system, max_tokens, temperature, timeout)
+            except ProviderError as e:
+                print(f"[WARN] {route.key}: {e}", file=sys.stderr)
+                errors.append((route.key, e))
+        raise RouterError(task, errors)
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._stats_lock:
+            keys = list(self.stats)
+        return {key: self.stats[key].snapshot() for key in keys}
+
+
+_router: Optional[LLMRouter] = None
+
+
+def get_router(config: Optional[dict] = None) -> LLMRouter:
+    """
+    Маршрутизатор процесса.
+
+    Args:
+        config: полная конфигурация ДЗ-чекера; по умолчанию читается config.yaml
+    """
+    global _router
+    if _router is None:
+        if config is None:
+            config = load_checker_config()
+            _router = LLMRouter(config.get("router"))
+        else:
+            _router = LLMRouter(config.get("router"), rate_limit_config=config)
+    return _router
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Маршрутизатор вызовов LLM")
+    parser.add_argument("--task", "-t", default="classification", help="Тип задачи")
+    parser.add_argument("--prompt", "-p", help="Промпт для пробного вызова")
+    parser.add_argument("--max-tokens", type=int, default=200)
+    parser.add_argument("--routes", action="store_true", help="Показать маршруты задачи")
+    args = parser.parse_args()
+
+    router = get_router()
+
+    if args.routes or not args.prompt:
+        routes = router.routes(args.task)
+        print(f"{args.task}: {', '.join(r.key for r in routes) or 'нет маршрутов с ключами'}")
+        return
+
+    try:
+        completion = router.complete(args.task, args.prompt, max_tokens=args.max_tokens)
+    except RouterError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(completion.text)
+    print(f"\n[{completion.route.key}] {completion.latency:.2f} с, usage={completion.usage}", file=sys.stderr)
+    print(json.dumps(router.snapshot(), ensure_ascii=False), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
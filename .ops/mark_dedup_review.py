@@ -9,6 +9,7 @@ from pathlib import Path
 import re
 import yaml
 import sys
+from frontmatter import load as load_frontmatter
 
 ROOT = Path(__file__).resolve().parents[1]
 REPORT = ROOT / 'ops' / 'dedup_report.md'
@@ -22,7 +23,7 @@ def split_frontmatter(text):
     if fm is None:
         return {}, body
     try:
-        data = yaml.safe_load(fm) or {}
+        data = load_frontmatter(fm) or {}
     except Exception:
         data = {}
     return data, body
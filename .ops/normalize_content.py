@@ -22,7 +22,8 @@ import io
 import datetime
 import yaml
 from pathlib import Path
-import difflib
+from frontmatter import load as load_frontmatter
+from fuzzy_match import FuzzyIndex
 
 CONTENT_DIR = Path('content')
 REPORT_PATH = Path('content') / '0. Управление' / '0.4. Автоматические отчёты ИИ' / 'Противоречия и несогласованности 0.4.md'
@@ -52,7 +53,7 @@ def parse_frontmatter(text):
     raw = parts[1]
     body = parts[2]
     try:
-        data = yaml.safe_load(raw)
+        data = load_frontmatter(raw)
         if data is None:
             data = {}
     except Exception:
@@ -67,18 +68,31 @@ def build_frontmatter(data):
 # 1) build file index: basename (no ext) -> path, and H1 title -> path
 file_index = {}
 title_index = {}
+fuzzy_index = FuzzyIndex()  # basenames, H1 titles and aliases -> path
+other_names = []
 md_files = list(CONTENT_DIR.rglob('*.md'))
 for p in md_files:
     basename = p.name
     key = basename
     file_index[key] = p
+    fuzzy_index.add(p.stem, p)
     # read H1
     text = read_text(p)
+    fm, _ = parse_frontmatter(text)
+    aliases = (fm.get('aliases') or fm.get('alias') or []) if isinstance(fm, dict) else []
+    if not isinstance(aliases, list):
+        aliases = [aliases]
+    other_names += [(str(a), p) for a in aliases if a]
     # find first H1
     m = re.search(r'^#\s+(.+)$', text, flags=re.M)
     if m:
         title = m.group(1).strip()
         title_index[title] = p
+        other_names.append((title, p))
+
+# basenames take precedence over titles and aliases with the same key
+for n, p in other_names:
+    fuzzy_index.add(n, p)
 
 print(f'Indexed {len(md_files)} markdown files under content/')
 
@@ -180,31 +194,10 @@ if unresolved:
 fuzzy_resolved = {}
 still_unresolved = []
 for name in unresolved:
-    # build candidate pool: basenames and titles
-    candidates = list(file_index.values()) + list(title_index.values())
-    # unique
-    candidates = list(dict.fromkeys(candidates))
-    # prepare keys for matching
-    keys = [str(p.name) for p in candidates] + [t for t in title_index.keys()]
-    # use difflib to find close matches
-    match = difflib.get_close_matches(name, keys, n=1, cutoff=0.65)
+    # trigram index + bounded edit distance (see fuzzy_match.py)
+    match = fuzzy_index.best(name, min_score=0.65)
     if match:
-        m = match[0]
-        # find corresponding path
-        target = None
-        # check filenames
-        for p in candidates:
-            if p.name == m:
-                target = p
-                break
-        # check titles
-        if target is None:
-            if m in title_index:
-                target = title_index[m]
-        if target:
-            fuzzy_resolved[name] = target
-        else:
-            still_unresolved.append(name)
+        fuzzy_resolved[name] = match.target
     else:
         still_unresolved.append(name)
 
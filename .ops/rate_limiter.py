@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Общий ограничитель частоты вызовов LLM (token bucket в SQLite).
+
+Один API-ключ используют ДЗ-чекер, build_report.py --ai-analysis и
+classify_documents.py. Чтобы их всплески не упирались в лимиты провайдера
+(и не порождали лавину повторов после 429), все исходящие вызовы берут
+разрешение из общего ведра:
+
+- запросы в минуту и токены в минуту — два ведра на провайдера;
+- состояние лежит в SQLite (.ops/.cache/rate_limits.sqlite), изменения —
+  в транзакции BEGIN IMMEDIATE, поэтому отдельные процессы согласованы;
+- перед вызовом резервируется оценка токенов (промпт + max_tokens),
+  после ответа резерв уточняется по фактическому usage.
+
+Лимиты задаются в блоке rate_limit файла agents-core/homework-checker/config.yaml
+(или config.local.yaml рядом с ним).
+
+Использование:
+    limiter = get_limiter("anthropic")
+    if limiter is not None:
+        limiter.acquire(estimate_tokens(prompt) + max_tokens)
+    ...
+    limiter.settle(reserved, actual_tokens)
+
+    python3 .ops/rate_limiter.py            # текущее состояние вёдер
+"""
+
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+import yaml
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+CHECKER_CONFIG = REPO_ROOT / "agents-core" / "homework-checker" / "config.yaml"
+DEFAULT_DB_PATH = REPO_ROOT / ".ops" / ".cache" / "rate_limits.sqlite"
+
+# Лимиты по умолчанию, если провайдер не описан в конфигурации
+DEFAULT_LIMITS = {
+    "anthropic": {"requests_per_minute": 50, "tokens_per_minute": 40000},
+    "openai": {"requests_per_minute": 500, "tokens_per_minute": 200000},
+    "google": {"requests_per_minute": 60, "tokens_per_minute": 100000},
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    requests REAL NOT NULL,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка токенов для резерва (~3 символа на токен для русского текста)."""
+    return len(text) // 3 + 1
+
+
+class RateLimiter:
+    """Два token bucket (запросы и токены в минуту) с состоянием в SQLite."""
+
+    def __init__(self, db_path: Path, name: str, requests_per_minute: float, tokens_per_minute: float):
+        self.db_path = Path(db_path)
+        self.name = name
+        self.requests_per_minute = float(requests_per_minute)
+        self.tokens_per_minute = float(tokens_per_minute)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def _load(self, conn: sqlite3.Connection, now: float) -> tuple:
+        """Текущее наполнение вёдер с учётом пополнения с прошлого обращения."""
+        row = conn.execute(
+            "SELECT requests, tokens, updated_at FROM buckets WHERE name = ?", (self.name,)
+        ).fetchone()
+        if row is None:
+            return self.requests_per_minute, self.tokens_per_minute
+        requests, tokens, updated_at = row
+        elapsed = max(0.0, now - updated_at)
+        requests = min(self.requests_per_minute, requests + elapsed * self.requests_per_minute / 60)
+        tokens = min(self.tokens_per_minute, tokens + elapsed * self.tokens_per_minute / 60)
+        return requests, tokens
+
+    def _store(self, conn: sqlite3.Connection, now: float, requests: float, tokens: float):
+        conn.execute(
+            "INSERT OR REPLACE INTO buckets (name, requests, tokens, updated_at) VALUES (?, ?, ?, ?)",
+            (self.name, requests, tokens, now)
+        )
+
+    def _wait(self, requests: float, available: float, need: float) -> float:
+        """Секунды до момента, когда в обоих вёдрах хватит места."""
+        wait_requests = (1 - requests) * 60 / self.requests_per_minute if requests < 1 else 0
+        wait_tokens = (need - available) * 60 / self.tokens_per_minute if available < need else 0
+        return max(wait_requests, wait_tokens)
+
+    def try_acquire(self, tokens: int) -> float:
+        """
+        Попытка взять 1 запрос и tokens токенов.
+
+        Returns:
+            0 — разрешение получено, иначе — сколько секунд подождать
+        """
+        # Запрос больше ёмкости ведра не должен ждать вечно
+        need = min(float(tokens), self.tokens_per_minute)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                requests, available = self._load(conn, now)
+                if requests >= 1 and available >= need:
+                    self._store(conn, now, requests - 1, available - need)
+                    conn.execute("COMMIT")
+                    return 0.0
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+        return max(self._wait(requests, available, need), 0.05)
+
+    def acquire(self, tokens: int, timeout: Optional[float] = None) -> bool:
+        """
+        Ожидание разрешения на вызов.
+
+        Returns:
+            True — разрешение получено; False — не уложились в timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= wait:
+                    return False
+            time.sleep(wait)
+
+    def wait_time(self, tokens: int) -> float:
+        """Оценка ожидания без резервирования (для retry-after)."""
+        with self._connect() as conn:
+            requests, available = self._load(conn, time.time())
+        return self._wait(requests, available, min(float(tokens), self.tokens_per_minute))
+
+    def settle(self, reserved: int, actual: Optional[int]):
+        """Уточнение резерва по фактическому расходу токенов."""
+        if actual is None or actual == reserved:
+            return
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                requests, available = self._load(conn, now)
+                # Перерасход уводит ведро в минус — следующие вызовы подождут
+                available = min(self.tokens_per_minute, available + reserved - actual)
+                self._store(conn, now, requests, available)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def state(self) -> Dict[str, float]:
+        with self._connect() as conn:
+            requests, tokens = self._load(conn, time.time())
+        return {
+            "requests": round(requests, 2),
+            "requests_per_minute": self.requests_per_minute,
+            "tokens": round(tokens),
+            "tokens_per_minute": self.tokens_per_minute,
+        }
+
+
+def load_checker_config(config_path: Path = CHECKER_CONFIG) -> dict:
+    """Конфигурация ДЗ-чекера (с приоритетом config.local.yaml) — общая для .ops-скриптов."""
+    local_config = config_path.parent / "config.local.yaml"
+    if local_config.exists():
+        config_path = local_config
+    if not config_path.exists():
+        return {}
+    with open(config_path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def load_rate_limit_config(config_path: Path = CHECKER_CONFIG) -> dict:
+    """Блок rate_limit из config.yaml ДЗ-чекера."""
+    return load_checker_config(config_path).get("rate_limit") or {}
+
+
+_limiters: Dict[str, RateLimiter] = {}
+
+
+def get_limiter(
+    provider: str,
+    config: Optional[dict] = None,
+    base_dir: Path = CHECKER_CONFIG.parent
+) -> Optional[RateLimiter]:
+    """
+    Ограничитель для провайдера (None, если rate_limit.enabled выключен).
+
+    Args:
+        provider: anthropic, openai, google
+        config: полная конфигурация ДЗ-чекера; по умолчанию читается config.yaml
+        base_dir: база для относительного rate_limit.db_path (папка ДЗ-чекера)
+    """
+    if provider in _limiters:
+        return _limiters[provider]
+
+    settings = (config or {}).get("rate_limit") if config is not None else load_rate_limit_config()
+    settings = settings or {}
+    if not settings.get("enabled", False):
+        return None
+
+    limits = dict(DEFAULT_LIMITS.get(provider, DEFAULT_LIMITS["anthropic"]))
+    limits.update((settings.get("providers") or {}).get(provider) or {})
+
+    db_path = Path(settings["db_path"]) if settings.get("db_path") else DEFAULT_DB_PATH
+    if not db_path.is_absolute():
+        db_path = (base_dir / db_path).resolve()
+
+    try:
+        limiter = RateLimiter(db_path, provider, limits["requests_per_minute"], limits["tokens_per_minute"])
+    except sqlite3.Error as e:
+        print(f"[WARN] Ограничитель частоты отключён: {e}", file=sys.stderr)
+        limiter = None
+    _limiters[provider] = limiter
+    return limiter
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Состояние общего ограничителя частоты LLM")
+    parser.add_argument("--provider", "-p", action="append", help="Провайдер (по умолчанию все)")
+    args = parser.parse_args()
+
+    for provider in args.provider or sorted(DEFAULT_LIMITS):
+        limiter = get_limiter(provider)
+        if limiter is None:
+            print("rate_limit.enabled выключен в config.yaml")
+            return
+        print(f"{provider}: {limiter.state()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Извлечение терминов и определений по всему хранилищу (map-reduce).
+
+Раньше в AI-анализ терминологии попадали 10 «приоритетных» документов и
+выдержки из 30 остальных, обрезанные до 15 000 символов, — большая часть
+хранилища не анализировалась. Теперь:
+
+- map: тело каждого документа (без блоков кода) делится на фрагменты по
+  заголовкам, не длиннее CHUNK_CHARS; в каждом фрагменте кандидаты
+  «термин — определение» ищутся локально регулярными выражениями:
+  «X — это Y», таблицы глоссария (Термин | Определение), а в глоссариях
+  и разделах определений — ещё и списки «**X**: Y» (метка, повторённая
+  в документе несколько раз, — заголовок поля, а не термин);
+- LLM вызывается только для фрагментов, где есть признаки определения
+  («называется», «понимается», «означает», ...), но регулярные выражения
+  ничего не нашли, — не больше max_llm_chunks фрагментов, параллельно
+  в workers потоков (частоту ограничивает общий лимитер маршрутизатора,
+  ответы кэшируются вместе с остальным AI-анализом);
+- reduce: кандидаты сводятся в одну таблицу по нормализованному термину —
+  число документов, различающиеся определения (конфликты) и варианты
+  написания (дефис, пробел, регистр, ё, аббревиатура в скобках). Для
+  итогового AI-анализа из таблицы собирается сжатый контекст: сначала
+  конфликты и варианты, затем остальные термины по числу документов.
+
+    index = collect_terms((doc.name, doc.body) for doc in documents)
+    index.render_table()            # Markdown-таблица терминов
+    index.reduce_context(24000)     # контекст для итогового AI-анализа
+
+    python3 .ops/terminology.py [content]      # охват и время по хранилищу
+"""
+
+import re
+import sys
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from fuzzy_match import normalize_key
+
+# Максимальная длина фрагмента для map-шага
+CHUNK_CHARS = 6000
+# Фрагментов, отправляемых в LLM, и потоков для них
+DEFAULT_MAX_LLM_CHUNKS = 40
+DEFAULT_LLM_WORKERS = 4
+# Определения с меньшей долей общих слов считаются разными
+CONFLICT_SIMILARITY = 0.5
+# Определений одного термина в контексте для AI
+CONTEXT_DEFINITIONS = 4
+DEFINITION_CHARS = 240
+
+FENCE_RE = re.compile(r"^```.*?^```[^\n]*$", re.MULTILINE | re.DOTALL)
+HEADING_RE = re.compile(r"^#{1,4}\s+(.+?)\s*#*\s*$", re.MULTILINE)
+
+# «**Термин** — это определение», «Термин — это определение»
+IS_DEFINITION_RE = re.compile(
+    r"^(?:[-*+]\s+|>\s*)?\**(?P<term>[A-ZА-ЯЁ][^*\n—–:]{1,60}?)\**\s+[—–-]\s+это\s+(?P<definition>[^\n]{10,})",
+    re.MULTILINE
+)
+# «- **Термин**: определение», «**Термин:** определение», «**Термин** — определение»
+LABEL_RE = re.compile(
+    r"^(?:[-*+]\s+)?\*\*(?P<term>[^*\n]{2,60}?)(?P<inner>:)?\*\*"
+    r"(?(inner)\s*|\s*(?::|[—–-])\s*)(?P<definition>[^\n]{20,})",
+    re.MULTILINE
+)
+TABLE_ROW_RE = re.compile(r"^\|(.+)\|\s*$")
+PARENTHESIS_RE = re.compile(r"^(.+?)\s*\((.+)\)$")
+
+# Признаки определения в тексте, не пойманного регулярными выражениями
+DEFINITION_SIGNALS_RE = re.compile(
+    r"\b(?:называ(?:ется|ют|ем)|понима(?:ется|ем|ют)|означает|определя(?:ется|ем)\s+как|"
+    r"под\s+\S+(?:\s+\S+)?\s+понима|термин)",
+    re.IGNORECASE
+)
+
+# Документы и разделы, где списки «**X**: Y» — определения
+GLOSSARY_PATTERNS = ["глоссарий", "термин", "определени", "понятие", "онтолог", "словарь"]
+TABLE_TERM_HEADERS = {"термин", "понятие", "term"}
+TABLE_DEFINITION_HEADERS = ("определени", "описание", "смысл", "значение", "definition")
+
+# Метки полей документа, а не термины
+LABEL_STOPLIST = {
+    "статус", "тип", "файл", "owner", "примечание", "версия", "автор", "дата", "цель", "результат",
+    "важно", "пример", "ссылка", "репозиторий", "last updated", "updated", "status", "note", "источник",
+}
+
+MAP_PROMPT = """Выпиши термины, которые определяются в тексте ниже, по одному на строку в формате:
+термин :: определение
+
+Определение — одно предложение из текста (или его близкий пересказ). Если определений нет, ответь «нет»."""
+MAP_MAX_TOKENS = 1024
+
+
+class Candidate:
+    """Кандидат: термин, определение, документ и способ извлечения."""
+
+    __slots__ = ("term", "definition", "doc", "source")
+
+    def __init__(self, term: str, definition: str, doc: str, source: str):
+        self.term = term
+        self.definition = definition
+        self.doc = doc
+        self.source = source
+
+    def __repr__(self):
+        return f"Candidate({self.term!r}, {self.doc!r}, {self.source})"
+
+
+class Chunk:
+    """Фрагмент документа для map-шага."""
+
+    __slots__ = ("doc", "heading", "text")
+
+    def __init__(self, doc: str, heading: str, text: str):
+        self.doc = doc
+        self.heading = heading
+        self.text = text
+
+
+def clean_term(term: str) -> str:
+    return term.strip().strip("*_`«»\"'").rstrip(":.,;").strip()
+
+
+def clean_definition(definition: str) -> str:
+    definition = re.sub(r"\s+", " ", definition.replace("**", "")).strip()
+    return definition[:DEFINITION_CHARS].rstrip()
+
+
+def split_chunks(doc: str, body: str, limit: int = CHUNK_CHARS) -> List[Chunk]:
+    """Фрагменты тела документа по заголовкам (блоки кода вырезаны), не длиннее limit."""
+    body = FENCE_RE.sub("", body)
+    sections = []
+    heading, start = "", 0
+    for match in HEADING_RE.finditer(body):
+        sections.append((heading, body[start:match.start()]))
+        heading, start = match.group(1), match.end()
+    sections.append((heading, body[start:]))
+
+    chunks = []
+    for heading, text in sections:
+        text = text.strip()
+        while text:
+            if len(text) <= limit:
+                piece, text = text, ""
+            else:
+                cut = text.rfind("\n\n", 0, limit)
+                cut = cut if cut > limit // 2 else limit
+                piece, text = text[:cut], text[cut:].lstrip()
+            chunks.append(Chunk(doc, heading, piece))
+    return chunks
+
+
+def _is_term(term: str) -> bool:
+    # Фрагмент предложения («В контексте ... «минимум», «Раздел. Термин») — не термин
+    return (1 < len(term) <= 60 and len(term.split()) <= 6 and "«" not in term and ". " not in term
+            and term.lower() not in LABEL_STOPLIST and not term.startswith(("[[", "http")))
+
+
+def _table_candidates(chunk: Chunk) -> List[Candidate]:
+    """Строки таблиц вида | Термин | Определение |."""
+    candidates = []
+    columns = None
+    for line in chunk.text.splitlines():
+        match = TABLE_ROW_RE.match(line.strip())
+        if not match:
+            columns = None
+            continue
+        cells = [cell.strip() for cell in match.group(1).split("|")]
+        if columns is None:
+            header = [clean_term(cell).lower() for cell in cells]
+            definition = next((i for i, cell in enumerate(header)
+                               if i > 0 and cell.startswith(TABLE_DEFINITION_HEADERS)), None)
+            columns = (0, definition) if header and header[0] in TABLE_TERM_HEADERS and definition else ()
+            continue
+        if not columns or set(line.strip()) <= set("|-: "):
+            continue
+        term_index, definition_index = columns
+        if definition_index < len(cells):
+            term = clean_term(cells[term_index])
+            if _is_term(term) and len(cells[definition_index]) >= 10:
+                candidates.append(Candidate(term, clean_definition(cells[definition_index]), chunk.doc, "таблица"))
+    return candidates
+
+
+def local_candidates(chunk: Chunk) -> List[Candidate]:
+    """Кандидаты фрагмента, найденные регулярными выражениями."""
+    candidates = []
+    for match in IS_DEFINITION_RE.finditer(chunk.text):
+        term = clean_term(match.group("term"))
+        if _is_term(term):
+            candidates.append(Candidate(term, clean_definition(match.group("definition")), chunk.doc, "это"))
+
+    candidates += _table_candidates(chunk)
+
+    context = f"{chunk.doc} {chunk.heading}".lower()
+    if any(pattern in context for pattern in GLOSSARY_PATTERNS):
+        found = {normalize_key(c.term) for c in candidates}
+        for match in LABEL_RE.finditer(chunk.text):
+            term = clean_term(match.group("term"))
+            if _is_term(term) and normalize_key(term) not in found:
+                candidates.append(Candidate(term, clean_definition(match.group("definition")), chunk.doc, "глоссарий"))
+    return candidates
+
+
+def parse_llm_terms(text: str, doc: str) -> List[Candidate]:
+    """Строки «термин :: определение» из ответа LLM."""
+    candidates = []
+    for line in text.splitlines():
+        if "::" not in line:
+            continue
+        term, definition = line.split("::", 1)
+        term = clean_term(term.lstrip("-*0123456789. "))
+        if _is_term(term) and len(definition.strip()) >= 10:
+            candidates.append(Candidate(term, clean_definition(definition), doc, "ai"))
+    return candidates
+
+
+def _words(text: str) -> set:
+    return {word for word in re.findall(r"\w{3,}", text.lower().replace("ё", "е"))}
+
+
+def _similar(a: str, b: str) -> bool:
+    words_a, words_b = _words(a), _words(b)
+    if not words_a or not words_b:
+        return a == b
+    return len(words_a & words_b) / len(words_a | words_b) >= CONFLICT_SIMILARITY
+
+
+def _compact_key(key: str) -> str:
+    return re.sub(r"[\s\-–—_.]+", "", key)
+
+
+def _variant_keys(key: str) -> set:
+    """Ключи, по которым термин совпадает со своими вариантами: «FPF (First Principles Framework)» — и FPF."""
+    keys = {_compact_key(key)}
+    match = PARENTHESIS_RE.match(key)
+    if match:
+        keys.update(_compact_key(part) for part in match.groups() if part.strip())
+    return keys - {""}
+
+
+class TermEntry:
+    """Термин после reduce: формы написания и определения по документам."""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.forms: Counter = Counter()
+        self.definitions: List[Candidate] = []
+        self.docs: set = set()
+
+    @property
+    def name(self) -> str:
+        return self.forms.most_common(1)[0][0]
+
+    def distinct_definitions(self) -> List[Candidate]:
+        """Определения, попарно непохожие друг на друга (первое из похожих)."""
+        distinct = []
+        for candidate in self.definitions:
+            if not any(_similar(candidate.definition, other.definition) for other in distinct):
+                distinct.append(candidate)
+        return distinct
+
+    @property
+    def conflicting(self) -> bool:
+        """Разные определения в разных документах."""
+        distinct = self.distinct_definitions()
+        return len({candidate.doc for candidate in distinct}) > 1
+
+
+class TermIndex:
+    """Сводная таблица терминов хранилища."""
+
+    def __init__(self):
+        self.entries: Dict[str, TermEntry] = {}
+        self.stats = {"documents": 0, "chunks": 0, "candidates": 0,
+                      "llm_needed": 0, "llm_chunks": 0, "llm_candidates": 0}
+
+    def add(self, candidate: Candidate):
+        key = normalize_key(candidate.term)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = TermEntry(key)
+        entry.forms[candidate.term] += 1
+        entry.docs.add(candidate.doc)
+        # Копии документа в разных папках дают одно и то же определение
+        if not any(other.doc == candidate.doc and other.definition == candidate.definition
+                   for other in entry.definitions):
+            entry.definitions.append(candidate)
+        self.stats["candidates"] += 1
+
+    def variants(self) -> List[List[TermEntry]]:
+        """Группы терминов, различающихся дефисами, пробелами, точками или аббревиатурой в скобках."""
+        # Объединение по общим ключам (термин может попасть в группу через аббревиатуру)
+        parent: Dict[str, str] = {}
+
+        def find(key: str) -> str:
+            while parent.setdefault(key, key) != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        for entry in self.entries.values():
+            keys = list(_variant_keys(entry.key))
+            for key in keys[1:]:
+                parent[find(key)] = find(keys[0])
+
+        groups = defaultdict(list)
+        for entry in self.entries.values():
+            groups[find(next(iter(_variant_keys(entry.key))))].append(entry)
+        return [sorted(group, key=lambda e: (-len(e.docs), e.key))
+                for group in groups.values() if len(group) > 1]
+
+    def ranked(self) -> List[TermEntry]:
+        """Термины: сначала конфликты, затем по числу документов."""
+        return sorted(self.entries.values(), key=lambda e: (not e.conflicting, -len(e.docs), e.key))
+
+    def render_table(self, limit: int = 60) -> str:
+        """Markdown: охват, сводная таблица терминов и варианты написания."""
+        stats = self.stats
+        entries = self.ranked()
+        conflicts = [entry for entry in entries if entry.conflicting]
+        variants = self.variants()
+        variant_keys = {entry.key for group in variants for entry in group}
+
+        text = "## Охват анализа\n\n"
+        text += "| Показатель | Значение |\n|------------|----------|\n"
+        text += f"| Документов | {stats['documents']} |\n"
+        text += f"| Фрагментов | {stats['chunks']} |\n"
+        text += f"| Кандидатов «термин — определение» | {stats['candidates']} |\n"
+        text += f"| Терминов после сведения | {len(self.entries)} |\n"
+        text += f"| Фрагментов с признаками определений без локальных кандидатов | {stats['llm_needed']} |\n"
+        text += f"| Из них разобрано LLM | {stats['llm_chunks']} ({stats['llm_candidates']} кандидатов) |\n\n"
+
+        text += "## Сводная таблица терминов\n\n"
+        text += "| Статус | Количество |\n|--------|------------|\n"
+        text += f"| 🔴 Разные определения в разных документах | {len(conflicts)} |\n"
+        # Статус термина — худший из его признаков
+        variant_only = variant_keys - {entry.key for entry in conflicts}
+        text += f"| 🟡 Варианты написания | {len(variant_only)} |\n"
+        text += f"| 🟢 Согласованные | {len(self.entries) - len(conflicts) - len(variant_only)} |\n\n"
+
+        if entries:
+            text += "| Термин | Статус | Определений | Документов | Документы |\n"
+            text += "|--------|--------|-------------|------------|-----------|\n"
+            for entry in entries[:limit]:
+                status = "🔴" if entry.conflicting else "🟡" if entry.key in variant_keys else "🟢"
+                docs = sorted(entry.docs)
+                shown = ", ".join(docs[:3]) + (f" и ещё {len(docs) - 3}" if len(docs) > 3 else "")
+                text += (f"| {entry.name} | {status} | {len(entry.distinct_definitions())} "
+                         f"| {len(docs)} | {shown} |\n")
+            if len(entries) > limit:
+                text += f"\n*... и ещё {len(entries) - limit} терминов*\n"
+            text += "\n"
+
+        if variants:
+            text += "### Варианты написания\n\n"
+            for group in variants:
+                text += "- " + " / ".join(f"«{entry.name}» ({len(entry.docs)})" for entry in group) + "\n"
+            text += "\n"
+        return text
+
+    def reduce_context(self, limit: int) -> str:
+        """Сжатый контекст для итогового AI-анализа, не длиннее limit символов."""
+        variant_keys = {entry.key for group in self.variants() for entry in group}
+        parts = [f"Сведено терминов: {len(self.entries)} из {self.stats['documents']} документов "
+                 f"({self.stats['candidates']} кандидатов «термин — определение»)."]
+        size = len(parts[0])
+        for entry in self.ranked():
+            marks = []
+            if entry.conflicting:
+                marks.append("разные определения")
+            if entry.key in variant_keys:
+                marks.append("варианты: " + ", ".join(sorted(entry.forms)))
+            header = f"### {entry.name}" + (f" ({'; '.join(marks)})" if marks else "")
+            lines = [header] + [f"- {candidate.doc}: {candidate.definition}"
+                                for candidate in entry.distinct_definitions()[:CONTEXT_DEFINITIONS]]
+            part = "\n".join(lines)
+            if size + len(part) + 2 > limit:
+                break
+            parts.append(part)
+            size += len(part) + 2
+        return "\n\n".join(parts)
+
+
+def collect_terms(
+    documents: Iterable[Tuple[str, str]],
+    llm_extract: Optional[Callable[[Chunk], str]] = None,
+    max_llm_chunks: int = DEFAULT_MAX_LLM_CHUNKS,
+    workers: int = DEFAULT_LLM_WORKERS,
+) -> TermIndex:
+    """
+    Map-reduce по документам (имя, тело).
+
+    Args:
+        llm_extract: вызов LLM для фрагмента, ответ — строки «термин :: определение»
+            (None — только локальное извлечение)
+        max_llm_chunks: сколько фрагментов без локальных кандидатов отдать LLM
+        workers: параллельных вызовов LLM
+    """
+    index = TermIndex()
+    needs_llm = []
+    for name, body in documents:
+        index.stats["documents"] += 1
+        found = []
+        for chunk in split_chunks(name, body):
+            index.stats["chunks"] += 1
+            candidates = local_candidates(chunk)
+            found += candidates
+            if not candidates:
+                signals = len(DEFINITION_SIGNALS_RE.findall(chunk.text))
+                if signals:
+                    needs_llm.append((signals, chunk))
+
+        labels = Counter(normalize_key(c.term) for c in found if c.source == "глоссарий")
+        for candidate in found:
+            if candidate.source != "глоссарий" or labels[normalize_key(candidate.term)] == 1:
+                index.add(candidate)
+
+    index.stats["llm_needed"] = len(needs_llm)
+    if llm_extract is None or not needs_llm or max_llm_chunks <= 0:
+        return index
+
+    # Больше признаков определения — раньше в очереди; копии документа в разных папках — один раз
+    needs_llm.sort(key=lambda item: -item[0])
+    chunks, seen = [], set()
+    for _, chunk in needs_llm:
+        if chunk.text not in seen:
+            seen.add(chunk.text)
+            chunks.append(chunk)
+            if len(chunks) == max_llm_chunks:
+                break
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        answers = list(pool.map(llm_extract, chunks))
+
+    llm_candidates = 0
+    for chunk, answer in zip(chunks, answers):
+        for candidate in parse_llm_terms(answer, chunk.doc):
+            index.add(candidate)
+            llm_candidates += 1
+    index.stats["llm_chunks"] = len(chunks)
+    index.stats["llm_candidates"] = llm_candidates
+    return index
+
+
+def main():
+    import time
+    from pathlib import Path
+
+    from frontmatter import split
+
+    root = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("content")
+    files = [path for path in root.rglob("*.md") if ".obsidian" not in path.parts]
+    if not files:
+        print(f"❌ В {root} нет .md файлов")
+        sys.exit(1)
+
+    documents = [(path.stem, split(path.read_text(encoding="utf-8"))[1]) for path in files]
+    started = time.perf_counter()
+    index = collect_terms(documents)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    stats = index.stats
+    print(f"📚 Документов: {stats['documents']}, фрагментов: {stats['chunks']}, {elapsed_ms:.0f} мс")
+    print(f"   Кандидатов: {stats['candidates']}, терминов: {len(index.entries)}, "
+          f"с разными определениями: {sum(1 for e in index.entries.values() if e.conflicting)}")
+    print(f"   Фрагментов для LLM (признаки определений без кандидатов): {stats['llm_needed']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""
+Тесты маршрутизатора LLM (.ops/llm_router.py) на локальных stub-серверах.
+
+Каждый провайдер направляется (base_url) на http-сервер в том же процессе,
+который отвечает заготовленными ответами и запоминает запросы. Проверяются
+формат запроса, разбор обычного и потокового (SSE) ответа, usage, failover
+между маршрутами и разбор Retry-After.
+
+    python3 -m pytest .ops/tests -q
+"""
+
+import json
+import sys
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+pytest.importorskip("httpx")
+
+from llm_router import LLMRouter, ProviderError, RouterError, parse_retry_after  # noqa: E402
+
+
+class StubResponse:
+    """Заготовленный ответ: статус, тело (dict — JSON, list — SSE-события) и заголовки."""
+
+    def __init__(self, status=200, body=None, headers=None):
+        self.status = status
+        self.body = body if body is not None else {}
+        self.headers = headers or {}
+
+    def encode(self) -> tuple:
+        if isinstance(self.body, list):
+            events = []
+            for event in self.body:
+                if isinstance(event, tuple):
+                    name, data = event
+                    events.append(f"event: {name}\ndata: {json.dumps(data)}\n\n")
+                elif isinstance(event, str):
+                    events.append(f"data: {event}\n\n")
+                else:
+                    events.append(f"data: {json.dumps(event)}\n\n")
+            return "text/event-stream", "".join(events).encode("utf-8")
+        return "application/json", json.dumps(self.body).encode("utf-8")
+
+
+class StubServer:
+    """HTTP-сервер провайдера: очередь ответов и журнал запросов (путь, заголовки, тело)."""
+
+    def __init__(self):
+        self.responses = []
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("content-length", 0))
+                server.requests.append({
+                    "path": self.path,
+                    "headers": {key.lower(): value for key, value in self.headers.items()},
+                    "body": json.loads(self.rfile.read(length) or b"{}"),
+                })
+                response = server.responses.pop(0) if server.responses else StubResponse(500, {"error": "no stub"})
+                content_type, payload = response.encode()
+                self.send_response(response.status)
+                self.send_header("content-type", content_type)
+                self.send_header("content-length", str(len(payload)))
+                for key, value in response.headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self.thread.start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def stubs(monkeypatch):
+    servers = {name: StubServer() for name in ("anthropic", "openai", "google")}
+    for name in servers:
+        monkeypatch.setenv(f"STUB_{name.upper()}_KEY", f"key-{name}")
+    yield servers
+    for server in servers.values():
+        server.close()
+
+
+def make_router(stubs, models, **settings) -> LLMRouter:
+    """Маршрутизатор с провайдерами на stub-серверах и без общего лимитера."""
+    settings = dict(settings)
+    settings["providers"] = {
+        name: {"base_url": server.url, "api_key_env": f"STUB_{name.upper()}_KEY"}
+        for name, server in stubs.items()
+    }
+    settings["routes"] = {"test": {"models": [{"provider": p, "model": m} for p, m in models]}}
+    return LLMRouter(settings, rate_limit_config={})
+
+
+# ==================== ANTHROPIC ====================
+
+def test_anthropic_request_and_parse(stubs):
+    stubs["anthropic"].responses.append(StubResponse(body={
+        "content": [{"type": "text", "text": "Привет"}, {"type": "text", "text": ", мир"}],
+        "usage": {"input_tokens": 12, "output_tokens": 3},
+    }))
+    router = make_router(stubs, [("anthropic", "claude-test")])
+
+    completion = router.complete("test", "вопрос", system="роль", max_tokens=50)
+
+    assert completion.text == "Привет, мир"
+    assert completion.usage == {"input_tokens": 12, "output_tokens": 3}
+    assert completion.route.key == "anthropic/claude-test"
+    request = stubs["anthropic"].requests[0]
+    assert request["path"] == "/v1/messages"
+    assert request["headers"]["x-api-key"] == "key-anthropic"
+    assert request["headers"]["anthropic-version"] == "2023-06-01"
+    assert request["body"]["model"] == "claude-test"
+    assert request["body"]["system"] == "роль"
+    assert request["body"]["max_tokens"] == 50
+    assert request["body"]["messages"] == [{"role": "user", "content": "вопрос"}]
+    assert "stream" not in request["body"]
+
+
+def test_anthropic_stream(stubs):
+    stubs["anthropic"].responses.append(StubResponse(body=[
+        ("message_start", {"type": "message_start", "message": {"usage": {"input_tokens": 7}}}),
+        ("content_block_delta", {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "аб"}}),
+        ("ping", {"type": "ping"}),
+        ("content_block_delta", {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "вг"}}),
+        ("message_delta", {"type": "message_delta", "usage": {"output_tokens": 2}}),
+        ("message_stop", {"type": "message_stop"}),
+    ]))
+    router = make_router(stubs, [("anthropic", "claude-test")])
+    chunks = []
+
+    completion = router.call(router.routes("test")[0], "вопрос", on_text=chunks.append)
+
+    assert chunks == ["аб", "вг"]
+    assert completion.text == "абвг"
+    assert completion.usage == {"input_tokens": 7, "output_tokens": 2}
+    assert stubs["anthropic"].requests[0]["body"]["stream"] is True
+
+
+def test_anthropic_stream_error_event(stubs):
+    stubs["anthropic"].responses.append(StubResponse(body=[
+        ("error", {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}}),
+    ]))
+    router = make_router(stubs, [("anthropic", "claude-test")])
+
+    with pytest.raises(ProviderError) as error:
+        router.call(router.routes("test")[0], "вопрос", on_text=lambda text: None)
+
+    assert error.value.kind == "stream"
+    assert error.value.retryable
+    assert "overloaded_error" in str(error.value)
+
+
+# ==================== OPENAI ====================
+
+def test_openai_request_and_parse(stubs):
+    stubs["openai"].responses.append(StubResponse(body={
+        "choices": [{"message": {"role": "assistant", "content": "ответ"}}],
+        "usage": {"prompt_tokens": 20, "completion_tokens": 4},
+    }))
+    router = make_router(stubs, [("openai", "gpt-test")])
+
+    completion = router.complete("test", "вопрос", system="роль")
+
+    assert completion.text == "ответ"
+    assert completion.usage == {"input_tokens": 20, "output_tokens": 4}
+    request = stubs["openai"].requests[0]
+    assert request["path"] == "/v1/chat/completions"
+    assert request["headers"]["authorization"] == "Bearer key-openai"
+    assert request["body"]["messages"] == [
+        {"role": "system", "content": "роль"},
+        {"role": "user", "content": "вопрос"},
+    ]
+
+
+def test_openai_stream(stubs):
+    stubs["openai"].responses.append(StubResponse(body=[
+        {"choices": [{"delta": {"role": "assistant"}}]},
+        {"choices": [{"delta": {"content": "при"}}]},
+        {"choices": [{"delta": {"content": "вет"}}]},
+        {"choices": [], "usage": {"prompt_tokens": 5, "completion_tokens": 2}},
+        "[DONE]",
+    ]))
+    router = make_router(stubs, [("openai", "gpt-test")])
+    chunks = []
+
+    completion = router.call(router.routes("test")[0], "вопрос", on_text=chunks.append)
+
+    assert chunks == ["при", "вет"]
+    assert completion.text == "привет"
+    assert completion.usage == {"input_tokens": 5, "output_tokens": 2}
+    body = stubs["openai"].requests[0]["body"]
+    assert body["stream"] is True
+    assert body["stream_options"] == {"include_usage": True}
+
+
+def test_stream_stops_when_callback_returns_true(stubs):
+    stubs["openai"].responses.append(StubResponse(body=[
+        {"choices": [{"delta": {"content": "раз"}}]},
+        {"choices": [{"delta": {"content": "два"}}]},
+        "[DONE]",
+    ]))
+    router = make_router(stubs, [("openai", "gpt-test")])
+
+    completion = router.call(router.routes("test")[0], "вопрос", on_text=lambda text: True)
+
+    assert completion.text == "раз"
+
+
+def test_stream_callback_error_propagates_unchanged(stubs):
+    stubs["openai"].responses.append(StubResponse(body=[{"choices": [{"delta": {"content": "{не json"}}]}, "[DONE]"]))
+    router = make_router(stubs, [("openai", "gpt-test")])
+
+    def on_text(text):
+        return json.loads(text)
+
+    with pytest.raises(json.JSONDecodeError):
+        router.call(router.routes("test")[0], "вопрос", on_text=on_text)
+    # Некорректный вывод модели — не ошибка маршрута
+    assert router.snapshot()["openai/gpt-test"]["error_rate"] == 0.0
+
+
+# ==================== GOOGLE ====================
+
+def test_google_request_and_parse(stubs):
+    stubs["google"].responses.append(StubResponse(body={
+        "candidates": [{"content": {"parts": [{"text": "да"}, {"text": "нет"}]}}],
+        "usageMetadata": {"promptTokenCount": 9, "candidatesTokenCount": 2},
+    }))
+    router = make_router(stubs, [("google", "gemini-test")])
+
+    completion = router.complete("test", "вопрос", system="роль", max_tokens=30)
+
+    assert completion.text == "данет"
+    assert completion.usage == {"input_tokens": 9, "output_tokens": 2}
+    request = stubs["google"].requests[0]
+    assert request["path"] == "/v1beta/models/gemini-test:generateContent"
+    assert request["headers"]["x-goog-api-key"] == "key-google"
+    assert request["body"]["systemInstruction"] == {"parts": [{"text": "роль"}]}
+    assert request["body"]["generationConfig"]["maxOutputTokens"] == 30
+
+
+def test_google_stream(stubs):
+    stubs["google"].responses.append(StubResponse(body=[
+        {"candidates": [{"content": {"parts": [{"text": "пер"}]}}]},
+        {"candidates": [{"content": {"parts": [{"text": "вый"}]}}],
+         "usageMetadata": {"promptTokenCount": 4, "candidatesTokenCount": 2}},
+    ]))
+    router = make_router(stubs, [("google", "gemini-test")])
+    chunks = []
+
+    completion = router.call(router.routes("test")[0], "вопрос", on_text=chunks.append)
+
+    assert chunks == ["пер", "вый"]
+    assert completion.text == "первый"
+    assert completion.usage == {"input_tokens": 4, "output_tokens": 2}
+    assert stubs["google"].requests[0]["path"] == "/v1beta/models/gemini-test:streamGenerateContent?alt=sse"
+
+
+# ==================== FAILOVER И RETRY-AFTER ====================
+
+def test_failover_to_next_route(stubs):
+    stubs["anthropic"].responses.append(StubResponse(503, {"error": "overloaded"}))
+    stubs["openai"].responses.append(StubResponse(body={"choices": [{"message": {"content": "резерв"}}]}))
+    router = make_router(stubs, [("anthropic", "claude-test"), ("openai", "gpt-test")])
+
+    completion = router.complete("test", "вопрос")
+
+    assert completion.text == "резерв"
+    assert completion.route.key == "openai/gpt-test"
+    assert len(stubs["anthropic"].requests) == 1
+    snapshot = router.snapshot()
+    assert snapshot["anthropic/claude-test"]["error_rate"] == 1.0
+    assert snapshot["openai/gpt-test"]["error_rate"] == 0.0
+
+
+def test_failover_on_non_retryable_error_without_health_penalty(stubs):
+    stubs["google"].responses.append(StubResponse(400, {"error": {"message": "bad request"}}))
+    stubs["anthropic"].responses.append(StubResponse(body={"content": [{"type": "text", "text": "ok"}]}))
+    router = make_router(stubs, [("google", "gemini-test"), ("anthropic", "claude-test")])
+
+    completion = router.complete("test", "вопрос")
+
+    assert completion.route.key == "anthropic/claude-test"
+    # 4xx запроса не говорит о здоровье маршрута
+    assert router.snapshot()["google/gemini-test"]["count"] == 0
+
+
+def test_all_routes_failed(stubs):
+    stubs["anthropic"].responses.append(StubResponse(500, {"error": "boom"}))
+    stubs["openai"].responses.append(StubResponse(502, {"error": "bad gateway"}))
+    router = make_router(stubs, [("anthropic", "claude-test"), ("openai", "gpt-test")])
+
+    with pytest.raises(RouterError) as error:
+        router.complete("test", "вопрос")
+
+    assert [key for key, _ in error.value.errors] == ["anthropic/claude-test", "openai/gpt-test"]
+    assert [e.status_code for _, e in error.value.errors] == [500, 502]
+
+
+def test_unhealthy_route_moves_to_end(stubs):
+    for _ in range(3):
+        stubs["anthropic"].responses.append(StubResponse(503, {"error": "overloaded"}))
+        stubs["openai"].responses.append(StubResponse(body={"choices": [{"message": {"content": "ok"}}]}))
+    router = make_router(stubs, [("anthropic", "claude-test"), ("openai", "gpt-test")],
+                         min_samples=2, max_error_rate=0.5)
+
+    router.complete("test", "вопрос")
+    router.complete("test", "вопрос")
+
+    assert [route.key for route in router.routes("test")] == ["openai/gpt-test", "anthropic/claude-test"]
+    router.complete("test", "вопрос")
+    assert len(stubs["anthropic"].requests) == 2
+
+
+def test_retry_after_seconds(stubs):
+    stubs["openai"].responses.append(StubResponse(429, {"error": "rate limited"}, headers={"retry-after": "7"}))
+    router = make_router(stubs, [("openai", "gpt-test")])
+
+    with pytest.raises(ProviderError) as error:
+        router.call(router.routes("test")[0], "вопрос")
+
+    assert error.value.kind == "http"
+    assert error.value.status_code == 429
+    assert error.value.retryable
+    assert error.value.retry_after == 7.0
+
+
+def test_retry_after_http_date(stubs):
+    stubs["anthropic"].responses.append(StubResponse(
+        529, {"error": "overloaded"}, headers={"retry-after": formatdate(usegmt=True)}
+    ))
+    router = make_router(stubs, [("anthropic", "claude-test")])
+
+    with pytest.raises(ProviderError) as error:
+        router.call(router.routes("test")[0], "вопрос", on_text=lambda text: None)
+
+    assert error.value.status_code == 529
+    assert 0.0 <= error.value.retry_after <= 1.0
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("") is None
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after("-3") == 0.0
+    assert parse_retry_after("не дата") is None
+
+
+def test_missing_key_skips_route(stubs, monkeypatch):
+    monkeypatch.delenv("STUB_ANTHROPIC_KEY")
+    stubs["openai"].responses.append(StubResponse(body={"choices": [{"message": {"content": "ok"}}]}))
+    router = make_router(stubs, [("anthropic", "claude-test"), ("openai", "gpt-test")])
+
+    assert [route.key for route in router.routes("test")] == ["openai/gpt-test"]
+    assert router.complete("test", "вопрос").route.key == "openai/gpt-test"
+    assert stubs["anthropic"].requests == []
@@ -33,6 +33,16 @@ ARTIFACTS_DIR = BASE_DIR / "artifacts" / "docs" / "reviews"
 # Создаем директорию для отчетов если не существует
 ARTIFACTS_DIR.mkdir(parents=True, exist_ok=True)
 
+# Общий разбор frontmatter (.ops/frontmatter.py)
+OPS_DIR = BASE_DIR / ".ops"
+if str(OPS_DIR) not in sys.path:
+    sys.path.insert(0, str(OPS_DIR))
+
+from frontmatter import get_keys
+
+REQUIRED_FIELDS = ["type", "audience", "edit_mode", "layer", "scope", "security"]
+RECOMMENDED_FIELDS = ["status", "version"]
+
 
 def check_frontmatter(file_path: Path) -> Dict:
     """Проверяет наличие и корректность frontmatter"""
@@ -53,19 +63,18 @@ def check_frontmatter(file_path: Path) -> Dict:
         issues.append("Некорректный формат frontmatter")
         return {"score": 0, "issues": issues}
 
-    frontmatter = parts[1]
+    # Ключи верхнего уровня (подстрока "type:" находилась и в "doc_type:", и в тексте значений)
+    frontmatter = get_keys(parts[1], REQUIRED_FIELDS + RECOMMENDED_FIELDS)
 
     # Обязательные поля
-    required_fields = ["type", "audience", "edit_mode", "layer", "scope", "security"]
-    for field in required_fields:
-        if f"{field}:" not in frontmatter:
+    for field in REQUIRED_FIELDS:
+        if field not in frontmatter:
             issues.append(f"Отсутствует обязательное поле: {field}")
             score -= 15
 
     # Рекомендуемые поля
-    recommended_fields = ["status", "version"]
-    for field in recommended_fields:
-        if f"{field}:" not in frontmatter:
+    for field in RECOMMENDED_FIELDS:
+        if field not in frontmatter:
             issues.append(f"Рекомендуется добавить поле: {field}")
             score -= 5
 
@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест ДЗ-чекера.
+
+Запускает локальный mock LLM (Anthropic Messages API, обычный и потоковый
+ответ) с заданным распределением задержки и ошибок, поднимает server.py
+с конфигурацией, направленной на mock (router.providers.anthropic.base_url),
+и подаёт на /check или /check/stream поток запросов с заданной частотой.
+
+Нагрузка — открытая модель: запросы отправляются по расписанию (равномерно
+или пуассоновским потоком), независимо от того, ответил ли сервер на
+предыдущие. Задержка считается от запланированного момента отправки,
+поэтому очередь на стороне клиента не скрывает медленный сервер.
+
+Запросы строятся из examples/request_example.json: ответы разной длины,
+разделы из data/questions_map.yaml.
+
+Результат — JSON: пропускная способность, p50/p95/p99 задержки (и времени
+до первого события для /check/stream), доля и коды ошибок, статистика mock LLM.
+
+Использование:
+    python3 benchmark.py --rps 5 --duration 30
+    python3 benchmark.py --rps 20 --endpoint /check/stream --llm-latency 2 --llm-errors 429:0.05,500:0.02
+    python3 benchmark.py --url http://localhost:8080 --rps 5       # уже запущенный сервер
+    python3 benchmark.py --mock-only --mock-port 8901              # только mock LLM
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import yaml
+
+from check import load_config
+
+AGENT_ROOT = Path(__file__).parent
+EXAMPLE_REQUEST = AGENT_ROOT / "examples" / "request_example.json"
+QUESTIONS_MAP = AGENT_ROOT / "data" / "questions_map.yaml"
+
+MOCK_MODEL = "mock-llm"
+VERDICTS = [("accepted", 85), ("needs_revision", 65), ("rejected", 30)]
+
+
+class MockLLM:
+    """
+    Параметры и статистика mock LLM.
+
+    Задержка ответа — логнормальная с медианой latency и разбросом sigma
+    (sigma=0 — фиксированная). errors — доли ответов с ошибкой по виду:
+    HTTP-код ("429", "500", ...) или "timeout" (ответ не приходит hang секунд).
+    """
+
+    def __init__(self, latency: float = 1.0, sigma: float = 0.3, errors: Optional[Dict[str, float]] = None,
+                 hang: float = 120.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.sigma = sigma
+        self.errors = errors or {}
+        self.hang = hang
+        self.random = random.Random(seed)
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def draw(self) -> tuple:
+        """(исход, задержка) очередного вызова."""
+        with self._lock:
+            roll = self.random.random()
+            outcome = "ok"
+            for kind, share in self.errors.items():
+                if roll < share:
+                    outcome = kind
+                    break
+                roll -= share
+            delay = self.latency * math.exp(self.random.gauss(0, self.sigma)) if self.sigma > 0 else self.latency
+            verdict = self.random.choice(VERDICTS)
+            self.calls[outcome] = self.calls.get(outcome, 0) + 1
+        return outcome, delay, verdict
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            calls = dict(self.calls)
+        return {
+            "latency_median_s": self.latency,
+            "latency_sigma": self.sigma,
+            "errors": self.errors,
+            "calls": sum(calls.values()),
+            "by_outcome": calls,
+        }
+
+
+def _result_text(verdict: tuple) -> str:
+    name, score = verdict
+    return "```json\n" + json.dumps({
+        "verdict": name,
+        "score": score,
+        "strengths": ["Ответ опирается на понятие модели"],
+        "issues": [] if name == "accepted" else [
+            {"issue": "Пример раскрыт не полностью", "suggestion": "Добавьте второе описание того же объекта"}
+        ],
+        "next_step": "Сравните два описания одного объекта и назовите, какие свойства опущены в каждом.",
+    }, ensure_ascii=False) + "\n```"
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """POST /v1/messages в формате Anthropic Messages API."""
+
+    mock: MockLLM = None
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = {}
+
+        outcome, delay, verdict = self.mock.draw()
+        if outcome == "timeout":
+            time.sleep(self.mock.hang)
+            return
+        if outcome != "ok":
+            time.sleep(delay / 10)
+            error = json.dumps({"type": "error", "error": {"type": "mock_error", "message": outcome}}).encode()
+            self.send_response(int(outcome))
+            if outcome == "429":
+                self.send_header("retry-after", "1")
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", len(error))
+            self.end_headers()
+            self.wfile.write(error)
+            return
+
+        text = _result_text(verdict)
+        usage = {"input_tokens": len(body) // 4, "output_tokens": len(text) // 3}
+        if payload.get("stream"):
+            self._stream(text, usage, delay)
+            return
+
+        time.sleep(delay)
+        response = json.dumps({
+            "id": "msg_mock",
+            "type": "message",
+            "role": "assistant",
+            "model": payload.get("model", MOCK_MODEL),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "usage": usage,
+        }, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", len(response))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def _stream(self, text: str, usage: dict, delay: float):
+        """SSE-поток: первый токен через 30% задержки, остальное — равномерно."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+
+        chunks = [text[i:i + 16] for i in range(0, len(text), 16)]
+        events = [("message_start", {"type": "message_start", "message": {"usage": {"input_tokens": usage["input_tokens"]}}})]
+        events += [("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                            "delta": {"type": "text_delta", "text": chunk}}) for chunk in chunks]
+        events += [("message_delta", {"type": "message_delta", "usage": {"output_tokens": usage["output_tokens"]}}),
+                   ("message_stop", {"type": "message_stop"})]
+
+        time.sleep(delay * 0.3)
+        pause = delay * 0.7 / max(1, len(chunks))
+        try:
+            for event, data in events:
+                self.wfile.write(f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                if event == "content_block_delta":
+                    time.sleep(pause)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock(mock: MockLLM, port: int = 0) -> ThreadingHTTPServer:
+    """Mock LLM в фоновом потоке; фактический порт — server.server_address[1]."""
+    handler = type("BoundMockLLMHandler", (MockLLMHandler,), {"mock": mock})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def build_payloads(example: dict) -> List[dict]:
+    """Варианты запросов: ответы разной длины по разделам из карты вопросов."""
+    answer = example["answer_text"]
+    sentences = [s for s in re.split(r"(?<=[.!?])\s+", answer) if s]
+    answers = [
+        sentences[0],
+        answer,
+        " ".join([answer] + sentences[::-1]),
+    ]
+
+    sections = [(example["question_text"], example["section_name"])]
+    if QUESTIONS_MAP.exists():
+        with open(QUESTIONS_MAP, "r", encoding="utf-8") as f:
+            questions_map = yaml.safe_load(f) or {}
+        for course in (questions_map.get("courses") or {}).values():
+            for question in (course.get("questions") or {}).values():
+                section = re.sub(r"^[\d.]+\s*", "", question.get("guide_section", ""))
+                if section:
+                    sections.append((question.get("title", example["question_text"]), section))
+
+    return [
+        {
+            "answer_text": answer_text,
+            "question_text": question_text,
+            "course_name": example["course_name"],
+            "section_name": section_name,
+        }
+        for question_text, section_name in sections
+        for answer_text in answers
+    ]
+
+
+def write_server_config(mock_url: str, directory: Path, llm_stream: bool, rate_limit: bool,
+                        precheck: bool = False) -> Path:
+    """config.yaml чекера, в котором маршрут homework_check ведёт на mock LLM."""
+    config = load_config()
+    config.setdefault("llm", {})["stream"] = llm_stream
+    router = config.setdefault("router", {})
+    router.setdefault("providers", {})["anthropic"] = {"base_url": mock_url, "api_key_env": "ANTHROPIC_API_KEY"}
+    router.setdefault("routes", {})["homework_check"] = {"models": [{"provider": "anthropic", "model": MOCK_MODEL}]}
+    config.setdefault("rate_limit", {})["enabled"] = rate_limit
+    # Короткий вариант ответа иначе отклоняется предпроверкой без вызова LLM
+    config.setdefault("precheck", {})["enabled"] = precheck
+    config.setdefault("metrics", {})["enabled"] = True
+
+    path = directory / "config.yaml"
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f, allow_unicode=True, sort_keys=False)
+    return path
+
+
+def start_server(config_path: Path, port: int, log_path: Path, startup_timeout: float = 120.0) -> subprocess.Popen:
+    """server.py в отдельном процессе; ожидание готовности по GET /health."""
+    env = dict(os.environ, ANTHROPIC_API_KEY="benchmark")
+    log = open(log_path, "w", encoding="utf-8")
+    process = subprocess.Popen(
+        [sys.executable, str(AGENT_ROOT / "server.py"), "--host", "127.0.0.1", "--port", str(port),
+         "--config", str(config_path)],
+        cwd=str(AGENT_ROOT), env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+    started = time.monotonic()
+    while time.monotonic() - started < startup_timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"server.py завершился с кодом {process.returncode}, лог: {log_path}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"server.py не ответил на /health за {startup_timeout} с, лог: {log_path}")
+
+
+def send_request(url: str, endpoint: str, payload: dict, timeout: float) -> dict:
+    """Один запрос к чекеру: статус, время до первого события (SSE), ошибка."""
+    parsed = urlparse(url)
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    started = time.perf_counter()
+    result = {"status": None, "ttfb": None, "error": None, "started": started}
+    try:
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=timeout)
+        conn.request("POST", endpoint, body=body, headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        result["status"] = response.status
+        if endpoint == "/check/stream" and response.status == 200:
+            for line in response:
+                if line.startswith(b"event:"):
+                    if result["ttfb"] is None:
+                        result["ttfb"] = time.perf_counter() - started
+                    if line.strip() == b"event: error":
+                        result["error"] = "stream_error"
+        else:
+            response.read()
+        conn.close()
+    except OSError as e:
+        result["error"] = type(e).__name__
+    return result
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Перцентиль методом ближайшего ранга."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def latency_summary(values: List[float]) -> dict:
+    if not values:
+        return {}
+    return {
+        "p50": round(percentile(values, 0.50) * 1000, 1),
+        "p95": round(percentile(values, 0.95) * 1000, 1),
+        "p99": round(percentile(values, 0.99) * 1000, 1),
+        "max": round(max(values) * 1000, 1),
+        "mean": round(sum(values) / len(values) * 1000, 1),
+    }
+
+
+def run_load(url: str, endpoint: str, payloads: List[dict], rps: float, duration: float,
+             concurrency: int, arrival: str, timeout: float, seed: Optional[int] = None) -> dict:
+    """Открытая нагрузка: запросы по расписанию, задержка — от запланированного момента."""
+    rng = random.Random(seed)
+    records = []
+    records_lock = threading.Lock()
+
+    def fire(scheduled: float, payload: dict):
+        result = send_request(url, endpoint, payload, timeout)
+        result["latency"] = time.perf_counter() - scheduled
+        if result["ttfb"] is not None:
+            # send_request меряет от фактической отправки — добавляем ожидание в очереди клиента
+            result["ttfb"] += result["started"] - scheduled
+        with records_lock:
+            records.append(result)
+
+    started = time.perf_counter()
+    scheduled = started
+    sent = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while True:
+            interval = rng.expovariate(rps) if arrival == "poisson" else 1.0 / rps
+            scheduled += interval
+            if scheduled - started > duration:
+                break
+            pause = scheduled - time.perf_counter()
+            if pause > 0:
+                time.sleep(pause)
+            pool.submit(fire, scheduled, payloads[sent % len(payloads)])
+            sent += 1
+        send_finished = time.perf_counter()
+    elapsed = time.perf_counter() - started
+
+    ok = [r for r in records if r["status"] == 200 and r["error"] is None]
+    errors: Dict[str, int] = {}
+    for r in records:
+        if r not in ok:
+            key = r["error"] if r["status"] in (None, 200) else str(r["status"])
+            errors[key] = errors.get(key, 0) + 1
+
+    report = {
+        "requests": {
+            "sent": sent,
+            "completed": len(records),
+            "ok": len(ok),
+            "errors": errors,
+            "error_rate": round(1 - len(ok) / len(records), 4) if records else None,
+        },
+        "elapsed_s": round(elapsed, 2),
+        "offered_rps": round(sent / (send_finished - started), 2) if sent else 0.0,
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": latency_summary([r["latency"] for r in ok]),
+    }
+    if endpoint == "/check/stream":
+        report["time_to_first_event_ms"] = latency_summary([r["ttfb"] for r in ok if r["ttfb"] is not None])
+    return report
+
+
+def parse_errors(value: str) -> Dict[str, float]:
+    """'429:0.05,500:0.02,timeout:0.01' → {'429': 0.05, ...}"""
+    errors = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        kind, _, share = item.partition(":")
+        if kind != "timeout" and not kind.isdigit():
+            raise argparse.ArgumentTypeError(f"Неизвестный вид ошибки: {kind}")
+        errors[kind] = float(share)
+    if sum(errors.values()) > 1:
+        raise argparse.ArgumentTypeError("Сумма долей ошибок больше 1")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест ДЗ-чекера")
+    parser.add_argument("--rps", type=float, default=5.0, help="Целевая частота запросов")
+    parser.add_argument("--duration", type=float, default=30.0, help="Длительность подачи нагрузки, с")
+    parser.add_argument("--endpoint", choices=["/check", "/check/stream"], default="/check")
+    parser.add_argument("--arrival", choices=["uniform", "poisson"], default="poisson",
+                        help="Равномерные интервалы или пуассоновский поток")
+    parser.add_argument("--concurrency", type=int, default=256, help="Максимум одновременных запросов клиента")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Таймаут запроса клиента, с")
+    parser.add_argument("--url", help="Уже запущенный чекер (mock LLM и server.py не запускаются)")
+    parser.add_argument("--port", type=int, default=8190, help="Порт server.py")
+    parser.add_argument("--mock-port", type=int, default=0, help="Порт mock LLM (0 — любой свободный)")
+    parser.add_argument("--mock-only", action="store_true", help="Только запустить mock LLM")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Медиана задержки mock LLM, с")
+    parser.add_argument("--llm-sigma", type=float, default=0.3, help="Разброс задержки (логнормальный)")
+    parser.add_argument("--llm-errors", type=parse_errors, default={},
+                        help="Доли ошибок mock LLM, например 429:0.05,500:0.02,timeout:0.01")
+    parser.add_argument("--llm-stream", action="store_true", help="llm.stream: true в конфигурации чекера")
+    parser.add_argument("--rate-limit", action="store_true", help="Не отключать общий ограничитель частоты")
+    parser.add_argument("--precheck", action="store_true", help="Не отключать предпроверку без LLM")
+    parser.add_argument("--seed", type=int, help="Зерно случайных чисел (воспроизводимый прогон)")
+    parser.add_argument("--output", "-o", help="Файл для JSON-отчёта (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    mock = MockLLM(args.llm_latency, args.llm_sigma, args.llm_errors, seed=args.seed)
+
+    if args.mock_only:
+        server = start_mock(mock, args.mock_port)
+        print(f"[INFO] Mock LLM: http://127.0.0.1:{server.server_address[1]}", file=sys.stderr)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+        return
+
+    with open(EXAMPLE_REQUEST, "r", encoding="utf-8") as f:
+        payloads = build_payloads(json.load(f))
+    random.Random(args.seed).shuffle(payloads)
+
+    process = None
+    mock_server = None
+    workdir = Path(tempfile.mkdtemp(prefix="hw-benchmark-"))
+    url = args.url
+    try:
+        if url is None:
+            mock_server = start_mock(mock, args.mock_port)
+            mock_url = f"http://127.0.0.1:{mock_server.server_address[1]}"
+            config_path = write_server_config(mock_url, workdir, args.llm_stream, args.rate_limit, args.precheck)
+            print(f"[INFO] Mock LLM: {mock_url}; запуск server.py (лог: {workdir / 'server.log'})", file=sys.stderr)
+            process = start_server(config_path, args.port, workdir / "server.log")
+            url = f"http://127.0.0.1:{args.port}"
+
+        print(f"[INFO] Нагрузка: {args.rps} запросов/с на {url}{args.endpoint}, {args.duration} с", file=sys.stderr)
+        report = {
+            "benchmark": {
+                "started_at": datetime.now(timezone.utc).isoformat(),
+                "url": url,
+                "endpoint": args.endpoint,
+                "target_rps": args.rps,
+                "duration_s": args.duration,
+                "arrival": args.arrival,
+                "concurrency": args.concurrency,
+                "payload_variants": len(payloads),
+                "llm_stream": args.llm_stream,
+                "rate_limit": args.rate_limit,
+                "precheck": args.precheck,
+            },
+        }
+        report.update(run_load(url, args.endpoint, payloads, args.rps, args.duration,
+                               args.concurrency, args.arrival, args.timeout, args.seed))
+        if mock_server is not None:
+            report["mock_llm"] = mock.snapshot()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        if mock_server is not None:
+            mock_server.shutdown()
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+        print(f"[INFO] Отчёт: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,17 +10,49 @@
 
 import json
 import sys
+import threading
+import time
 import yaml
-import os
 from pathlib import Path
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Callable, Optional
+
+from guides_index import GuideIndex, normalize_title
+from prompt_budget import plan_prompt
+from metrics import ERRORS, IN_FLIGHT, PRECHECK, phase_timer, record_cache, record_tokens
+from tracing import configure_tracing, span, start_trace
+from resilience import Deadline, LLMError, RetryPolicy, get_breaker
+from llm_stream import EARLY_FIELDS, JSONObjectExtractor, extract_json_object
+from search_service import SearchIndex, build_search_index
+from validation import ValidationError, validate
+from precheck import precheck
 
 
 # Корень агента
 AGENT_ROOT = Path(__file__).parent
+REPO_ROOT = AGENT_ROOT.parent.parent
 DEFAULT_CONFIG = AGENT_ROOT / "config.yaml"
 
+# Общие модули хранилища (.ops): маршрутизатор LLM и ограничитель частоты
+OPS_DIR = REPO_ROOT / ".ops"
+if str(OPS_DIR) not in sys.path:
+    sys.path.insert(0, str(OPS_DIR))
+
+from llm_router import LLMRouter, ProviderError, Route, get_router as _get_router
+
+# Тип задачи для маршрутизатора LLM
+LLM_TASK = "homework_check"
+
+# Индекс руководств и карта вопросов строятся один раз на процесс
+_guide_index: Optional[GuideIndex] = None
+_question_lookup: Optional[dict] = None
+_search_index: Optional[SearchIndex] = None
+# Сервер обрабатывает запросы параллельно — первое построение под блокировкой
+_init_lock = threading.Lock()
+
+# Колбэк потокового режима: on_event(имя_события, данные)
+EventCallback = Callable[[str, dict], None]
+
 
 def load_config(config_path: Path = DEFAULT_CONFIG) -> dict:
     """Загрузка конфигурации."""
@@ -55,22 +87,167 @@ def load_rubrics(config: dict) -> dict:
         return yaml.safe_load(f)
 
 
-def get_check_context(course_name: str, section_name: str, config: dict) -> dict:
+def load_questions_map(config: dict) -> dict:
+    """Загрузка карты вопросов."""
+    path = AGENT_ROOT / config["paths"]["questions_map"]
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def resolve_guides_root(config: dict) -> Path:
+    """Абсолютный путь к корню руководств (paths.guides_root)."""
+    return (AGENT_ROOT / config["paths"]["guides_root"]).resolve()
+
+
+def get_guide_index(config: dict) -> GuideIndex:
+    """Индекс разделов руководств (строится при первом обращении или при старте сервера)."""
+    global _guide_index
+    if _guide_index is None:
+        with _init_lock:
+            if _guide_index is None:
+                _guide_index = GuideIndex(resolve_guides_root(config)).build()
+    return _guide_index
+
+
+def get_search_index(config: dict) -> Optional[SearchIndex]:
+    """Локальный поисковый индекс (None, если search.enabled выключен)."""
+    global _search_index
+    if not config.get("search", {}).get("enabled", False):
+        return None
+    if _search_index is None:
+        with _init_lock:
+            if _search_index is None:
+                _search_index = build_search_index(config)
+    return _search_index
+
+
+def get_router(config: dict) -> LLMRouter:
+    """
+    Маршрутизатор LLM (общий с .ops-скриптами).
+
+    Если в router.routes нет маршрута homework_check, он строится из
+    llm.provider и llm.model.
+    """
+    router = _get_router(config)
+    if LLM_TASK not in (config.get("router", {}).get("routes") or {}):
+        router.tasks[LLM_TASK] = {"models": [
+            {"provider": config["llm"]["provider"], "model": config["llm"]["model"]}
+        ]}
+    return router
+
+
+def _search_normative(query: str, config: dict) -> Optional[str]:
+    """
+    Норматив из локального поиска: фрагменты со score >= search.min_score.
+    Отбор по бюджету токенов выполняется при сборке промпта.
+    """
+    index = get_search_index(config)
+    if index is None or not query:
+        return None
+
+    search_config = config.get("search", {})
+    min_score = search_config.get("min_score", 0.5)
+    results = index.search(query, search_config.get("limit", 5))
+
+    parts = [
+        f"### {result['heading']}\n\n{result['content']}"
+        for result in results
+        if result["score"] >= min_score
+    ]
+    if not parts:
+        return None
+    return "\n\n".join(parts)
+
+
+def _build_question_lookup(config: dict) -> dict:
+    """
+    Таблица (курс, раздел) → вопрос из questions_map.yaml.
+
+    В запись вопроса добавляется guide_file — путь к файлу руководства
+    относительно guides_root, как он хранится в индексе разделов.
+    """
+    courses = load_questions_map(config).get("courses") or {}
+    guides_root = resolve_guides_root(config)
+    lookup = {}
+
+    for course in courses.values():
+        course_key = normalize_title(course.get("title", ""))
+        for question in (course.get("questions") or {}).values():
+            guide_file = (REPO_ROOT / course.get("guide_root", "") / question.get("guide_path", "")).resolve()
+            try:
+                relative = guide_file.relative_to(guides_root).as_posix()
+            except ValueError:
+                relative = None
+            key = (course_key, normalize_title(question.get("guide_section", "")))
+            lookup.setdefault(key, dict(question, guide_file=relative))
+
+    return lookup
+
+
+def _find_question(course_name: str, section_name: str, config: dict) -> Optional[dict]:
+    """Поиск вопроса в questions_map.yaml по названию курса и раздела."""
+    global _question_lookup
+    if _question_lookup is None:
+        with _init_lock:
+            if _question_lookup is None:
+                _question_lookup = _build_question_lookup(config)
+    return _question_lookup.get((normalize_title(course_name), normalize_title(section_name)))
+
+
+def get_check_context(
+    course_name: str,
+    section_name: str,
+    config: dict,
+    question_text: Optional[str] = None
+) -> dict:
     """
     Получение контекста проверки из репозитория руководств.
 
-    v0.1: Заглушка — возвращает базовый контекст.
-    TODO: Интеграция с MCP-эндпоинтом /check-context репозитория руководств.
+    Раздел ищется сначала через questions_map.yaml (guide_path + guide_section),
+    затем по заголовку во всех руководствах. Текст раздела берётся из индекса
+    целиком — под бюджет токенов его подгоняет build_llm_request.
+
+    Если раздел не найден, норматив собирается локальным поиском по тексту
+    вопроса (аналог semantic_search из v2, но без сетевых вызовов).
     """
-    # Базовая рубрика для v0.1
-    rubrics = load_rubrics(config)
-    default_rubric = rubrics.get("rubrics", {}).get("rubric_conceptual_understanding", {})
+    rubrics = load_rubrics(config).get("rubrics", {})
+    index = get_guide_index(config)
+
+    question = _find_question(course_name, section_name, config)
+    rubric_id = (question or {}).get("rubric_id") or "rubric_conceptual_understanding"
+
+    section = None
+    if question:
+        section = index.find(question["guide_section"], question.get("guide_file"))
+    if section is None:
+        section = index.find(section_name)
+
+    record_cache("guide_index", section is not None)
+
+    searched = None
+    if section is None:
+        searched = _search_normative(question_text or section_name, config)
+
+    if section is not None:
+        normative_content = index.text(section)
+        section_path = section.anchor
+    elif searched is not None:
+        normative_content = searched
+        section_path = None
+    else:
+        print(f"[WARN] Норматив не найден: курс '{course_name}', раздел '{section_name}'", file=sys.stderr)
+        normative_content = f"[Норматив для раздела '{section_name}' курса '{course_name}' не найден в репозитории руководств]"
+        section_path = None
 
     return {
         "course_name": course_name,
         "section_name": section_name,
-        "normative_content": f"[Норматив для раздела '{section_name}' курса '{course_name}' будет загружен из репозитория руководств]",
-        "rubric": default_rubric
+        "section_path": section_path,
+        "normative_content": normative_content,
+        "rubric": rubrics.get(rubric_id) or rubrics.get("rubric_conceptual_understanding", {}),
+        "question": question
     }
 
 
@@ -90,32 +267,69 @@ def format_rubric_for_prompt(rubric: dict) -> str:
     return "\n".join(lines)
 
 
+def render_template(template: str, **values) -> str:
+    """
+    Подстановка {переменных} в шаблон промпта.
+
+    В отличие от str.format, не трогает остальные фигурные скобки —
+    в шаблоне есть пример JSON-ответа.
+    """
+    for name, value in values.items():
+        template = template.replace("{" + name + "}", str(value))
+    return template
+
+
 def build_llm_request(
     request: dict,
     context: dict,
     prompts: dict,
     config: dict
 ) -> dict:
-    """Сборка запроса к LLM."""
+    """
+    Сборка запроса к LLM.
+
+    Части промпта подгоняются под бюджет токенов (см. prompt_budget.py):
+    норматив сокращается до наиболее близких к вопросу разделов.
+    """
 
     check_prompt = prompts.get("check_template", "")
+    system_prompt = prompts.get("system", "")
+
+    values, usage = plan_prompt(
+        check_prompt,
+        system_prompt,
+        {
+            "question_text": request["question_text"],
+            "answer_text": request["answer_text"],
+            "normative_content": context.get("normative_content", ""),
+            "rubric_criteria": format_rubric_for_prompt(context.get("rubric")),
+        },
+        config
+    )
 
-    # Подставляем переменные
-    user_content = check_prompt.format(
-        question_text=request["question_text"],
-        answer_text=request["answer_text"],
-        normative_content=context.get("normative_content", "")[:8000],
-        rubric_criteria=format_rubric_for_prompt(context.get("rubric"))
+    print(
+        f"[INFO] Токены промпта: {usage['total']}/{usage['budget']} "
+        f"(system={usage['system']}, шаблон={usage['template']}, вопрос={usage['question']}, "
+        f"рубрика={usage['rubric']}, ответ={usage['answer']}, "
+        f"норматив={usage['normative']}/{usage['normative_full']}, "
+        f"разделов отброшено={usage['sections_dropped']})",
+        file=sys.stderr
     )
+    if usage["total"] > usage["budget"]:
+        print("[WARN] Обязательная часть промпта превышает бюджет токенов", file=sys.stderr)
+
+    # Подставляем переменные
+    user_content = render_template(check_prompt, **values)
 
     return {
         "model": config["llm"]["model"],
         "max_tokens": config["llm"]["max_tokens"],
         "temperature": config["llm"]["temperature"],
+        "prompt_tokens": usage,
         "messages": [
             {
                 "role": "system",
-                "content": prompts.get("system", "")
+                "content": system_prompt
             },
             {
                 "role": "user",
@@ -125,75 +339,146 @@ def build_llm_request(
     }
 
 
-def call_llm(llm_request: dict, config: dict) -> dict:
-    """
-    Вызов LLM API (Anthropic Claude).
+def _demo_result(on_event: Optional[EventCallback]) -> dict:
+    result = _get_demo_result()
+    if on_event is not None:
+        for name in EARLY_FIELDS:
+            on_event("field", {name: result[name]})
+    return result
 
-    Возвращает структурированный результат проверки.
-    При отсутствии API-ключа возвращает демо-результат.
-    """
-    import re
 
-    provider = config["llm"]["provider"]
-    api_key = os.environ.get("ANTHROPIC_API_KEY")
+def _pick_route(routes: list, config: dict) -> Route:
+    """Первый маршрут, чей circuit breaker пропускает запрос."""
+    waits = []
+    for route in routes:
+        wait = get_breaker(route.key, config).allow()
+        if wait is None:
+            return route
+        waits.append(wait)
+    ERRORS.inc(type="circuit_open")
+    raise LLMError("circuit_open", "Все провайдеры LLM временно недоступны", retry_after=min(waits))
 
-    print(f"[INFO] Вызов {provider} API с моделью {llm_request['model']}", file=sys.stderr)
-    print(f"[INFO] Промпт: {len(llm_request['messages'][1]['content'])} символов", file=sys.stderr)
 
-    # Если API-ключ не установлен, возвращаем демо-результат
-    if not api_key:
-        print("[WARN] ANTHROPIC_API_KEY не установлен, возвращаем демо-результат", file=sys.stderr)
-        return _get_demo_result()
+def call_llm(llm_request: dict, config: dict, on_event: Optional[EventCallback] = None) -> dict:
+    """
+    Вызов LLM через маршрутизатор (.ops/llm_router.py).
 
-    # Реальный вызов Claude API
-    try:
-        import httpx
-
-        response = httpx.post(
-            "https://api.anthropic.com/v1/messages",
-            headers={
-                "x-api-key": api_key,
-                "anthropic-version": "2023-06-01",
-                "content-type": "application/json"
-            },
-            json={
-                "model": llm_request["model"],
-                "max_tokens": llm_request["max_tokens"],
-                "temperature": llm_request["temperature"],
-                "system": llm_request["messages"][0]["content"],
-                "messages": [
-                    {"role": "user", "content": llm_request["messages"][1]["content"]}
-                ]
-            },
-            timeout=60.0
-        )
+    Возвращает структурированный результат проверки; поле model —
+    модель, которая фактически ответила. Если ни для одного маршрута
+    задачи нет API-ключа, возвращает демо-результат.
+
+    При llm.stream: true или переданном on_event ответ читается потоком
+    (SSE), и on_event("field", {...}) вызывается для verdict и score,
+    как только они сгенерированы.
 
-        if response.status_code != 200:
-            print(f"[ERROR] Claude API вернул {response.status_code}: {response.text}", file=sys.stderr)
-            return _get_demo_result()
+    Разобранный ответ проверяется по schemas/llm_result.json.
 
-        data = response.json()
-        content = data.get("content", [{}])[0].get("text", "{}")
+    Ошибки (429, 5xx, сеть, ответ без JSON или не по схеме) повторяются (llm.retry) в пределах
+    общего дедлайна llm.deadline: сначала на других маршрутах без паузы,
+    затем с экспоненциальной паузой. У каждого маршрута свой circuit breaker.
+    Если результат получить не удалось, поднимается LLMError со статусом.
+    """
+    llm_config = config["llm"]
+    stream = on_event is not None or llm_config.get("stream", False)
+    router = get_router(config)
+
+    print(f"[INFO] Промпт: {len(llm_request['messages'][1]['content'])} символов", file=sys.stderr)
 
-        # Извлекаем JSON из ответа
-        json_match = re.search(r'\{[\s\S]*\}', content)
-        if json_match:
-            result = json.loads(json_match.group())
+    # Если API-ключ не установлен ни для одного маршрута, возвращаем демо-результат
+    if not router.available(LLM_TASK):
+        print("[WARN] API-ключ LLM не установлен, возвращаем демо-результат", file=sys.stderr)
+        return _demo_result(on_event)
+
+    policy = RetryPolicy.from_config(config)
+    deadline = Deadline(llm_config.get("deadline", 90))
+
+    # После отправки клиенту ранних полей повтор дал бы другой вердикт
+    emitted = []
+
+    def forward(event: str, data: dict):
+        emitted.append(event)
+        on_event(event, data)
+
+    failed = set()
+    last_error = None
+    for attempt in range(1, policy.max_attempts + 1):
+        # Сначала маршруты, которые в этом запросе ещё не отказывали
+        routes = router.routes(LLM_TASK, exclude=failed) or router.routes(LLM_TASK)
+        route = _pick_route(routes, config)
+        breaker = get_breaker(route.key, config)
+        print(f"[INFO] Вызов {route.provider} API с моделью {route.model} (попытка {attempt})", file=sys.stderr)
+
+        timeout = min(llm_config.get("timeout", 60), deadline.remaining())
+        extractor = JSONObjectExtractor(
+            on_field=(lambda name, value: forward("field", {name: value})) if on_event else None
+        )
+        retry_after = None
+        try:
+            with span("llm.attempt", attempt=attempt, provider=route.provider, model=route.model,
+                      stream=stream, timeout=round(timeout, 1)):
+                completion = router.call(
+                    route,
+                    llm_request["messages"][1]["content"],
+                    system=llm_request["messages"][0]["content"],
+                    max_tokens=llm_request["max_tokens"],
+                    temperature=llm_request["temperature"],
+                    timeout=timeout,
+                    on_text=(lambda text: extractor.feed(text) is not None) if stream else None,
+                    limiter_timeout=deadline.remaining(),
+                )
+                record_tokens(route.model, completion.usage)
+                result = extractor.result if stream else extract_json_object(completion.text)
+                if result is None:
+                    raise LLMError("invalid_response", "Не удалось извлечь JSON из ответа")
+                validate("llm_result", result)
+
+            breaker.record_success()
+            result["model"] = route.model
             print(f"[INFO] Получен результат: verdict={result.get('verdict')}, score={result.get('score')}", file=sys.stderr)
             return result
-        else:
-            print(f"[WARN] Не удалось извлечь JSON из ответа", file=sys.stderr)
-            return _get_demo_result()
 
-    except ImportError:
-        print("[WARN] httpx не установлен, возвращаем демо-результат. Установите: pip install httpx", file=sys.stderr)
-        return _get_demo_result()
-    except json.JSONDecodeError as e:
-        print(f"[ERROR] Ошибка парсинга JSON: {e}", file=sys.stderr)
-        return _get_demo_result()
-    except Exception as e:
-        print(f"[ERROR] Ошибка вызова API: {e}", file=sys.stderr)
-        return _get_demo_result()
+        except ProviderError as e:
+            if e.kind == "rate_limited":
+                ERRORS.inc(type="rate_limited_local")
+                raise LLMError("rate_limited", str(e), retry_after=e.retry_after)
+            if e.kind == "config":
+                ERRORS.inc(type="config")
+                raise LLMError("client_error", str(e))
+
+            ERRORS.inc(type=f"http_{e.status_code}" if e.status_code else e.kind)
+            failed.add(route.key)
+            if e.retryable:
+                breaker.record_failure()
+                retry_after = e.retry_after
+            status = {"timeout": "timeout"}.get(e.kind, "rate_limited" if e.status_code == 429 else "provider_error")
+            last_error = LLMError(status, str(e), retry_after)
+            # Неповторяемая ошибка (4xx) имеет смысл только на другом маршруте
+            if not e.retryable and not router.routes(LLM_TASK, exclude=failed):
+                raise last_error
+        except (LLMError, json.JSONDecodeError, ValidationError) as e:
+            # Провайдер отвечает, но без корректного JSON — маршрут доступен, для breaker это успех
+            breaker.record_success()
+            ERRORS.inc(type="invalid_response")
+            last_error = LLMError("invalid_response", f"Некорректный ответ модели: {e}")
+        finally:
+            # Пробная попытка half-open, завершившаяся без record_success/record_failure
+            # (локальный лимит, config, 4xx, обрыв клиента), не должна блокировать маршрут
+            breaker.release()
+
+        print(f"[WARN] Попытка {attempt}/{policy.max_attempts} не удалась: {last_error}", file=sys.stderr)
+        if emitted or attempt == policy.max_attempts:
+            break
+
+        # На другой маршрут переключаемся сразу, на тот же — после паузы
+        if router.routes(LLM_TASK, exclude=failed):
+            continue
+        delay = policy.delay(attempt, retry_after)
+        if delay >= deadline.remaining():
+            print(f"[WARN] Повтор не укладывается в дедлайн ({deadline.remaining():.1f} с)", file=sys.stderr)
+            break
+        time.sleep(delay)
+
+    raise last_error
 
 
 def _get_demo_result() -> dict:
@@ -253,13 +538,19 @@ def format_comment(llm_result: dict, context: dict, config: dict) -> str:
 
     # Метаинформация
     lines.append("---")
-    lines.append(f"*Проверено: {config['llm']['model']}*")
+    lines.append(f"*Проверено: {llm_result.get('model', config['llm']['model'])}*")
     lines.append(f"*По материалам: {context.get('section_name', 'N/A')}*")
 
     return "\n".join(lines)
 
 
-def check_answer(request: dict, config: dict, prompts: dict) -> dict:
+def check_answer(
+    request: dict,
+    config: dict,
+    prompts: dict,
+    on_event: Optional[EventCallback] = None,
+    request_id: Optional[str] = None
+) -> dict:
     """
     Основная функция проверки одного ответа (v0.1).
 
@@ -267,26 +558,56 @@ def check_answer(request: dict, config: dict, prompts: dict) -> dict:
         request: словарь с полями answer_text, question_text, course_name, section_name
         config: конфигурация
         prompts: промпты
+        on_event: колбэк потокового режима (ранние поля verdict/score)
+        request_id: идентификатор запроса для трассировки (по умолчанию — новый)
 
     Returns:
         словарь с полями comment, checked_at
     """
 
-    # 1. Получить контекст из репозитория руководств
-    context = get_check_context(
-        course_name=request["course_name"],
-        section_name=request["section_name"],
-        config=config
-    )
-
-    # 2. Собрать запрос к LLM
-    llm_request = build_llm_request(request, context, prompts, config)
-
-    # 3. Вызвать LLM
-    llm_result = call_llm(llm_request, config)
-
-    # 4. Сформировать комментарий
-    comment = format_comment(llm_result, context, config)
+    IN_FLIGHT.inc()
+    try:
+        with start_trace("check_answer", request_id, course=request["course_name"], section=request["section_name"]) as root:
+            # 1. Получить контекст из репозитория руководств
+            with phase_timer("context"), span("context") as current:
+                context = get_check_context(
+                    course_name=request["course_name"],
+                    section_name=request["section_name"],
+                    config=config,
+                    question_text=request.get("question_text")
+                )
+                current.set_attribute("section_path", context.get("section_path"))
+
+            # 2. Предпроверка без LLM: очевидный отказ не требует вызова модели
+            with phase_timer("precheck"), span("precheck") as current:
+                signals, llm_result = precheck(request, context.get("question"), context, config, root.request_id)
+                if signals:
+                    PRECHECK.inc(result="rejected" if llm_result is not None else "llm")
+                    current.set_attribute("score", signals["score"])
+                    current.set_attribute("reasons", signals["reasons"])
+
+            if llm_result is not None:
+                if on_event is not None:
+                    for name in EARLY_FIELDS:
+                        on_event("field", {name: llm_result[name]})
+            else:
+                # 3. Собрать запрос к LLM
+                with phase_timer("prompt"), span("prompt") as current:
+                    llm_request = build_llm_request(request, context, prompts, config)
+                    current.set_attribute("prompt_tokens", llm_request["prompt_tokens"]["total"])
+
+                # 4. Вызвать LLM
+                with phase_timer("llm"), span("llm"):
+                    llm_result = call_llm(llm_request, config, on_event)
+
+            # 5. Сформировать комментарий
+            with phase_timer("format"), span("format"):
+                comment = format_comment(llm_result, context, config)
+
+            root.set_attribute("verdict", llm_result.get("verdict"))
+            root.set_attribute("score", llm_result.get("score"))
+    finally:
+        IN_FLIGHT.dec()
 
     return {
         "comment": comment,
@@ -309,6 +630,7 @@ def main():
     config_path = Path(args.config) if args.config else DEFAULT_CONFIG
     config = load_config(config_path)
     prompts = load_prompts(config)
+    configure_tracing(config)
 
     # Чтение входных данных
     if args.input:
@@ -317,8 +639,18 @@ def main():
     else:
         request = json.load(sys.stdin)
 
+    try:
+        validate("check_request", request)
+    except ValidationError as e:
+        print(f"[ERROR] Некорректный запрос: {e}", file=sys.stderr)
+        sys.exit(1)
+
     # Проверка
-    result = check_answer(request, config, prompts)
+    try:
+        result = check_answer(request, config, prompts)
+    except LLMError as e:
+        print(f"[ERROR] Проверка не выполнена ({e.status}): {e}", file=sys.stderr)
+        sys.exit(1)
 
     # Вывод
     output_text = json.dumps(result, ensure_ascii=False, indent=2)
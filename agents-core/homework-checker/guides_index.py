@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Индекс разделов руководств для ДЗ-чекера.
+
+При старте Markdown-файлы из paths.guides_root разбираются один раз:
+для каждого заголовка запоминается путь заголовков (heading path) и байтовые
+смещения раздела в файле. Получение норматива во время запроса — это поиск
+в словаре и срез прочитанного в память содержимого файла, без повторного
+чтения и разбора руководств.
+
+Индекс читают параллельные запросы сервера, поэтому изменённый файл не
+переразбирается на месте: строится новый GuideFile, и под блокировкой
+подменяются словари индекса. Раздел хранит ссылку на свой файл, так что
+уже найденный раздел читается из прежнего содержимого с согласованными
+смещениями. Содержимое — bytes, а не mmap: отображение файла, который
+перезаписали на месте (с усечением), падает с SIGBUS при чтении.
+
+Найденный раздел переразбирается, если его файл изменился (один stat).
+Промах по заголовку проверяет все файлы не чаще раза в RECHECK_INTERVAL
+секунд; удалённые файлы выпадают из индекса. Новые файлы появляются
+в индексе только после перезапуска (build).
+
+Использование:
+    python3 guides_index.py                       # статистика индекса
+    python3 guides_index.py --section "Картины мира"
+"""
+
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+HEADING_RE = re.compile(rb'^(#{1,6})[ \t]+(.+?)[ \t]*#*[ \t]*$')
+FENCE_RE = re.compile(rb'^[ \t]*(```|~~~)')
+SECTION_NUMBER_RE = re.compile(r'^\d+(?:\.\d+)*\.?\s*')
+
+# Попыток прочитать файл, не изменившийся за время чтения
+LOAD_ATTEMPTS = 3
+# Секунд между проверками всех файлов при промахе поиска
+RECHECK_INTERVAL = 30.0
+
+
+def normalize_title(title: str) -> str:
+    """Нормализация заголовка: без номера раздела, регистра и лишних пробелов."""
+    title = SECTION_NUMBER_RE.sub("", title.strip())
+    return re.sub(r'\s+', ' ', title).strip().casefold()
+
+
+class Section:
+    """Раздел руководства: путь заголовков и байтовые границы в файле."""
+
+    __slots__ = ("guide", "file", "heading_path", "level", "start", "end", "children")
+
+    def __init__(self, guide_file: "GuideFile", heading_path: Tuple[str, ...], level: int, start: int):
+        self.guide = guide_file.relative
+        # Файл, из которого разобраны смещения (после переиндексации — прежний)
+        self.file = guide_file
+        self.heading_path = heading_path
+        self.level = level
+        self.start = start
+        self.end = start
+        # Смещения вложенных заголовков — границы для умной обрезки
+        self.children: List[int] = []
+
+    @property
+    def title(self) -> str:
+        return self.heading_path[-1]
+
+    @property
+    def anchor(self) -> str:
+        """Путь раздела в формате guide.md#Заголовок."""
+        return f"{self.guide}#{self.title}"
+
+
+class GuideFile:
+    """Проиндексированный файл руководства."""
+
+    def __init__(self, path: Path, relative: str):
+        self.path = path
+        self.relative = relative
+        self.mtime_ns = 0
+        self.body_start = 0
+        self.size = 0
+        self.sections: Dict[Tuple[str, ...], Section] = {}
+        self._data: Optional[bytes] = None
+
+    def load(self):
+        """Разбор файла: один проход по строкам, без декодирования тела."""
+        self.close()
+        self.body_start = 0
+        self.sections = {}
+
+        # Файл, который перезаписывают на месте, можно прочитать наполовину —
+        # читаем, пока размер и mtime до и после чтения не совпадут
+        for _ in range(LOAD_ATTEMPTS):
+            stat = self.path.stat()
+            with open(self.path, "rb") as f:
+                data = f.read()
+            after = self.path.stat()
+            if after.st_mtime_ns == stat.st_mtime_ns and after.st_size == len(data):
+                break
+        self.mtime_ns = stat.st_mtime_ns
+        self._data = data
+        self.size = len(data)
+        if not data:
+            return
+
+        stack: List[Section] = []
+        offset = 0
+        in_fence = False
+
+        # Пропускаем frontmatter
+        if data[:4] == b"---\n":
+            close = data.find(b"\n---", 4)
+            if close != -1:
+                line_end = data.find(b"\n", close + 4)
+                offset = len(data) if line_end == -1 else line_end + 1
+        self.body_start = offset
+
+        size = len(data)
+        while offset < size:
+            line_end = data.find(b"\n", offset)
+            if line_end == -1:
+                line_end = size
+            line = data[offset:line_end].rstrip(b"\r")
+
+            if FENCE_RE.match(line):
+                in_fence = not in_fence
+            elif not in_fence:
+                match = HEADING_RE.match(line)
+                if match:
+                    level = len(match.group(1))
+                    title = match.group(2).decode("utf-8", errors="replace")
+
+                    # Закрываем разделы того же или более глубокого уровня
+                    while stack and stack[-1].level >= level:
+                        stack.pop().end = offset
+                    for parent in stack:
+                        parent.children.append(offset)
+
+                    heading_path = tuple(s.title for s in stack) + (title,)
+                    section = Section(self, heading_path, level, offset)
+                    # При повторяющемся пути заголовков остаётся первый раздел
+                    self.sections.setdefault(heading_path, section)
+                    stack.append(section)
+
+            offset = line_end + 1
+
+        for section in stack:
+            section.end = size
+
+    def is_stale(self) -> bool:
+        try:
+            return self.path.stat().st_mtime_ns != self.mtime_ns
+        except OSError:
+            return True
+
+    def read(self, start: int, end: int) -> str:
+        if self._data is None:
+            return ""
+        return self._data[start:end].decode("utf-8", errors="replace")
+
+    def close(self):
+        self._data = None
+
+
+class GuideIndex:
+    """
+    Индекс разделов всех руководств под guides_root.
+
+    Ключи поиска:
+    - (файл, путь заголовков) → Section
+    - нормализованный заголовок → список Section (для поиска по section_name)
+    """
+
+    def __init__(self, root: Path, recheck_interval: float = RECHECK_INTERVAL):
+        self.root = root
+        self.recheck_interval = recheck_interval
+        self.files: Dict[str, GuideFile] = {}
+        self.by_title: Dict[str, List[Section]] = {}
+        # Сериализует переиндексацию; чтение словарей идёт без блокировки
+        self._lock = threading.Lock()
+        self._rechecked_at = time.monotonic()
+
+    def build(self) -> "GuideIndex":
+        """Полная индексация руководств (выполняется один раз при старте)."""
+        self.close()
+        self.files = {}
+
+        if not self.root.is_dir():
+            print(f"[WARN] Папка руководств не найдена: {self.root}", file=sys.stderr)
+            self._rebuild_titles()
+            return self
+
+        for path in sorted(self.root.rglob("*.md")):
+            relative = path.relative_to(self.root).as_posix()
+            guide = GuideFile(path, relative)
+            try:
+                guide.load()
+            except OSError as e:
+                print(f"[WARN] Не удалось проиндексировать {path}: {e}", file=sys.stderr)
+                continue
+            self.files[relative] = guide
+
+        self._rebuild_titles()
+        sections = sum(len(g.sections) for g in self.files.values())
+        print(f"[INFO] Индекс руководств: {len(self.files)} файлов, {sections} разделов", file=sys.stderr)
+        return self
+
+    @staticmethod
+    def _titles(files: Dict[str, GuideFile]) -> Dict[str, List[Section]]:
+        by_title: Dict[str, List[Section]] = {}
+        for guide in files.values():
+            for section in guide.sections.values():
+                by_title.setdefault(normalize_title(section.title), []).append(section)
+        return by_title
+
+    def _rebuild_titles(self):
+        self.by_title = self._titles(self.files)
+
+    def _refresh(self, guides: List[GuideFile]):
+        """
+        Переиндексация файлов, изменившихся на диске; удалённые и
+        нечитаемые файлы убираются из индекса.
+
+        Живой GuideFile не меняется: новый файл разбирается отдельно, затем
+        словари индекса подменяются целиком. Прежнее содержимое не
+        освобождается явно — его ещё могут читать параллельные запросы,
+        память уходит вместе с последней ссылкой на раздел.
+        """
+        with self._lock:
+            files = dict(self.files)
+            changed = False
+            for guide in guides:
+                # Другой поток мог уже заменить файл
+                if files.get(guide.relative) is not guide or not guide.is_stale():
+                    continue
+                fresh = GuideFile(guide.path, guide.relative)
+                try:
+                    fresh.load()
+                except OSError as e:
+                    print(f"[WARN] Руководство {guide.relative} недоступно, убрано из индекса: {e}", file=sys.stderr)
+                    del files[guide.relative]
+                else:
+                    files[guide.relative] = fresh
+                changed = True
+            if not changed:
+                return
+            by_title = self._titles(files)
+            self.files, self.by_title = files, by_title
+
+    def _recheck_due(self) -> bool:
+        """Пора ли проверить все файлы (не чаще раза в recheck_interval секунд)."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._rechecked_at < self.recheck_interval:
+                return False
+            self._rechecked_at = now
+            return True
+
+    def _lookup(self, section_title: str, guide: Optional[str]) -> Optional[Section]:
+        candidates = self.by_title.get(normalize_title(section_title), [])
+        if guide is not None:
+            candidates = [s for s in candidates if s.guide == guide]
+        return candidates[0] if candidates else None
+
+    def find(self, section_title: str, guide: Optional[str] = None) -> Optional[Section]:
+        """
+        Поиск раздела по заголовку.
+
+        Args:
+            section_title: заголовок раздела (номер раздела и регистр игнорируются)
+            guide: путь файла относительно guides_root, ограничивает поиск одним руководством
+        """
+        section = self._lookup(section_title, guide)
+        if section is not None:
+            if not section.file.is_stale():
+                return section
+            stale = [section.file]
+        else:
+            # Раздел мог появиться в изменённом файле (или файл прочитан во время записи).
+            # Одно руководство — один stat; все файлы — не чаще recheck_interval
+            if guide is not None:
+                files = [f for f in (self.files.get(guide),) if f is not None]
+            elif self._recheck_due():
+                files = list(self.files.values())
+            else:
+                return None
+            stale = [guide_file for guide_file in files if guide_file.is_stale()]
+            if not stale:
+                return None
+
+        # Одна переиндексация и один повторный поиск
+        self._refresh(stale)
+        return self._lookup(section_title, guide)
+
+    def text(self, section: Section, max_chars: Optional[int] = None) -> str:
+        """
+        Текст раздела с умной обрезкой.
+
+        Если раздел длиннее max_chars, он обрезается по границе последнего
+        целиком помещающегося подраздела, а при его отсутствии — по границе абзаца.
+        """
+        guide_file = section.file
+        text = guide_file.read(section.start, section.end).strip()
+        if max_chars is None or len(text) <= max_chars:
+            return text
+        return self._truncate(guide_file, section, text, max_chars)
+
+    def _truncate(self, guide_file: GuideFile, section: Section, text: str, max_chars: int) -> str:
+        # Границы вложенных подразделов в символах (от конца к началу)
+        for boundary in reversed(section.children):
+            chars = len(guide_file.read(section.start, boundary).rstrip())
+            if 0 < chars <= max_chars:
+                return text[:chars]
+
+        # Подразделов нет или первый из них не помещается — режем по абзацу
+        cut = text.rfind("\n\n", 0, max_chars)
+        if cut > max_chars // 2:
+            return text[:cut].rstrip()
+        cut = text.rfind("\n", 0, max_chars)
+        if cut > max_chars // 2:
+            return text[:cut].rstrip()
+        return text[:max_chars]
+
+    def close(self):
+        for guide in self.files.values():
+            guide.close()
+
+
+def main():
+    import argparse
+
+    from check import DEFAULT_CONFIG, load_config, resolve_guides_root
+
+    parser = argparse.ArgumentParser(description="Индекс разделов руководств")
+    parser.add_argument("--config", "-c", type=str, help="Путь к конфигурации")
+    parser.add_argument("--section", "-s", type=str, help="Показать текст раздела")
+    parser.add_argument("--max-chars", type=int, default=8000, help="Лимит символов")
+
+    args = parser.parse_args()
+
+    config = load_config(Path(args.config) if args.config else DEFAULT_CONFIG)
+    index = GuideIndex(resolve_guides_root(config)).build()
+
+    if args.section:
+        section = index.find(args.section)
+        if section is None:
+            print(f"[WARN] Раздел не найден: {args.section}", file=sys.stderr)
+            sys.exit(1)
+        print(f"# {' > '.join(section.heading_path)} ({section.anchor})\n")
+        print(index.text(section, args.max_chars))
+        return
+
+    for relative, guide in index.files.items():
+        print(f"{relative}: {len(guide.sections)} разделов")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Очередь проверок, переживающая перезапуск сервера (SQLite).
+
+При остановке сервера (SIGTERM) запросы, которые ждали свободного слота
+или не успели завершиться до дедлайна, сохраняются как queued. Любой
+работающий процесс чекера (новый после перезапуска или соседний при
+SO_REUSEPORT) забирает их в фоне, выполняет и сохраняет результат как done.
+Когда LMS повторно отправляет тот же запрос, она получает готовый
+результат без повторного вызова LLM; если задание ещё выполняется,
+take() поднимает JobPending, и сервер просит повторить позже.
+
+Ключ задания — sha256 канонического JSON запроса. Состояние — в SQLite
+(WAL, BEGIN IMMEDIATE), поэтому очередью пользуются несколько процессов.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Tuple
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    request_id TEXT,
+    request TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    claimed_by INTEGER,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+class JobPending(Exception):
+    """Задание с этим запросом выполняется — результат появится после complete()."""
+
+
+def request_key(request: dict) -> str:
+    """Ключ задания: одинаковые запросы LMS дают одинаковый ключ."""
+    canonical = json.dumps(request, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class JobStore:
+    """Задания queued → running → done; результат хранится result_ttl секунд."""
+
+    def __init__(self, db_path: Path, result_ttl: float = 3600.0, stale_after: float = 600.0):
+        self.db_path = Path(db_path)
+        self.result_ttl = result_ttl
+        self.stale_after = stale_after
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, request: dict, request_id: Optional[str] = None):
+        """Сохранение непроверенного запроса (готовый результат не затирается)."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (key, request_id, request, status, updated_at) VALUES (?, ?, ?, 'queued', ?) "
+                "ON CONFLICT(key) DO UPDATE SET status = 'queued', claimed_by = NULL, updated_at = excluded.updated_at "
+                "WHERE jobs.status != 'done'",
+                (request_key(request), request_id, json.dumps(request, ensure_ascii=False), time.time())
+            )
+
+    def claim(self) -> Optional[Tuple[str, dict, Optional[str]]]:
+        """Следующее задание (key, request, request_id); зависшие running возвращаются в очередь."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', claimed_by = NULL WHERE status = 'running' AND updated_at < ?",
+                    (now - self.stale_after,)
+                )
+                row = conn.execute(
+                    "SELECT key, request, request_id FROM jobs WHERE status = 'queued' ORDER BY updated_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', claimed_by = ?, updated_at = ? WHERE key = ?",
+                        (os.getpid(), now, row[0])
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), row[2]
+
+    def complete(self, key: str, result: dict):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, claimed_by = NULL, updated_at = ? WHERE key = ?",
+                (json.dumps(result, ensure_ascii=False), time.time(), key)
+            )
+
+    def discard(self, key: str):
+        """Удаление задания (проверка не удалась — LMS повторит запрос сама)."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE key = ?", (key,))
+
+    def take(self, request: dict) -> Optional[dict]:
+        """
+        Запрос пришёл снова: готовый результат (выдаётся один раз) или None.
+
+        Ещё не взятое задание снимается с очереди — запрос проверит вызывающий.
+        Задание в работе (running, не зависшее) поднимает JobPending: повторная
+        проверка продублировала бы вызов LLM, а результат остался бы невостребованным.
+        """
+        key = request_key(request)
+        with self._connect() as conn:
+            # Обычный путь — чтение без блокировки записи; удаление отдаёт задание только одному процессу.
+            # Вторая попытка — если задание успели взять в работу между чтением и удалением
+            for _ in range(2):
+                row = conn.execute("SELECT status, result, updated_at FROM jobs WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                status, result, updated_at = row
+                if status == "running" and updated_at >= time.time() - self.stale_after:
+                    raise JobPending(key)
+                if conn.execute("DELETE FROM jobs WHERE key = ? AND status = ?", (key, status)).rowcount:
+                    break
+            else:
+                return None
+        if status == "done" and updated_at >= time.time() - self.result_ttl:
+            return json.loads(result)
+        return None
+
+    def purge(self):
+        """Удаление результатов, которые LMS так и не забрала."""
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status = 'done' AND updated_at < ?", (time.time() - self.result_ttl,)
+            )
+
+    def counts(self) -> dict:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Потоковый разбор ответа LLM для ДЗ-чекера.
+
+- JSONObjectExtractor — инкрементальное извлечение первого JSON-объекта
+  из текста ответа (с учётом строк и экранирования), без жадного regex;
+  ключевые поля (verdict, score) сообщаются, как только они сгенерированы.
+
+Разбор SSE-потоков провайдеров — в .ops/llm_router.py.
+"""
+
+import json
+import re
+from typing import Callable, Optional
+
+
+# Ранние поля результата: значение считается готовым, когда за ним идёт разделитель
+EARLY_FIELDS = {
+    "verdict": re.compile(r'"verdict"\s*:\s*"([a-z_]+)"'),
+    "score": re.compile(r'"score"\s*:\s*(\d+(?:\.\d+)?)\s*[,}\n]'),
+}
+
+
+class JSONObjectExtractor:
+    """
+    Инкрементальный поиск первого JSON-объекта верхнего уровня в потоке текста.
+
+    feed() принимает очередной фрагмент и возвращает разобранный объект,
+    как только закрывающая скобка верхнего уровня получена. Текст до
+    первой «{» (например, ```json) и после объекта игнорируется.
+    """
+
+    def __init__(self, on_field: Optional[Callable[[str, object], None]] = None):
+        self.on_field = on_field
+        self.fields: dict = {}
+        self.result: Optional[dict] = None
+        self._buffer: list = []
+        self._depth = 0
+        self._started = False
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> Optional[dict]:
+        if self.result is not None:
+            return self.result
+
+        for ch in chunk:
+            if not self._started:
+                if ch != "{":
+                    continue
+                self._started = True
+
+            self._buffer.append(ch)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.result = json.loads("".join(self._buffer))
+                    self._report_fields(final=True)
+                    return self.result
+
+        self._report_fields()
+        return None
+
+    def _report_fields(self, final: bool = False):
+        if self.on_field is None or len(self.fields) == len(EARLY_FIELDS):
+            return
+        text = "".join(self._buffer)
+        for name, pattern in EARLY_FIELDS.items():
+            if name in self.fields:
+                continue
+            if final and self.result is not None and name in self.result:
+                value = self.result[name]
+            else:
+                match = pattern.search(text)
+                if not match:
+                    continue
+                value = match.group(1)
+                if name == "score":
+                    value = float(value) if "." in value else int(value)
+            self.fields[name] = value
+            self.on_field(name, value)
+
+
+def extract_json_object(text: str) -> Optional[dict]:
+    """Первый JSON-объект в тексте ответа (или None, если объекта нет)."""
+    return JSONObjectExtractor().feed(text)
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Метрики ДЗ-чекера в текстовом формате Prometheus (exposition format 0.0.4).
+
+Без зависимостей от prometheus_client: счётчики, gauge и гистограммы
+с метками хранятся в памяти процесса, GET /metrics отдаёт их текстом.
+Включается через metrics.enabled в config.yaml.
+
+В режиме нескольких воркеров (server.py --workers N) каждый воркер раз
+в секунду пишет снимок своих метрик в metrics.multiprocess_dir, а /metrics
+любого воркера суммирует свои значения и снимки соседей. Счётчики и
+гистограммы завершившихся воркеров сохраняются (значения не убывают),
+gauge учитываются только у живых.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+# Границы гистограмм задержки (секунды): от локальных фаз до долгих вызовов LLM
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Базовая метрика: имя, описание, значения по наборам меток."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, float] = {}
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in items]
+
+    def empty_copy(self) -> "Metric":
+        return type(self)(self.name, self.description)
+
+    def export(self) -> list:
+        """Значения для снимка: [[[метка, значение], ...], число]."""
+        with self._lock:
+            return [[list(map(list, key)), value] for key, value in self._values.items()]
+
+    def absorb(self, exported: list):
+        """Прибавление значений из снимка другого процесса."""
+        with self._lock:
+            for pairs, value in exported:
+                key = tuple(tuple(pair) for pair in pairs)
+                self._values[key] = self._values.get(key, 0) + value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets))
+        # метки → [счётчики по корзинам..., sum, count]
+        self._series: Dict[LabelKey, List[float]] = {}
+
+    def empty_copy(self) -> "Histogram":
+        return Histogram(self.name, self.description, self.buckets)
+
+    def export(self) -> list:
+        with self._lock:
+            return [[list(map(list, key)), list(series)] for key, series in self._series.items()]
+
+    def absorb(self, exported: list):
+        with self._lock:
+            for pairs, values in exported:
+                key = tuple(tuple(pair) for pair in pairs)
+                series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+                for i, value in enumerate(values):
+                    series[i] += value
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            for bound, count in zip(self.buckets, series):
+                le = (("le", _format_value(bound)),)
+                lines.append(f"{self.name}_bucket{_format_labels(key, le)} {_format_value(count)}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, (('le', '+Inf'),))} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {_format_value(series[-1])}")
+        return lines
+
+
+class Registry:
+    """Набор метрик процесса."""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        update_cache_ratios(self)
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+    def export(self) -> dict:
+        return {name: metric.export() for name, metric in self.metrics.items()}
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(Counter(
+    "homework_checker_requests_total", "HTTP-запросы по endpoint и коду ответа"))
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    "homework_checker_request_duration_seconds", "Полное время обработки запроса (response_time)"))
+PHASE_DURATION = REGISTRY.register(Histogram(
+    "homework_checker_phase_duration_seconds", "Время фаз проверки: context, prompt, llm, format"))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    "homework_checker_in_flight_requests", "Проверки, выполняющиеся в данный момент"))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "homework_checker_llm_tokens_total", "Токены LLM: direction=input|output"))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "homework_checker_cache_requests_total", "Обращения к кэшам: result=hit|miss"))
+CACHE_HIT_RATIO = REGISTRY.register(Gauge(
+    "homework_checker_cache_hit_ratio", "Доля попаданий в кэш"))
+ERRORS = REGISTRY.register(Counter(
+    "homework_checker_errors_total", "Ошибки по типу"))
+PRECHECK = REGISTRY.register(Counter(
+    "homework_checker_precheck_total", "Предпроверка без LLM: result=rejected|llm"))
+WORKERS = REGISTRY.register(Gauge(
+    "homework_checker_workers", "Живые процессы сервера, чьи метрики учтены"))
+
+
+@contextmanager
+def phase_timer(phase: str):
+    """Замер длительности фазы проверки."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASE_DURATION.observe(time.perf_counter() - started, phase=phase)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_tokens(model: str, usage: dict):
+    """Учёт токенов из поля usage ответа Anthropic."""
+    if usage.get("input_tokens"):
+        LLM_TOKENS.inc(usage["input_tokens"], model=model, direction="input")
+    if usage.get("output_tokens"):
+        LLM_TOKENS.inc(usage["output_tokens"], model=model, direction="output")
+
+
+def update_cache_ratios(registry: Registry = REGISTRY):
+    requests = registry.metrics[CACHE_REQUESTS.name]
+    ratio = registry.metrics[CACHE_HIT_RATIO.name]
+    caches = {dict(key)["cache"] for key in list(requests._values)}
+    for cache in caches:
+        hits = requests.value(cache=cache, result="hit")
+        total = hits + requests.value(cache=cache, result="miss")
+        ratio.set(hits / total if total else 0, cache=cache)
+
+
+# Каталог снимков метрик воркеров (None — один процесс)
+_multiprocess_dir: Optional[Path] = None
+
+# Производные и общие для процессов метрики не суммируются
+_NOT_SUMMED = {CACHE_HIT_RATIO.name, WORKERS.name}
+
+
+def _snapshot_path(directory: Path, pid: int) -> Path:
+    return directory / f"metrics-{pid}.json"
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def clear_snapshots(directory: Path):
+    """Удаление снимков прошлого запуска (вызывает главный процесс до старта воркеров)."""
+    directory.mkdir(parents=True, exist_ok=True)
+    for path in directory.glob("metrics-*.json"):
+        path.unlink(missing_ok=True)
+
+
+def write_snapshot():
+    """Атомарная запись снимка метрик текущего процесса."""
+    if _multiprocess_dir is None:
+        return
+    path = _snapshot_path(_multiprocess_dir, os.getpid())
+    tmp_path = path.with_suffix(".tmp")
+    try:
+        tmp_path.write_text(json.dumps(REGISTRY.export()), encoding="utf-8")
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[WARN] Не удалось записать снимок метрик {path}: {e}", file=sys.stderr)
+
+
+def configure_multiprocess(directory: Path, interval: float = 1.0):
+    """Режим воркера: снимок метрик пишется каждые interval секунд (вызывать после fork)."""
+    global _multiprocess_dir
+    _multiprocess_dir = Path(directory)
+    _multiprocess_dir.mkdir(parents=True, exist_ok=True)
+
+    def loop():
+        while True:
+            write_snapshot()
+            time.sleep(interval)
+
+    threading.Thread(target=loop, name="metrics-snapshot", daemon=True).start()
+
+
+def _aggregate() -> Registry:
+    """Сумма метрик: свои — из памяти, соседей — из снимков."""
+    merged = Registry()
+    for metric in REGISTRY.metrics.values():
+        merged.register(metric.empty_copy())
+
+    snapshots = [(os.getpid(), REGISTRY.export())]
+    for path in _multiprocess_dir.glob("metrics-*.json"):
+        pid = int(path.stem.split("-", 1)[1])
+        if pid == os.getpid():
+            continue
+        try:
+            snapshots.append((pid, json.loads(path.read_text(encoding="utf-8"))))
+        except (OSError, ValueError):
+            continue
+
+    workers = 0
+    for pid, snapshot in snapshots:
+        alive = _alive(pid)
+        workers += alive
+        for name, exported in snapshot.items():
+            metric = merged.metrics.get(name)
+            if metric is None or name in _NOT_SUMMED:
+                continue
+            if metric.kind == "gauge" and not alive:
+                continue
+            metric.absorb(exported)
+    merged.metrics[WORKERS.name].set(workers)
+    return merged
+
+
+def render() -> str:
+    """Все метрики процесса (или всех воркеров) в текстовом формате Prometheus."""
+    if _multiprocess_dir is not None:
+        return _aggregate().render()
+    WORKERS.set(1)
+    return REGISTRY.render()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Предпроверка ответа без LLM: очевидные отказы не тратят вызов модели.
+
+Сигналы (считаются локально, за доли миллисекунды):
+- длина — число слов относительно expected_length вопроса из questions_map.yaml
+  (precheck.expected_words: short/medium/long → слов в полноценном ответе);
+- пересечение с вопросом — доля основ слов ответа, которые есть в question_text;
+- покрытие keywords вопроса — доля ключевых понятий, встретившихся в ответе;
+- язык — доля кириллицы среди букв ответа (курсы на русском).
+
+Из сигналов складывается предварительный балл:
+
+    score = 100 · min(1, слов/ожидаемо) · (1 − пересечение) · язык · (0.5 + 0.5 · покрытие)
+
+Проверка завершается без LLM, только если есть жёсткая причина (пустой ответ,
+копия вопроса, ответ короче precheck.min_length_ratio от ожидаемого, не тот язык)
+и балл ниже thresholds.auto_reject. Низкое покрытие keywords само по себе
+к отказу не ведёт — только снижает балл.
+
+Каждое такое решение пишется в precheck.audit_file (строка JSON на решение).
+"""
+
+import hashlib
+import json
+import re
+import sys
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from search_service import tokenize
+
+
+AGENT_ROOT = Path(__file__).parent
+
+DEFAULT_EXPECTED_WORDS = {"short": 30, "medium": 80, "long": 150}
+DEFAULT_EXPECTED_LENGTH = "short"
+
+# Ключевое понятие найдено, если совпадают основы всех его слов (до KEYWORD_STEM символов)
+KEYWORD_STEM = 5
+
+CYRILLIC_RE = re.compile(r"[а-яё]", re.IGNORECASE)
+LATIN_RE = re.compile(r"[a-z]", re.IGNORECASE)
+
+# Модель в результате предпроверки (строка «Проверено: ...» в комментарии)
+PRECHECK_MODEL = "автоматическая предпроверка"
+
+
+def _settings(config: dict) -> dict:
+    settings = config.get("precheck", {})
+    return {
+        "enabled": settings.get("enabled", False),
+        "expected_words": {**DEFAULT_EXPECTED_WORDS, **(settings.get("expected_words") or {})},
+        "default_expected_length": settings.get("default_expected_length", DEFAULT_EXPECTED_LENGTH),
+        "min_length_ratio": settings.get("min_length_ratio", 0.2),
+        "max_question_overlap": settings.get("max_question_overlap", 0.8),
+        "min_cyrillic_share": settings.get("min_cyrillic_share", 0.3),
+        "audit_file": settings.get("audit_file"),
+    }
+
+
+def cyrillic_share(text: str) -> Optional[float]:
+    """Доля кириллицы среди букв (None — букв нет)."""
+    cyrillic = len(CYRILLIC_RE.findall(text))
+    total = cyrillic + len(LATIN_RE.findall(text))
+    return cyrillic / total if total else None
+
+
+def keyword_coverage(answer_stems: set, keywords: List[str]) -> Tuple[float, List[str]]:
+    """Доля найденных ключевых понятий и список ненайденных."""
+    prefixes = {stem[:KEYWORD_STEM] for stem in answer_stems}
+    missing = []
+    for keyword in keywords:
+        stems = [stem[:KEYWORD_STEM] for stem in tokenize(keyword)]
+        if not stems or not all(stem in prefixes for stem in stems):
+            missing.append(keyword)
+    return (len(keywords) - len(missing)) / len(keywords), missing
+
+
+def evaluate(request: dict, question: Optional[dict], config: dict) -> dict:
+    """
+    Сигналы предпроверки, предварительный балл и причины отказа.
+
+    Returns:
+        словарь: words, expected_words, length_ratio, question_overlap,
+        keyword_coverage, missing_keywords, cyrillic_share, score, reasons
+    """
+    settings = _settings(config)
+    question = question or {}
+    answer = request.get("answer_text") or ""
+
+    words = len(answer.split())
+    expected_length = question.get("expected_length") or settings["default_expected_length"]
+    expected_words = settings["expected_words"].get(expected_length, DEFAULT_EXPECTED_WORDS["short"])
+    length_ratio = min(1.0, words / expected_words) if expected_words else 1.0
+
+    answer_stems = tokenize(answer)
+    question_stems = set(tokenize(request.get("question_text") or ""))
+    overlap = (
+        sum(1 for stem in answer_stems if stem in question_stems) / len(answer_stems)
+        if answer_stems and question_stems else 0.0
+    )
+
+    keywords = question.get("keywords") or []
+    coverage, missing = keyword_coverage(set(answer_stems), keywords) if keywords else (None, [])
+
+    share = cyrillic_share(answer)
+    language_ok = share is None or share >= settings["min_cyrillic_share"]
+
+    reasons = []
+    if not answer_stems:
+        reasons.append("empty")
+    else:
+        if overlap >= settings["max_question_overlap"]:
+            reasons.append("copy_of_question")
+        if length_ratio < settings["min_length_ratio"]:
+            reasons.append("too_short")
+        if not language_ok:
+            reasons.append("wrong_language")
+
+    score = 100 * length_ratio * (1 - overlap) * (1 if language_ok else 0)
+    if coverage is not None:
+        score *= 0.5 + 0.5 * coverage
+    if "empty" in reasons:
+        score = 0
+
+    return {
+        "words": words,
+        "expected_length": expected_length,
+        "expected_words": expected_words,
+        "length_ratio": round(length_ratio, 3),
+        "question_overlap": round(overlap, 3),
+        "keyword_coverage": None if coverage is None else round(coverage, 3),
+        "missing_keywords": missing,
+        "cyrillic_share": None if share is None else round(share, 3),
+        "score": int(round(score)),
+        "reasons": reasons,
+    }
+
+
+def _issues(signals: dict) -> List[dict]:
+    issues = []
+    for reason in signals["reasons"]:
+        if reason == "empty":
+            issues.append({"criterion": "completeness", "issue": "Ответ пустой",
+                           "suggestion": "Напишите ответ своими словами"})
+        elif reason == "copy_of_question":
+            issues.append({"criterion": "understanding", "issue": "Ответ повторяет формулировку вопроса",
+                           "suggestion": "Изложите собственное понимание, а не текст вопроса"})
+        elif reason == "too_short":
+            issues.append({"criterion": "completeness",
+                           "issue": f"Ответ слишком короткий: {signals['words']} слов "
+                                    f"при ожидаемых ~{signals['expected_words']}",
+                           "suggestion": "Раскройте ответ подробнее, опираясь на материалы раздела"})
+        elif reason == "wrong_language":
+            issues.append({"criterion": "completeness", "issue": "Ответ написан не на языке курса",
+                           "suggestion": "Ответьте на русском языке"})
+    if signals["missing_keywords"] and "empty" not in signals["reasons"]:
+        issues.append({"criterion": "terminology",
+                       "issue": "Не использованы ключевые понятия: " + ", ".join(signals["missing_keywords"]),
+                       "suggestion": "Используйте понятия из материалов раздела"})
+    return issues
+
+
+def short_circuit(signals: dict, context: dict, config: dict) -> Optional[dict]:
+    """
+    Результат проверки без LLM (в формате ответа модели) или None.
+
+    Отказ выносится, только если есть жёсткая причина и балл ниже
+    thresholds.auto_reject — пограничные ответы проверяет модель.
+    """
+    auto_reject = config.get("thresholds", {}).get("auto_reject", 40)
+    if not signals["reasons"] or signals["score"] >= auto_reject:
+        return None
+    return {
+        "verdict": "rejected",
+        "score": signals["score"],
+        "strengths": [],
+        "issues": _issues(signals),
+        "next_step": f"Перечитайте раздел «{context.get('section_name', '')}» и отправьте развёрнутый ответ",
+        "model": PRECHECK_MODEL,
+    }
+
+
+class AuditLog:
+    """Журнал решений предпроверки в JSON Lines (потокобезопасно)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def write(self, path: Path, record: dict):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                print(f"[WARN] Не удалось записать аудит предпроверки в {path}: {e}", file=sys.stderr)
+
+
+_audit = AuditLog()
+
+
+def record_decision(request: dict, signals: dict, result: dict, config: dict, request_id: Optional[str] = None):
+    """Запись отказа без LLM: сигналы, причины и хэш ответа (сам ответ не сохраняется)."""
+    audit_file = _settings(config)["audit_file"]
+    if not audit_file:
+        return
+    answer = request.get("answer_text") or ""
+    _audit.write(AGENT_ROOT / audit_file, {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "request_id": request_id,
+        "course_name": request.get("course_name"),
+        "section_name": request.get("section_name"),
+        "answer_sha256": hashlib.sha256(answer.encode("utf-8")).hexdigest(),
+        "verdict": result["verdict"],
+        "score": result["score"],
+        "signals": signals,
+    })
+
+
+def precheck(
+    request: dict,
+    question: Optional[dict],
+    context: dict,
+    config: dict,
+    request_id: Optional[str] = None
+) -> Tuple[dict, Optional[dict]]:
+    """
+    Предпроверка ответа (при precheck.enabled: true).
+
+    Returns:
+        (сигналы, результат без LLM или None — нужен вызов модели)
+    """
+    if not _settings(config)["enabled"]:
+        return {}, None
+    signals = evaluate(request, question, config)
+    result = short_circuit(signals, context, config)
+    if result is not None:
+        print(
+            f"[INFO] Предпроверка: отказ без LLM ({', '.join(signals['reasons'])}, score={signals['score']})",
+            file=sys.stderr
+        )
+        record_decision(request, signals, result, config, request_id)
+    return signals, result
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Бюджет токенов промпта для ДЗ-чекера.
+
+Вместо фиксированного среза норматива по символам бюджет распределяется
+в токенах:
+
+1. Системный промпт, шаблон, вопрос и рубрика — обязательная часть.
+2. Ответ студента — целиком, до llm.max_answer_tokens.
+3. Норматив — остаток бюджета: разделы норматива ранжируются по близости
+   к вопросу и берутся целиком, пока помещаются; последний обрезается
+   по границе абзаца. В промпт разделы идут в исходном порядке.
+
+Бюджет = min(llm.max_prompt_tokens, llm.context_window - llm.max_tokens).
+
+Токены оцениваются локально (без токенизатора провайдера): слова латиницей —
+~4 символа на токен, кириллицей — ~3, знаки препинания — по токену.
+Оценка намеренно консервативная (чуть выше реального счёта).
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from search_service import tokenize
+
+
+DEFAULT_CONTEXT_WINDOW = 200000
+DEFAULT_MAX_PROMPT_TOKENS = 6000
+DEFAULT_MAX_ANSWER_TOKENS = 2000
+
+PIECE_RE = re.compile(r'[A-Za-z0-9]+|\w+|[^\w\s]', re.UNICODE)
+HEADING_LINE_RE = re.compile(r'^#{1,6}[ \t]', re.MULTILINE)
+
+TRUNCATED_ANSWER_MARK = "\n\n[…ответ сокращён]"
+
+
+def estimate_tokens(text: str) -> int:
+    """Приближённое число токенов в тексте."""
+    tokens = 0
+    for piece in PIECE_RE.findall(text):
+        if piece.isascii():
+            tokens += (len(piece) + 3) // 4
+        elif piece[0].isalnum() or piece[0] == "_":
+            tokens += (len(piece) + 2) // 3
+        else:
+            tokens += 1
+    return tokens
+
+
+def fit_text(text: str, max_tokens: int) -> str:
+    """Обрезка текста до max_tokens по границе абзаца, строки или слова."""
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    # Бинарный поиск по длине префикса, затем откат к естественной границе
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+
+    for separator in ("\n\n", "\n", " "):
+        cut = text.rfind(separator, 0, lo)
+        if cut > lo // 2:
+            return text[:cut].rstrip()
+    return text[:lo]
+
+
+def split_sections(text: str) -> List[str]:
+    """Разбиение норматива на разделы по Markdown-заголовкам."""
+    starts = [m.start() for m in HEADING_LINE_RE.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    starts.append(len(text))
+    sections = [text[a:b].strip() for a, b in zip(starts, starts[1:])]
+    return [s for s in sections if s]
+
+
+def rank_sections(sections: List[str], query: str) -> List[int]:
+    """
+    Порядок разделов по близости к вопросу (BM25-подобная оценка).
+
+    Первый раздел (заголовок и вводный текст норматива) всегда идёт первым.
+    """
+    if len(sections) <= 1:
+        return list(range(len(sections)))
+
+    query_terms = set(tokenize(query))
+    tfs = [Counter(tokenize(s)) for s in sections]
+    lengths = [sum(tf.values()) or 1 for tf in tfs]
+    avg_length = sum(lengths) / len(lengths)
+    n = len(sections)
+
+    scores = []
+    for i, tf in enumerate(tfs):
+        score = 0.0
+        for term in query_terms:
+            freq = tf.get(term, 0)
+            if not freq:
+                continue
+            df = sum(1 for other in tfs if term in other)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            score += idf * freq * 2.2 / (freq + 1.2 * (0.25 + 0.75 * lengths[i] / avg_length))
+        scores.append(score)
+
+    rest = sorted(range(1, n), key=lambda i: (-scores[i], i))
+    return [0] + rest
+
+
+def plan_normative(normative: str, query: str, budget: int) -> Tuple[str, dict]:
+    """Отбор разделов норматива в пределах budget токенов."""
+    sections = split_sections(normative)
+    costs = [estimate_tokens(s) for s in sections]
+    total = sum(costs)
+    if total <= budget:
+        return normative.strip(), {"normative": total, "normative_full": total, "sections_dropped": 0}
+
+    chosen: Dict[int, str] = {}
+    used = 0
+    for i in rank_sections(sections, query):
+        remaining = budget - used
+        if costs[i] + 2 <= remaining:
+            chosen[i] = sections[i]
+            used += costs[i] + 2
+        elif not chosen or remaining >= costs[i] // 2:
+            # Самый релевантный раздел не помещается — берём его начало
+            part = fit_text(sections[i], remaining - 2)
+            if part:
+                chosen[i] = part
+                used += estimate_tokens(part) + 2
+
+    text = "\n\n".join(chosen[i] for i in sorted(chosen))
+    return text, {
+        "normative": estimate_tokens(text),
+        "normative_full": total,
+        "sections_dropped": len(sections) - len(chosen),
+    }
+
+
+def prompt_budget(config: dict) -> int:
+    """Бюджет входных токенов на одну проверку."""
+    llm = config.get("llm", {})
+    window = llm.get("context_window", DEFAULT_CONTEXT_WINDOW) - llm.get("max_tokens", 0)
+    return max(0, min(window, llm.get("max_prompt_tokens", DEFAULT_MAX_PROMPT_TOKENS)))
+
+
+def plan_prompt(
+    template: str,
+    system: str,
+    values: Dict[str, str],
+    config: dict
+) -> Tuple[Dict[str, str], dict]:
+    """
+    Распределение бюджета между частями промпта.
+
+    Args:
+        template: шаблон пользовательского сообщения с {переменными}
+        system: системный промпт
+        values: question_text, answer_text, normative_content, rubric_criteria
+
+    Returns:
+        (значения для подстановки в шаблон, отчёт об использовании токенов)
+    """
+    budget = prompt_budget(config)
+    max_answer = config.get("llm", {}).get("max_answer_tokens", DEFAULT_MAX_ANSWER_TOKENS)
+
+    skeleton = template
+    for name in values:
+        skeleton = skeleton.replace("{" + name + "}", "")
+
+    usage = {
+        "budget": budget,
+        "system": estimate_tokens(system),
+        "template": estimate_tokens(skeleton),
+        "question": estimate_tokens(values["question_text"]),
+        "rubric": estimate_tokens(values["rubric_criteria"]),
+    }
+    planned = dict(values)
+
+    answer = values["answer_text"]
+    usage["answer"] = estimate_tokens(answer)
+    if usage["answer"] > max_answer:
+        answer = fit_text(answer, max_answer) + TRUNCATED_ANSWER_MARK
+        usage["answer"] = estimate_tokens(answer)
+    planned["answer_text"] = answer
+
+    fixed = usage["system"] + usage["template"] + usage["question"] + usage["rubric"] + usage["answer"]
+    normative, normative_usage = plan_normative(
+        values["normative_content"], values["question_text"], budget - fixed
+    )
+    planned["normative_content"] = normative
+    usage.update(normative_usage)
+    usage["total"] = fixed + usage["normative"]
+
+    return planned, usage
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Устойчивость вызовов LLM: повторы, дедлайн запроса, circuit breaker.
+
+- RetryPolicy — экспоненциальная задержка с джиттером; retry-after провайдера
+  имеет приоритет над расчётной задержкой. Какие ошибки повторяемы, решает
+  ProviderError.retryable из .ops/llm_router.py (429, 5xx, сеть).
+- Deadline — общий бюджет времени на вызов LLM в рамках одного запроса:
+  таймаут каждой попытки и паузы между попытками не выходят за него.
+- CircuitBreaker — после failure_threshold неудач подряд маршрут
+  (провайдер/модель) считается недоступным на reset_timeout секунд:
+  запросы сразу получают ошибку, затем пропускается одна пробная попытка.
+
+Ошибки поднимаются как LLMError со статусом — вызывающий код (server.py)
+превращает его в HTTP-код, а не в фиктивный результат проверки.
+"""
+
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+
+# Статус ошибки → HTTP-код ответа сервера
+ERROR_HTTP_STATUS = {
+    "circuit_open": 503,
+    "rate_limited": 503,
+    "shutting_down": 503,
+    "job_running": 503,
+    "timeout": 504,
+    "provider_error": 502,
+    "invalid_response": 502,
+    "client_error": 500,
+}
+
+
+class LLMError(Exception):
+    """Вызов LLM не удался; status — машиночитаемая причина."""
+
+    def __init__(self, status: str, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def http_status(self) -> int:
+        return ERROR_HTTP_STATUS.get(self.status, 502)
+
+    def to_dict(self) -> dict:
+        error = {"status": self.status, "message": str(self)}
+        if self.retry_after is not None:
+            error["retry_after"] = round(self.retry_after, 1)
+        return {"error": error}
+
+
+class Deadline:
+    """Абсолютный срок, до которого должен завершиться вызов LLM."""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+class RetryPolicy:
+    """Число попыток и экспоненциальная задержка с полным джиттером."""
+
+    def __init__(self, max_attempts: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0):
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    @classmethod
+    def from_config(cls, config: dict) -> "RetryPolicy":
+        retry = config.get("llm", {}).get("retry", {})
+        return cls(
+            max_attempts=retry.get("max_attempts", 3),
+            backoff_base=retry.get("backoff_base", 0.5),
+            backoff_max=retry.get("backoff_max", 8.0),
+        )
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Пауза перед попыткой attempt + 1."""
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """Circuit breaker: closed → open (после серии неудач) → half-open → closed."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_progress = False
+        # Поток, которому выдана пробная попытка (release снимает только свою)
+        self.trial_owner: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> Optional[float]:
+        """None — попытка разрешена, иначе — сколько секунд до пробной попытки."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return None
+            if state == "half_open" and not self.trial_in_progress:
+                self.trial_in_progress = True
+                self.trial_owner = threading.get_ident()
+                return None
+            waited = time.monotonic() - self.opened_at
+            return max(1.0, self.reset_timeout - waited)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_progress = False
+            self.trial_owner = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_in_progress or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_in_progress = False
+            self.trial_owner = None
+
+    def release(self):
+        """
+        Завершение попытки без вывода о здоровье маршрута.
+
+        Если попытка была пробной (half-open) и не закончилась ни
+        record_success, ни record_failure (локальный лимит, ошибка
+        конфигурации, 4xx, обрыв соединения с клиентом), следующий
+        запрос снова сможет стать пробным. Вызывать после каждой попытки.
+        """
+        with self._lock:
+            if self.trial_in_progress and self.trial_owner == threading.get_ident():
+                self.trial_in_progress = False
+                self.trial_owner = None
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str, config: dict) -> CircuitBreaker:
+    """Circuit breaker маршрута provider/model (один на процесс)."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            settings = config.get("llm", {}).get("circuit_breaker", {})
+            breaker = _breakers[name] = CircuitBreaker(
+                failure_threshold=settings.get("failure_threshold", 5),
+                reset_timeout=settings.get("reset_timeout", 30.0),
+            )
+        return breaker
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Локальный поиск по руководствам для ДЗ-чекера (замена semantic_search из v2).
+
+Строит BM25-индекс по фрагментам (разделам) Markdown-файлов из search.roots
+и отвечает в том же контракте, что и MCP-инструмент semantic_search:
+
+    POST /mcp
+    {"jsonrpc": "2.0", "id": "search-1", "method": "tools/call",
+     "params": {"name": "semantic_search",
+                "arguments": {"query": "...", "lang": "ru", "limit": 5}}}
+
+    → result.content[0].text = JSON-массив
+      [{content, heading, score, guide_id, section_id}, ...]
+
+Индекс хранится на диске (search.index_path) и перестраивается инкрементально:
+повторно разбираются только файлы, у которых изменились mtime или размер.
+
+При search.vector: true к BM25 добавляется векторная близость из общего
+эмбеддинг-индекса (.ops/embedding_index.py), итоговый score — взвешенная сумма.
+
+Использование:
+    python3 search_service.py --query "Почему физический мир имеет много описаний?"
+    python3 search_service.py --serve --port 8081
+"""
+
+import json
+import math
+import re
+import sys
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from guides_index import GuideFile
+
+
+INDEX_VERSION = 1
+
+# Параметры BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Фрагменты короче этого порога (без заголовка) не индексируются
+MIN_CHUNK_CHARS = 40
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Длина основы слова: грубый стемминг для русского без внешних зависимостей
+STEM_LENGTH = 6
+
+STOP_WORDS = {
+    "и", "в", "во", "не", "что", "он", "на", "я", "с", "со", "как", "а", "то",
+    "все", "она", "так", "его", "но", "да", "ты", "к", "у", "же", "вы", "за",
+    "бы", "по", "только", "ее", "мне", "было", "вот", "от", "меня", "еще",
+    "нет", "о", "из", "ему", "это", "для", "ли", "или", "при", "этом", "the",
+    "a", "an", "of", "to", "in", "is", "and", "or", "for", "on", "with",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Токенизация: нижний регистр, без стоп-слов, усечение до основы."""
+    tokens = []
+    for word in TOKEN_RE.findall(text.lower().replace("ё", "е")):
+        if word in STOP_WORDS or word.isdigit():
+            continue
+        tokens.append(word[:STEM_LENGTH])
+    return tokens
+
+
+def _chunk_file(path: Path, relative: str) -> List[dict]:
+    """Разбиение файла на фрагменты: собственный текст каждого раздела."""
+    guide = GuideFile(path, relative)
+    guide.load()
+    try:
+        guide_name = relative[:-3] if relative.endswith(".md") else relative
+        chunks = []
+
+        sections = sorted(guide.sections.values(), key=lambda s: s.start)
+        first_heading = sections[0].start if sections else guide.size
+        preamble = guide.read(guide.body_start, first_heading).strip()
+        if len(preamble) >= MIN_CHUNK_CHARS:
+            chunks.append({
+                "heading": Path(guide_name).name,
+                "section_id": f"sections:{guide_name}",
+                "content": preamble,
+            })
+
+        for section in sections:
+            own_end = section.children[0] if section.children else section.end
+            text = guide.read(section.start, own_end)
+            body = text.split("\n", 1)[1].strip() if "\n" in text else ""
+            if len(body) < MIN_CHUNK_CHARS:
+                continue
+            chunks.append({
+                "heading": section.title,
+                "section_id": f"sections:{guide_name}#{'/'.join(section.heading_path)}",
+                "content": body,
+            })
+
+        for chunk in chunks:
+            chunk["guide_id"] = f"guides:{guide_name}"
+            tokens = tokenize(chunk["heading"] + "\n" + chunk["content"])
+            chunk["length"] = len(tokens)
+            chunk["tf"] = dict(Counter(tokens))
+        return chunks
+    finally:
+        guide.close()
+
+
+class SearchIndex:
+    """
+    BM25-индекс по фрагментам руководств с инкрементальным обновлением.
+
+    На диске хранится по каждому файлу: mtime, размер и фрагменты с частотами
+    терминов. Постинги и статистика корпуса собираются в памяти при загрузке.
+    """
+
+    def __init__(self, roots: List[Path], index_path: Path):
+        self.roots = roots
+        self.index_path = index_path
+        self.files: Dict[str, dict] = {}
+        self.chunks: List[dict] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.avg_length = 0.0
+        self.vector_index = None
+        self.vector_weight = 0.0
+        self._by_section_id: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> "SearchIndex":
+        """Загрузка сохранённого индекса (если он есть и совместим по версии)."""
+        if self.index_path.exists():
+            try:
+                data = json.loads(self.index_path.read_text(encoding="utf-8"))
+                if data.get("version") == INDEX_VERSION:
+                    self.files = data.get("files", {})
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"[WARN] Индекс поиска повреждён, будет перестроен: {e}", file=sys.stderr)
+                self.files = {}
+        self._rebuild_postings()
+        return self
+
+    def update(self) -> Tuple[int, int]:
+        """
+        Инкрементальное обновление: переразбор изменённых и новых файлов,
+        удаление исчезнувших. Возвращает (обновлено, удалено).
+        """
+        with self._lock:
+            seen = set()
+            updated = 0
+
+            for root in self.roots:
+                if not root.is_dir():
+                    print(f"[WARN] Корень поиска не найден: {root}", file=sys.stderr)
+                    continue
+                for path in sorted(root.rglob("*.md")):
+                    if any(part.startswith(".") for part in path.relative_to(root).parts):
+                        continue
+                    key = path.resolve().as_posix()
+                    seen.add(key)
+                    stat = path.stat()
+                    entry = self.files.get(key)
+                    if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                        continue
+                    try:
+                        chunks = _chunk_file(path, path.relative_to(root).as_posix())
+                    except (OSError, ValueError) as e:
+                        print(f"[WARN] Не удалось проиндексировать {path}: {e}", file=sys.stderr)
+                        continue
+                    self.files[key] = {
+                        "mtime_ns": stat.st_mtime_ns,
+                        "size": stat.st_size,
+                        "chunks": chunks,
+                    }
+                    updated += 1
+
+            removed = [key for key in self.files if key not in seen]
+            for key in removed:
+                del self.files[key]
+
+            if updated or removed:
+                self._rebuild_postings()
+                self.save()
+                if self.vector_index is not None:
+                    self._update_vectors()
+
+            print(f"[INFO] Индекс поиска: {len(self.files)} файлов, {len(self.chunks)} фрагментов "
+                  f"(обновлено {updated}, удалено {len(removed)})", file=sys.stderr)
+            return updated, len(removed)
+
+    def save(self):
+        """Атомарная запись индекса на диск."""
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps({"version": INDEX_VERSION, "files": self.files}, ensure_ascii=False),
+            encoding="utf-8"
+        )
+        tmp_path.replace(self.index_path)
+
+    def _rebuild_postings(self):
+        self.chunks = [chunk for key in sorted(self.files) for chunk in self.files[key]["chunks"]]
+        postings = defaultdict(list)
+        total_length = 0
+        for i, chunk in enumerate(self.chunks):
+            total_length += chunk["length"]
+            for term, tf in chunk["tf"].items():
+                postings[term].append((i, tf))
+        self.postings = dict(postings)
+        self.avg_length = total_length / len(self.chunks) if self.chunks else 0.0
+        self._by_section_id = {chunk["section_id"]: i for i, chunk in enumerate(self.chunks)}
+
+    def enable_vectors(self, index_dir: Path, model: str = "hashing", weight: float = 0.5):
+        """
+        Подключение векторного поиска из общего эмбеддинг-индекса .ops.
+
+        Каждый фрагмент индексируется как отдельный «документ» с ключом
+        section_id; векторы пересчитываются только для изменённых фрагментов.
+        """
+        ops_dir = Path(__file__).resolve().parents[2] / ".ops"
+        if str(ops_dir) not in sys.path:
+            sys.path.insert(0, str(ops_dir))
+        from embedding_index import EmbeddingIndex, get_embedder
+
+        self.vector_index = EmbeddingIndex(index_dir, get_embedder(model))
+        self.vector_weight = weight
+        self._update_vectors()
+
+    def _update_vectors(self):
+        stats = self.vector_index.update((c["section_id"], c["content"]) for c in self.chunks)
+        print(f"[INFO] Векторный индекс: {stats['vectors']} векторов (посчитано {stats['embedded']})", file=sys.stderr)
+
+    def _idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        n = len(self.chunks)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _bm25(self, terms: List[str]) -> Dict[int, float]:
+        """
+        BM25 по фрагментам, нормированный в [0, 1] на максимум для запроса.
+
+        Максимум считается только по терминам, которые есть в корпусе:
+        слова вопроса, не встречающиеся в методичках, не должны занижать
+        score длинных вопросов ниже search.min_score. Вклад термина в
+        максимум — BM25 одного вхождения во фрагмент средней длины (idf),
+        так что score 1.0 — все найденные термины встречаются во фрагменте.
+        """
+        scores: Dict[int, float] = defaultdict(float)
+        max_score = 0.0
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(term)
+            max_score += idf
+            for i, tf in postings:
+                length_norm = 1 - BM25_B + BM25_B * self.chunks[i]["length"] / (self.avg_length or 1)
+                scores[i] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)
+
+        if max_score <= 0:
+            return {}
+        return {i: min(score / max_score, 1.0) for i, score in scores.items()}
+
+    def search(self, query: str, limit: int = 5) -> List[dict]:
+        """
+        Поиск фрагментов. score в [0, 1]: BM25 относительно полного совпадения
+        по терминам запроса, найденным в корпусе (см. _bm25); при векторном
+        поиске — смесь с косинусной близостью.
+        """
+        if not self.chunks:
+            return []
+
+        terms = list(dict.fromkeys(tokenize(query)))
+        scores = self._bm25(terms) if terms else {}
+
+        if self.vector_index is not None:
+            weight = self.vector_weight
+            combined = {i: (1 - weight) * score for i, score in scores.items()}
+            for hit in self.vector_index.search(query, k=limit * 3):
+                i = self._by_section_id.get(hit["path"])
+                if i is not None:
+                    combined[i] = combined.get(i, 0.0) + weight * max(hit["score"], 0.0)
+            scores = combined
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        results = []
+        for i, score in ranked:
+            chunk = self.chunks[i]
+            results.append({
+                "content": chunk["content"],
+                "heading": chunk["heading"],
+                "score": round(score, 4),
+                "guide_id": chunk["guide_id"],
+                "section_id": chunk["section_id"],
+            })
+        return results
+
+
+def build_search_index(config: dict) -> SearchIndex:
+    """Создание индекса по настройкам search.* из config.yaml."""
+    from check import AGENT_ROOT
+
+    search_config = config.get("search", {})
+    roots = search_config.get("roots") or [config["paths"]["guides_root"]]
+    index_path = search_config.get("index_path", "data/cache/search_index.json")
+
+    index = SearchIndex(
+        roots=[(AGENT_ROOT / root).resolve() for root in roots],
+        index_path=AGENT_ROOT / index_path
+    ).load()
+    index.update()
+
+    if search_config.get("vector", False):
+        try:
+            index.enable_vectors(
+                AGENT_ROOT / search_config.get("vector_index_dir", "data/cache/embeddings"),
+                model=search_config.get("vector_model", "hashing"),
+                weight=search_config.get("vector_weight", 0.5)
+            )
+        except (RuntimeError, ValueError) as e:
+            print(f"[WARN] Векторный поиск отключён: {e}", file=sys.stderr)
+
+    return index
+
+
+# ==================== JSON-RPC (контракт semantic_search) ====================
+
+SEMANTIC_SEARCH_TOOL = {
+    "name": "semantic_search",
+    "description": "Семантический поиск по руководствам. Возвращает релевантные фрагменты.",
+    "inputSchema": {
+        "type": "object",
+        "required": ["query"],
+        "properties": {
+            "query": {"type": "string", "description": "Текст для поиска"},
+            "lang": {"type": "string", "description": "Язык (ru/en)", "default": "ru"},
+            "limit": {"type": "integer", "description": "Количество результатов", "default": 5},
+        },
+    },
+}
+
+
+def _rpc_error(request_id, code: int, message: str) -> dict:
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+def handle_rpc(index: SearchIndex, payload) -> dict:
+    """Обработка JSON-RPC 2.0 запроса MCP (tools/list, tools/call)."""
+    if not isinstance(payload, dict):
+        return _rpc_error(None, -32600, "Invalid Request")
+
+    request_id = payload.get("id")
+    method = payload.get("method")
+
+    if method == "tools/list":
+        return {"jsonrpc": "2.0", "id": request_id, "result": {"tools": [SEMANTIC_SEARCH_TOOL]}}
+
+    if method != "tools/call":
+        return _rpc_error(request_id, -32601, f"Method not found: {method}")
+
+    params = payload.get("params") or {}
+    if params.get("name") != "semantic_search":
+        return _rpc_error(request_id, -32602, f"Unknown tool: {params.get('name')}")
+
+    arguments = params.get("arguments") or {}
+    query = arguments.get("query")
+    if not isinstance(query, str) or not query.strip():
+        return _rpc_error(request_id, -32602, "Missing required argument: query")
+
+    try:
+        limit = max(1, min(int(arguments.get("limit", 5)), 50))
+    except (TypeError, ValueError):
+        return _rpc_error(request_id, -32602, "Invalid argument: limit")
+
+    # lang принимается для совместимости: индекс строится по одному корпусу
+    results = index.search(query, limit)
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "result": {"content": [{"type": "text", "text": json.dumps(results, ensure_ascii=False)}]}
+    }
+
+
+def main():
+    import argparse
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    from check import DEFAULT_CONFIG, load_config
+
+    parser = argparse.ArgumentParser(description="Локальный поиск по руководствам (semantic_search)")
+    parser.add_argument("--config", "-c", type=str, help="Путь к конфигурации")
+    parser.add_argument("--query", "-q", type=str, help="Выполнить один поиск и вывести результат")
+    parser.add_argument("--limit", "-n", type=int, default=5, help="Количество результатов")
+    parser.add_argument("--serve", action="store_true", help="Запустить HTTP-сервер с POST /mcp")
+    parser.add_argument("--port", "-p", type=int, default=8081, help="Порт сервера")
+    parser.add_argument("--host", type=str, default="0.0.0.0", help="Хост сервера")
+
+    args = parser.parse_args()
+
+    config = load_config(Path(args.config) if args.config else DEFAULT_CONFIG)
+    index = build_search_index(config)
+
+    if args.query:
+        print(json.dumps(index.search(args.query, args.limit), ensure_ascii=False, indent=2))
+        return
+
+    if not args.serve:
+        return
+
+    class SearchHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/mcp":
+                self.send_error(404, "Not Found")
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                response = handle_rpc(index, json.loads(self.rfile.read(length).decode("utf-8")))
+            except (ValueError, UnicodeDecodeError):
+                response = _rpc_error(None, -32700, "Parse error")
+
+            body = json.dumps(response, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", len(body))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            print(f"[HTTP] {self.address_string()} - {format % args}", file=sys.stderr)
+
+    server = HTTPServer((args.host, args.port), SearchHandler)
+    print(f"[INFO] Поиск запущен на http://{args.host}:{args.port}/mcp", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
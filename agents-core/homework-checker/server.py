@@ -2,23 +2,52 @@
 """
 HTTP-сервер ДЗ-чекера v0.1.
 
-Синхронный endpoint для приёма запросов от LMS.
+Синхронный endpoint для приёма запросов от LMS
+и потоковый вариант (SSE) для интерактивных клиентов.
+
+Запросы обрабатываются в потоках, одновременно выполняется не больше
+server.max_concurrent_checks проверок. По SIGTERM (или Ctrl+C) сервер
+останавливается плавно: новые соединения не принимаются, начатые проверки
+завершаются (не дольше server.drain_timeout), а ожидавшие и незавершённые
+запросы сохраняются в очередь заданий (jobs.py) и будут выполнены другим
+процессом чекера.
 
 Использование:
     python3 server.py --port 8080
+    python3 server.py --port 8080 --reuse-port   # перезапуск без простоя (SO_REUSEPORT)
 """
 
 import argparse
 import json
+import os
+import select
+import signal
+import socket
+import sqlite3
 import sys
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
+from typing import Optional
 
 # Импортируем функции из check.py
-from check import check_answer, load_config, load_prompts
+from check import check_answer, get_guide_index, get_router, get_search_index, load_config, load_prompts
+from jobs import JobPending, JobStore
+from resilience import LLMError
+from search_service import handle_rpc
+from tracing import configure_tracing, new_request_id
+from validation import ValidationError, get_validator, validate
+import metrics
 
 AGENT_ROOT = Path(__file__).parent
 DEFAULT_CONFIG = AGENT_ROOT / "config.yaml"
+# Retry-After для запроса, задание которого выполняется в очереди (секунд)
+JOB_RETRY_AFTER = 5
+# Статусы LLMError, которые не означают недоступность LLM (не пишутся как [ERROR])
+QUIET_STATUSES = ("shutting_down", "job_running")
 
 
 class CheckHandler(BaseHTTPRequestHandler):
@@ -33,45 +62,186 @@ class CheckHandler(BaseHTTPRequestHandler):
         """Инициализация конфигурации."""
         cls.config = load_config(config_path)
         cls.prompts = load_prompts(cls.config)
+        configure_tracing(cls.config)
+        # Индекс разделов руководств строим до приёма запросов
+        get_guide_index(cls.config)
+        get_search_index(cls.config)
+        get_router(cls.config)
+        # Валидаторы схем компилируются один раз
+        get_validator("check_request")
+        get_validator("llm_result")
         print(f"[INFO] Конфигурация загружена из {config_path}", file=sys.stderr)
 
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
     def do_POST(self):
-        """Обработка POST-запроса на /check."""
-        if self.path != "/check":
+        """POST-запрос с учётом в метриках (счётчик, задержка, код ответа)."""
+        self._status = None
+        started = time.perf_counter()
+        try:
+            self._do_post()
+        finally:
+            endpoint = self.path if self.path in ("/check", "/check/stream", "/mcp") else "other"
+            metrics.REQUESTS.inc(endpoint=endpoint, status=str(self._status or 0))
+            metrics.REQUEST_DURATION.observe(time.perf_counter() - started, endpoint=endpoint)
+
+    def _do_post(self):
+        """Обработка POST-запроса на /check, /check/stream и /mcp (локальный semantic_search)."""
+        if self.path == "/mcp":
+            self._handle_mcp()
+            return
+
+        if self.path not in ("/check", "/check/stream"):
             self.send_error(404, "Not Found")
             return
 
+        request = self._read_check_request()
+        if request is None:
+            return
+
+        # Идентификатор запроса: из заголовка LMS или новый (попадает в спаны)
+        self.request_id = self.headers.get("X-Request-Id") or new_request_id()
+
+        if self.path == "/check/stream":
+            self._handle_stream(request)
+            return
+
+        # Проверка
+        try:
+            result = self._run_check(request)
+        except LLMError as e:
+            if e.status not in QUIET_STATUSES:
+                print(f"[ERROR] LLM недоступна ({e.status}): {e}", file=sys.stderr)
+            self._send_llm_error(e)
+            return
+        except Exception as e:
+            print(f"[ERROR] Ошибка проверки: {e}", file=sys.stderr)
+            metrics.ERRORS.inc(type="internal")
+            self.send_error(500, f"Internal error: {e}")
+            return
+
+        # Отправляем ответ
+        response_body = json.dumps(result, ensure_ascii=False).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", len(response_body))
+        self.send_header("X-Request-Id", self.request_id)
+        self.end_headers()
+        self.wfile.write(response_body)
+
+    def _run_check(self, request: dict, on_event=None) -> dict:
+        """Проверка в слоте сервера; результат, сохранённый при перезапуске, отдаётся сразу."""
+        jobs = self.server.jobs
+        if jobs is not None:
+            try:
+                result = jobs.take(request)
+            except JobPending:
+                raise LLMError("job_running", "Запрос уже проверяется из очереди заданий, повторите позже",
+                               retry_after=JOB_RETRY_AFTER)
+            if result is not None:
+                print(f"[INFO] Результат из очереди заданий ({self.request_id})", file=sys.stderr)
+                return result
+
+        with self.server.admit(request, self.request_id):
+            return check_answer(request, self.config, self.prompts, on_event=on_event, request_id=self.request_id)
+
+    def _send_llm_error(self, error: LLMError):
+        """Явная ошибка вместо результата: 502/503/504 и retry-after, если известен."""
+        response_body = json.dumps(error.to_dict(), ensure_ascii=False).encode("utf-8")
+
+        self.send_response(error.http_status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", len(response_body))
+        self.send_header("X-Request-Id", self.request_id)
+        if error.retry_after is not None:
+            self.send_header("Retry-After", str(max(1, round(error.retry_after))))
+        self.end_headers()
+        self.wfile.write(response_body)
+
+    def _read_check_request(self):
+        """Чтение и валидация тела запроса на проверку (None — ошибка уже отправлена)."""
         # Читаем тело запроса
         content_length = int(self.headers.get("Content-Length", 0))
         if content_length == 0:
+            metrics.ERRORS.inc(type="bad_request")
             self.send_error(400, "Empty request body")
-            return
+            return None
 
         try:
             body = self.rfile.read(content_length)
             request = json.loads(body.decode("utf-8"))
         except json.JSONDecodeError as e:
+            metrics.ERRORS.inc(type="bad_request")
             self.send_error(400, f"Invalid JSON: {e}")
-            return
+            return None
 
-        # Валидация обязательных полей
-        required_fields = ["answer_text", "question_text", "course_name", "section_name"]
-        missing = [f for f in required_fields if f not in request]
-        if missing:
-            self.send_error(400, f"Missing required fields: {missing}")
-            return
+        # Валидация по schemas/check_request.json
+        try:
+            validate("check_request", request)
+        except ValidationError as e:
+            metrics.ERRORS.inc(type="bad_request")
+            self.send_error(400, f"Invalid request: {e}")
+            return None
+
+        return request
+
+    def _send_event(self, event: str, data: dict):
+        """Отправка одного SSE-события."""
+        payload = json.dumps(data, ensure_ascii=False)
+        self.wfile.write(f"event: {event}\ndata: {payload}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _handle_stream(self, request: dict):
+        """
+        Потоковая проверка (text/event-stream).
+
+        События:
+        - field  — ранние поля результата ({"verdict": ...}, {"score": ...})
+        - result — итоговый ответ в контракте /check ({comment, checked_at})
+        - error  — ошибка проверки ({"status": ..., "message": ...})
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.send_header("X-Request-Id", self.request_id)
+        self.end_headers()
 
-        # Проверка
         try:
-            result = check_answer(request, self.config, self.prompts)
+            result = self._run_check(request, on_event=self._send_event)
+        except (BrokenPipeError, ConnectionResetError):
+            print("[WARN] Клиент закрыл потоковое соединение", file=sys.stderr)
+            return
+        except LLMError as e:
+            if e.status not in QUIET_STATUSES:
+                print(f"[ERROR] LLM недоступна ({e.status}): {e}", file=sys.stderr)
+            self._send_event("error", e.to_dict()["error"])
+            return
         except Exception as e:
             print(f"[ERROR] Ошибка проверки: {e}", file=sys.stderr)
-            self.send_error(500, f"Internal error: {e}")
+            metrics.ERRORS.inc(type="internal")
+            self._send_event("error", {"message": f"Internal error: {e}"})
             return
 
-        # Отправляем ответ
-        response_body = json.dumps(result, ensure_ascii=False).encode("utf-8")
+        self._send_event("result", result)
+
+    def _handle_mcp(self):
+        """JSON-RPC endpoint с контрактом MCP-инструмента semantic_search."""
+        index = get_search_index(self.config)
+        if index is None:
+            self.send_error(404, "Search is disabled")
+            return
 
+        try:
+            content_length = int(self.headers.get("Content-Length", 0))
+            response = handle_rpc(index, json.loads(self.rfile.read(content_length).decode("utf-8")))
+        except (ValueError, UnicodeDecodeError):
+            response = {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}}
+
+        response_body = json.dumps(response, ensure_ascii=False).encode("utf-8")
         self.send_response(200)
         self.send_header("Content-Type", "application/json; charset=utf-8")
         self.send_header("Content-Length", len(response_body))
@@ -79,12 +249,22 @@ class CheckHandler(BaseHTTPRequestHandler):
         self.wfile.write(response_body)
 
     def do_GET(self):
-        """Обработка GET-запроса (health check)."""
-        if self.path == "/health":
-            response = {"status": "ok", "version": "0.1"}
-            response_body = json.dumps(response).encode("utf-8")
+        """Обработка GET-запроса (health check, метрики)."""
+        if self.path == "/metrics" and self.config.get("metrics", {}).get("enabled", False):
+            response_body = metrics.render().encode("utf-8")
 
             self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", len(response_body))
+            self.end_headers()
+            self.wfile.write(response_body)
+        elif self.path == "/health":
+            # При остановке балансировщик должен перестать направлять сюда запросы
+            draining = self.server.draining.is_set()
+            response = {"status": "draining" if draining else "ok", "version": "0.1"}
+            response_body = json.dumps(response).encode("utf-8")
+
+            self.send_response(503 if draining else 200)
             self.send_header("Content-Type", "application/json")
             self.send_header("Content-Length", len(response_body))
             self.end_headers()
@@ -97,11 +277,265 @@ class CheckHandler(BaseHTTPRequestHandler):
         print(f"[HTTP] {self.address_string()} - {format % args}", file=sys.stderr)
 
 
+class CheckServer(ThreadingHTTPServer):
+    """
+    Многопоточный сервер: слоты проверок, плавная остановка, SO_REUSEPORT.
+
+    Проверка занимает слот; при занятых слотах запрос ждёт. При остановке
+    ожидающие запросы сохраняются в очередь заданий и получают 503 с
+    Retry-After, начатые — дожидаются (drain).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, handler, max_concurrent: int = 8, reuse_port: bool = False,
+                 jobs: Optional[JobStore] = None):
+        self.reuse_port = reuse_port
+        self.jobs = jobs
+        self.max_concurrent = max_concurrent
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.draining = threading.Event()
+        self.active = {}
+        self.handling = 0
+        self._state_lock = threading.Lock()
+        super().__init__(address, handler)
+
+    def server_bind(self):
+        if self.reuse_port:
+            if not hasattr(socket, "SO_REUSEPORT"):
+                raise RuntimeError("SO_REUSEPORT не поддерживается этой ОС")
+            # Новый процесс слушает тот же порт, пока старый завершает работу
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+    def process_request(self, request, client_address):
+        # Учёт с момента приёма соединения: drain дождётся и тех, кто ещё не дошёл до слота
+        with self._state_lock:
+            self.handling += 1
+        super().process_request(request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            with self._state_lock:
+                self.handling -= 1
+
+    def _persist(self, request: dict, request_id: Optional[str]):
+        if self.jobs is None:
+            return
+        try:
+            self.jobs.enqueue(request, request_id)
+        except sqlite3.Error as e:
+            print(f"[WARN] Не удалось сохранить запрос {request_id} в очередь заданий: {e}", file=sys.stderr)
+
+    @contextmanager
+    def admit(self, request: dict, request_id: Optional[str]):
+        """Слот для проверки; при остановке запрос сохраняется и поднимается LLMError(shutting_down)."""
+        acquired = False
+        while not self.draining.is_set():
+            if self.slots.acquire(timeout=0.2):
+                acquired = True
+                break
+        if self.draining.is_set():
+            if acquired:
+                self.slots.release()
+            self._persist(request, request_id)
+            raise LLMError("shutting_down", "Сервер останавливается, запрос сохранён в очередь", retry_after=1)
+
+        token = object()
+        with self._state_lock:
+            self.active[token] = (request, request_id)
+        try:
+            yield
+        finally:
+            with self._state_lock:
+                self.active.pop(token, None)
+            self.slots.release()
+
+    def begin_shutdown(self, reason: str):
+        """Начало остановки (из обработчика сигнала): прекратить приём, отпустить serve_forever."""
+        if self.draining.is_set():
+            return
+        print(f"[INFO] {reason}: остановка, новые запросы не принимаются", file=sys.stderr)
+        self.draining.set()
+        # shutdown() ждёт выхода из serve_forever, поэтому вызывается не из его потока
+        threading.Thread(target=self.shutdown, daemon=True).start()
+
+    def drain(self, timeout: float):
+        """После serve_forever: ответить на соединения из очереди listen, дождаться проверок."""
+        # Соединения, уже принятые ядром, получают 503 вместо сброса при закрытии сокета
+        self.timeout = 0
+        while select.select([self.socket], [], [], 0)[0]:
+            self.handle_request()
+        self.server_close()
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._state_lock:
+                if not self.active and not self.handling:
+                    break
+            time.sleep(0.1)
+
+        with self._state_lock:
+            unfinished = list(self.active.values())
+        for request, request_id in unfinished:
+            self._persist(request, request_id)
+        if unfinished:
+            print(f"[WARN] Не завершено за {timeout} с: {len(unfinished)} проверок сохранено в очередь заданий",
+                  file=sys.stderr)
+        else:
+            print("[INFO] Все начатые проверки завершены", file=sys.stderr)
+
+
+class JobRunner(threading.Thread):
+    """Фоновое выполнение заданий, сохранённых при остановке этого или соседнего процесса."""
+
+    def __init__(self, server: CheckServer, interval: float = 2.0):
+        super().__init__(name="job-runner", daemon=True)
+        self.server = server
+        self.interval = interval
+        # Заданий в работе не больше слотов сервера — остальные остаются в очереди для соседей
+        self.capacity = threading.BoundedSemaphore(server.max_concurrent)
+
+    def run(self):
+        while not self.server.draining.wait(self.interval):
+            try:
+                self.server.jobs.purge()
+                self._run_pending()
+            except sqlite3.Error as e:
+                print(f"[WARN] Очередь заданий недоступна: {e}", file=sys.stderr)
+
+    def _run_pending(self):
+        while not self.server.draining.is_set():
+            if not self.capacity.acquire(timeout=self.interval):
+                return
+            job = self.server.jobs.claim()
+            if job is None:
+                self.capacity.release()
+                return
+            threading.Thread(target=self._run, args=job, daemon=True).start()
+
+    def _run(self, key: str, request: dict, request_id: Optional[str]):
+        jobs = self.server.jobs
+        print(f"[INFO] Задание из очереди: {request_id}", file=sys.stderr)
+        try:
+            with self.server.admit(request, request_id):
+                result = check_answer(request, CheckHandler.config, CheckHandler.prompts, request_id=request_id)
+            jobs.complete(key, result)
+        except LLMError as e:
+            # shutting_down: admit уже вернул задание в очередь
+            if e.status != "shutting_down":
+                print(f"[WARN] Задание {request_id} не выполнено ({e.status}): {e}", file=sys.stderr)
+                jobs.discard(key)
+        except Exception as e:
+            print(f"[ERROR] Задание {request_id} не выполнено: {e}", file=sys.stderr)
+            jobs.discard(key)
+        finally:
+            self.capacity.release()
+
+
+def serve(host: str, port: int, reuse_port: bool, worker: Optional[int] = None):
+    """Один процесс сервера: приём запросов до SIGTERM/SIGINT, затем drain."""
+    server_config = CheckHandler.config.get("server", {})
+    jobs = None
+    if server_config.get("jobs_db"):
+        jobs = JobStore(AGENT_ROOT / server_config["jobs_db"], result_ttl=server_config.get("result_ttl", 3600))
+    server = CheckServer(
+        (host, port), CheckHandler,
+        max_concurrent=server_config.get("max_concurrent_checks", 8),
+        reuse_port=reuse_port,
+        jobs=jobs
+    )
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda received, frame: server.begin_shutdown(signal.Signals(received).name))
+    if jobs is not None:
+        JobRunner(server).start()
+
+    if worker is not None:
+        print(f"[INFO] Воркер {worker} (pid {os.getpid()}) принимает запросы", file=sys.stderr)
+    server.serve_forever()
+    server.drain(server_config.get("drain_timeout", 60))
+
+
+def run_workers(host: str, port: int, workers: int):
+    """
+    Pre-fork: N процессов с SO_REUSEPORT на одном порту.
+
+    Конфигурация, индексы руководств и поиска строятся до fork и общие
+    для воркеров (copy-on-write). Лимит частоты LLM и очередь заданий —
+    в SQLite, метрики воркеров суммируются в /metrics. Упавший воркер
+    перезапускается; SIGTERM/SIGINT пересылается воркерам, главный
+    процесс ждёт их drain.
+    """
+    if not hasattr(os, "fork"):
+        raise RuntimeError("--workers требует fork() (Linux/macOS)")
+
+    metrics_config = CheckHandler.config.get("metrics", {})
+    metrics_dir = AGENT_ROOT / metrics_config.get("multiprocess_dir", "data/cache/metrics")
+    metrics.clear_snapshots(metrics_dir)
+
+    children = {}
+    stopping = threading.Event()
+
+    def spawn(index: int):
+        pid = os.fork()
+        if pid:
+            children[pid] = index
+            return
+        # Воркер: обработчики главного процесса не наследуются
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, signal.SIG_DFL)
+        code = 0
+        try:
+            metrics.configure_multiprocess(metrics_dir)
+            serve(host, port, reuse_port=True, worker=index)
+            metrics.write_snapshot()
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+
+    def stop(received, frame):
+        if stopping.is_set():
+            return
+        stopping.set()
+        print(f"[INFO] {signal.Signals(received).name}: остановка {len(children)} воркеров", file=sys.stderr)
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for index in range(workers):
+        spawn(index)
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is None or stopping.is_set():
+            continue
+        print(f"[WARN] Воркер {index} (pid {pid}) завершился с кодом {os.waitstatus_to_exitcode(status)}, "
+              f"перезапуск", file=sys.stderr)
+        time.sleep(1)
+        spawn(index)
+
+
 def main():
     parser = argparse.ArgumentParser(description="HTTP-сервер ДЗ-чекера v0.1")
     parser.add_argument("--port", "-p", type=int, default=8080, help="Порт сервера")
     parser.add_argument("--host", type=str, default="0.0.0.0", help="Хост сервера")
     parser.add_argument("--config", "-c", type=str, help="Путь к конфигурации")
+    parser.add_argument("--reuse-port", action="store_true",
+                        help="SO_REUSEPORT: запуск рядом со старым процессом на том же порту")
+    parser.add_argument("--workers", "-w", type=int,
+                        help="Число процессов (pre-fork, SO_REUSEPORT); по умолчанию server.workers или 1")
 
     args = parser.parse_args()
 
@@ -110,16 +544,23 @@ def main():
     CheckHandler.initialize(config_path)
 
     # Запуск сервера
-    server = HTTPServer((args.host, args.port), CheckHandler)
-    print(f"[INFO] ДЗ-чекер v0.1 запущен на http://{args.host}:{args.port}", file=sys.stderr)
+    server_config = CheckHandler.config.get("server", {})
+    workers = args.workers or server_config.get("workers", 1)
+
+    print(f"[INFO] ДЗ-чекер v0.1 запущен на http://{args.host}:{args.port}"
+          + (f" ({workers} воркеров)" if workers > 1 else ""), file=sys.stderr)
     print(f"[INFO] Endpoint: POST /check", file=sys.stderr)
+    print(f"[INFO] Поток: POST /check/stream (SSE)", file=sys.stderr)
+    print(f"[INFO] Поиск: POST /mcp (semantic_search)", file=sys.stderr)
     print(f"[INFO] Health: GET /health", file=sys.stderr)
+    if CheckHandler.config.get("metrics", {}).get("enabled", False):
+        print(f"[INFO] Метрики: GET /metrics", file=sys.stderr)
 
-    try:
-        server.serve_forever()
-    except KeyboardInterrupt:
-        print("\n[INFO] Остановка сервера...", file=sys.stderr)
-        server.shutdown()
+    if workers > 1:
+        run_workers(args.host, args.port, workers)
+    else:
+        serve(args.host, args.port, reuse_port=args.reuse_port or server_config.get("reuse_port", False))
+    print("[INFO] Сервер остановлен", file=sys.stderr)
 
 
 if __name__ == "__main__":
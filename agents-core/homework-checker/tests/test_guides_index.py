@@ -0,0 +1,77 @@
+"""
+Тесты индекса разделов руководств (guides_index.py): переиндексация
+изменённых и удалённых файлов.
+
+    python3 -m pytest agents-core/homework-checker/tests -q
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from guides_index import GuideIndex  # noqa: E402
+
+
+def write_guide(path: Path, text: str):
+    path.write_text(text, encoding="utf-8")
+    # mtime меняется заметно даже на ФС с грубым разрешением времени
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def guides(tmp_path):
+    write_guide(tmp_path / "a.md", "# Картины мира\n\nТекст A.\n")
+    write_guide(tmp_path / "b.md", "# Системы\n\nТекст B.\n")
+    return tmp_path
+
+
+def test_find_and_text(guides):
+    index = GuideIndex(guides).build()
+    section = index.find("1.2 картины  МИРА")
+    assert section.anchor == "a.md#Картины мира"
+    assert index.text(section) == "# Картины мира\n\nТекст A."
+
+
+def test_deleted_file_is_dropped(guides):
+    index = GuideIndex(guides, recheck_interval=0).build()
+    (guides / "b.md").unlink()
+
+    assert index.find("nonexistent") is None
+    assert "b.md" not in index.files
+    assert index.find("Системы") is None
+    assert index.find("Картины мира").guide == "a.md"
+
+
+def test_section_of_deleted_file(guides):
+    index = GuideIndex(guides).build()
+    (guides / "b.md").unlink()
+
+    assert index.find("Системы") is None
+    assert index.find("Системы", guide="b.md") is None
+    assert "b.md" not in index.files
+
+
+def test_changed_file_is_reindexed(guides):
+    index = GuideIndex(guides).build()
+    old = index.find("Системы")
+    write_guide(guides / "b.md", "# Введение\n\nНовый текст.\n\n# Системы\n\nТекст B2.\n")
+
+    section = index.find("Системы")
+    assert index.text(section) == "# Системы\n\nТекст B2."
+    # Уже найденный раздел читается из прежнего содержимого
+    assert index.text(old) == "# Системы\n\nТекст B."
+
+
+def test_miss_recheck_is_rate_limited(guides):
+    index = GuideIndex(guides, recheck_interval=3600).build()
+    write_guide(guides / "a.md", "# Картины мира\n\n# Новый раздел\n")
+
+    # Промах по всем файлам не проверяет их до истечения интервала
+    assert index.find("Новый раздел") is None
+    # Промах в одном руководстве проверяет только его
+    assert index.find("Новый раздел", guide="a.md").anchor == "a.md#Новый раздел"
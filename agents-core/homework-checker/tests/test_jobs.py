@@ -0,0 +1,51 @@
+"""
+Тесты очереди заданий (jobs.py): повторный запрос LMS к заданию в разных
+состояниях.
+
+    python3 -m pytest agents-core/homework-checker/tests -q
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jobs import JobPending, JobStore  # noqa: E402
+
+REQUEST = {"question_id": "q1", "answer": "Ответ студента"}
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    return JobStore(tmp_path / "jobs.sqlite", result_ttl=60, stale_after=60)
+
+
+def test_take_queued_removes_job(jobs):
+    jobs.enqueue(REQUEST, "r1")
+    assert jobs.take(REQUEST) is None
+    assert jobs.claim() is None
+
+
+def test_take_running_is_pending(jobs):
+    jobs.enqueue(REQUEST, "r1")
+    key, _, _ = jobs.claim()
+    with pytest.raises(JobPending):
+        jobs.take(REQUEST)
+
+    # Результат выполняющегося задания достаётся повтору запроса
+    jobs.complete(key, {"comment": "ok"})
+    assert jobs.take(REQUEST) == {"comment": "ok"}
+    assert jobs.take(REQUEST) is None
+
+
+def test_take_stale_running_is_rechecked(tmp_path):
+    jobs = JobStore(tmp_path / "jobs.sqlite", stale_after=0)
+    jobs.enqueue(REQUEST, "r1")
+    jobs.claim()
+    time.sleep(0.01)
+    # Процесс, взявший задание, считается упавшим — запрос проверит вызывающий
+    assert jobs.take(REQUEST) is None
+    assert jobs.counts() == {}
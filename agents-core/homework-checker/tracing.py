@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Трассировка фаз проверки: спаны в JSON Lines.
+
+Спаны пишутся в файл logging.file (по строке JSON на спан) в модели данных
+OpenTelemetry: trace_id/span_id/parent_span_id в hex, время в наносекундах
+Unix, атрибуты и статус. Идентификатор запроса (request.id) — атрибут
+каждого спана.
+
+Если установлен opentelemetry-api, те же спаны дублируются в глобальный
+трассировщик OpenTelemetry; без него модуль работает сам по себе.
+
+    configure_tracing(config)
+    with start_trace("check_answer", request_id="req-1"):
+        with span("context", section="..."):
+            ...
+"""
+
+import contextvars
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+try:
+    from opentelemetry import trace as otel_trace
+    HAS_OTEL = True
+except ImportError:
+    HAS_OTEL = False
+
+
+AGENT_ROOT = Path(__file__).parent
+
+_current: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """Спан: имя, идентификаторы, время, атрибуты и статус."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_span_id", "request_id",
+                 "start_ns", "end_ns", "attributes", "status", "status_message")
+
+    def __init__(self, name: str, trace_id: str, parent: Optional["Span"], request_id: str, attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent.span_id if parent else None
+        self.request_id = request_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes)
+        self.status = "UNSET"
+        self.status_message = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def set_error(self, error: BaseException):
+        self.status = "ERROR"
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> dict:
+        attributes = {"request.id": self.request_id}
+        attributes.update(self.attributes)
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": attributes,
+            "status": {"code": self.status, "message": self.status_message},
+            "resource": {"service.name": "homework-checker", "process.pid": os.getpid()},
+        }
+
+
+class SpanWriter:
+    """Запись завершённых спанов в JSON Lines (потокобезопасно)."""
+
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def write(self, span: Span):
+        if self.path is None:
+            return
+        line = json.dumps(span.to_dict(), ensure_ascii=False)
+        with self._lock:
+            try:
+                if self._file is None:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+                self._file.write(line + "\n")
+            except OSError as e:
+                print(f"[WARN] Не удалось записать спан в {self.path}: {e}", file=sys.stderr)
+                self.path = None
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_writer = SpanWriter(None)
+
+
+def configure_tracing(config: dict):
+    """Включение записи спанов в logging.file (при logging.spans: true)."""
+    global _writer
+    logging_config = config.get("logging", {})
+    path = None
+    if logging_config.get("spans", False) and logging_config.get("file"):
+        path = AGENT_ROOT / logging_config["file"]
+    _writer.close()
+    _writer = SpanWriter(path)
+
+
+def new_request_id() -> str:
+    return secrets.token_hex(8)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def _activate(item: Span):
+    """Делает спан текущим, фиксирует ошибку и время, пишет спан при выходе."""
+    token = _current.set(item)
+    otel_context = _otel_span(item) if HAS_OTEL else None
+    try:
+        if otel_context is None:
+            yield item
+        else:
+            with otel_context:
+                yield item
+    except BaseException as e:
+        item.set_error(e)
+        raise
+    finally:
+        _current.reset(token)
+        item.end_ns = time.time_ns()
+        if item.status == "UNSET":
+            item.status = "OK"
+        _writer.write(item)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Дочерний спан текущей трассы (без активной трассы — ничего не пишет)."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    with _activate(Span(name, parent.trace_id, parent, parent.request_id, attributes)) as item:
+        yield item
+
+
+@contextmanager
+def start_trace(name: str, request_id: Optional[str] = None, **attributes):
+    """Корневой спан запроса; trace_id — новый, request.id — переданный или новый."""
+    root = Span(name, secrets.token_hex(16), None, request_id or new_request_id(), attributes)
+    with _activate(root) as item:
+        yield item
+
+
+def _otel_span(item: Span):
+    tracer = otel_trace.get_tracer("homework-checker")
+    return tracer.start_as_current_span(
+        item.name, attributes={"request.id": item.request_id, **{
+            key: value for key, value in item.attributes.items()
+            if isinstance(value, (str, bool, int, float))
+        }}
+    )
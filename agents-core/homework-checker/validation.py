@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Валидация по JSON-схемам из schemas/.
+
+Валидатор каждой схемы компилируется один раз на процесс:
+- fastjsonschema, если установлен (генерирует Python-код по схеме);
+- иначе — собственная компиляция схемы в дерево замыканий: разбор схемы
+  выполняется заранее, проверка документа — только вызовы готовых функций.
+  Поддерживается подмножество draft-07, которое используют схемы чекера.
+
+Используется для запроса на проверку (check_request) и ответа LLM
+(llm_result — некорректный ответ повторяется, а не форматируется).
+
+    validate("check_request", request)   # ValidationError при ошибке
+
+    python3 validation.py                # время проверки примеров
+"""
+
+import json
+import re
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List
+
+try:
+    import fastjsonschema
+    HAS_FASTJSONSCHEMA = True
+except ImportError:
+    HAS_FASTJSONSCHEMA = False
+
+
+AGENT_ROOT = Path(__file__).parent
+SCHEMAS_DIR = AGENT_ROOT / "schemas"
+
+Validator = Callable[[object], object]
+
+# Ключевые слова-аннотации, не влияющие на проверку
+ANNOTATIONS = {"$schema", "$id", "title", "description", "default", "examples", "$comment"}
+
+DATE_TIME = re.compile(
+    r"^\d{4}-\d{2}-\d{2}[Tt ]\d{2}:\d{2}:\d{2}(\.\d+)?([Zz]|[+-]\d{2}:\d{2})$"
+)
+
+TYPE_CHECKS = {
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+    "string": lambda value: isinstance(value, str),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "integer": lambda value: (isinstance(value, int) and not isinstance(value, bool))
+                             or (isinstance(value, float) and value.is_integer()),
+    "boolean": lambda value: isinstance(value, bool),
+    "null": lambda value: value is None,
+}
+
+
+class ValidationError(ValueError):
+    """Документ не соответствует схеме; сообщение указывает путь (data.issues[0].issue)."""
+
+
+def _fail(path: str, message: str):
+    raise ValidationError(f"{path} {message}")
+
+
+def _compile(schema: dict) -> Callable[[object, str], None]:
+    """Схема → функция check(value, path); неподдерживаемые ключевые слова — ошибка компиляции."""
+    checks: List[Callable[[object, str], None]] = []
+
+    unsupported = set(schema) - ANNOTATIONS - {
+        "type", "enum", "const", "required", "properties", "additionalProperties",
+        "items", "minItems", "maxItems", "minLength", "maxLength",
+        "minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum", "pattern", "format",
+    }
+    if unsupported:
+        raise ValueError(f"Ключевые слова схемы не поддерживаются без fastjsonschema: {sorted(unsupported)}")
+
+    if "type" in schema:
+        names = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+        type_checks = [TYPE_CHECKS[name] for name in names]
+        expected = " or ".join(names)
+
+        def check_type(value, path):
+            if not any(check(value) for check in type_checks):
+                _fail(path, f"must be {expected}")
+        checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = schema["enum"]
+
+        def check_enum(value, path):
+            if value not in allowed:
+                _fail(path, f"must be one of {allowed}")
+        checks.append(check_enum)
+
+    if "const" in schema:
+        const = schema["const"]
+
+        def check_const(value, path):
+            if value != const:
+                _fail(path, f"must be {const!r}")
+        checks.append(check_const)
+
+    # Ограничения по типу применяются только к значениям своего типа (как в JSON Schema)
+    if "minLength" in schema or "maxLength" in schema or "pattern" in schema or "format" in schema:
+        min_length = schema.get("minLength")
+        max_length = schema.get("maxLength")
+        pattern = re.compile(schema["pattern"]) if "pattern" in schema else None
+        date_time = schema.get("format") == "date-time"
+
+        def check_string(value, path):
+            if not isinstance(value, str):
+                return
+            if min_length is not None and len(value) < min_length:
+                _fail(path, f"must be longer than or equal to {min_length} characters")
+            if max_length is not None and len(value) > max_length:
+                _fail(path, f"must be shorter than or equal to {max_length} characters")
+            if pattern is not None and not pattern.search(value):
+                _fail(path, f"must match pattern {pattern.pattern}")
+            if date_time and not DATE_TIME.match(value):
+                _fail(path, "must be date-time")
+        checks.append(check_string)
+
+    bounds = [(key, schema[key]) for key in ("minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum")
+              if key in schema]
+    if bounds:
+        def check_number(value, path):
+            if not TYPE_CHECKS["number"](value):
+                return
+            for key, limit in bounds:
+                if key == "minimum" and value < limit:
+                    _fail(path, f"must be bigger than or equal to {limit}")
+                if key == "maximum" and value > limit:
+                    _fail(path, f"must be smaller than or equal to {limit}")
+                if key == "exclusiveMinimum" and value <= limit:
+                    _fail(path, f"must be bigger than {limit}")
+                if key == "exclusiveMaximum" and value >= limit:
+                    _fail(path, f"must be smaller than {limit}")
+        checks.append(check_number)
+
+    if "required" in schema or "properties" in schema or "additionalProperties" in schema:
+        required = schema.get("required", [])
+        properties = {name: _compile(sub) for name, sub in schema.get("properties", {}).items()}
+        additional = schema.get("additionalProperties", True)
+        additional_check = _compile(additional) if isinstance(additional, dict) else None
+
+        def check_object(value, path):
+            if not isinstance(value, dict):
+                return
+            missing = [name for name in required if name not in value]
+            if missing:
+                _fail(path, f"must contain {missing} properties")
+            for name, item in value.items():
+                check = properties.get(name)
+                if check is not None:
+                    check(item, f"{path}.{name}")
+                elif additional is False:
+                    _fail(path, f"must not contain {{{name!r}}} properties")
+                elif additional_check is not None:
+                    additional_check(item, f"{path}.{name}")
+        checks.append(check_object)
+
+    if "items" in schema or "minItems" in schema or "maxItems" in schema:
+        item_check = _compile(schema["items"]) if "items" in schema else None
+        min_items = schema.get("minItems")
+        max_items = schema.get("maxItems")
+
+        def check_array(value, path):
+            if not isinstance(value, list):
+                return
+            if min_items is not None and len(value) < min_items:
+                _fail(path, f"must contain at least {min_items} items")
+            if max_items is not None and len(value) > max_items:
+                _fail(path, f"must contain less than or equal to {max_items} items")
+            if item_check is not None:
+                for index, item in enumerate(value):
+                    item_check(item, f"{path}[{index}]")
+        checks.append(check_array)
+
+    if len(checks) == 1:
+        return checks[0]
+
+    def check_all(value, path):
+        for check in checks:
+            check(value, path)
+    return check_all
+
+
+def compile_schema(schema: dict) -> Validator:
+    """Валидатор схемы: возвращает документ или поднимает ValidationError."""
+    if HAS_FASTJSONSCHEMA:
+        compiled = fastjsonschema.compile(schema)
+
+        def validate_fast(data):
+            try:
+                return compiled(data)
+            except fastjsonschema.JsonSchemaValueException as e:
+                raise ValidationError(e.message) from None
+        return validate_fast
+
+    check = _compile(schema)
+
+    def validate_compiled(data):
+        check(data, "data")
+        return data
+    return validate_compiled
+
+
+_validators: Dict[str, Validator] = {}
+_validators_lock = threading.Lock()
+
+
+def get_validator(name: str) -> Validator:
+    """Валидатор схемы schemas/{name}.json (компилируется один раз на процесс)."""
+    validator = _validators.get(name)
+    if validator is None:
+        with _validators_lock:
+            validator = _validators.get(name)
+            if validator is None:
+                with open(SCHEMAS_DIR / f"{name}.json", "r", encoding="utf-8") as f:
+                    validator = _validators[name] = compile_schema(json.load(f))
+    return validator
+
+
+def validate(name: str, data):
+    """Проверка документа по схеме schemas/{name}.json."""
+    return get_validator(name)(data)
+
+
+def main():
+    import time
+
+    examples = {
+        "check_request": json.loads((AGENT_ROOT / "examples" / "request_example.json").read_text(encoding="utf-8")),
+        "check_result": json.loads((AGENT_ROOT / "examples" / "result_example.json").read_text(encoding="utf-8")),
+        "llm_result": {
+            "verdict": "accepted", "score": 85, "strengths": ["Ключевая идея раскрыта"],
+            "issues": [{"criterion": "example", "issue": "Пример краткий", "suggestion": "Добавьте второй"}],
+            "next_step": "Перечитайте раздел", "criterion_scores": {"example": 70},
+        },
+    }
+    print(f"Движок: {'fastjsonschema' if HAS_FASTJSONSCHEMA else 'встроенный компилятор схем'}")
+    for name, document in examples.items():
+        started = time.perf_counter()
+        validator = get_validator(name)
+        compiled_ms = (time.perf_counter() - started) * 1000
+
+        runs = 10000
+        started = time.perf_counter()
+        for _ in range(runs):
+            validator(document)
+        per_call_us = (time.perf_counter() - started) / runs * 1e6
+        print(f"{name}: компиляция {compiled_ms:.1f} мс, проверка {per_call_us:.1f} мкс")
+
+    try:
+        validate("llm_result", {"verdict": "maybe", "score": 120})
+    except ValidationError as e:
+        print(f"Пример ошибки: {e}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()